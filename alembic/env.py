@@ -0,0 +1,56 @@
+from logging.config import fileConfig
+from sqlalchemy import text
+from alembic import context
+from app.database import Base, DATABASE_URL, engine
+import app.models  # noqa: F401 - registers every table on Base.metadata
+
+config = context.config
+
+# Not when run from init_db on app startup; it would replace uvicorn's logging
+if config.config_file_name is not None and config.attributes.get("configure_logger", True):
+    fileConfig(config.config_file_name)
+
+target_metadata = Base.metadata
+
+# Arbitrary key for pg_advisory_lock, so app instances starting together
+# run the migrations one at a time
+MIGRATION_LOCK_KEY = 7_310_422
+
+def run_migrations_offline():
+    """Emit the migration SQL instead of running it (alembic upgrade --sql)"""
+    context.configure(
+        url=DATABASE_URL,
+        target_metadata=target_metadata,
+        literal_binds=True,
+        dialect_opts={"paramstyle": "named"}
+    )
+    
+    with context.begin_transaction():
+        context.run_migrations()
+
+def run_migrations_online():
+    with engine.connect() as connection:
+        postgres = connection.dialect.name == "postgresql"
+        if postgres:
+            # Session-level, so it holds across autocommit blocks (CREATE INDEX CONCURRENTLY)
+            connection.execute(text(f"SELECT pg_advisory_lock({MIGRATION_LOCK_KEY})"))
+            connection.commit()
+        
+        try:
+            context.configure(
+                connection=connection,
+                target_metadata=target_metadata,
+                render_as_batch=connection.dialect.name == "sqlite"  # SQLite can't ALTER most things
+            )
+            
+            with context.begin_transaction():
+                context.run_migrations()
+        finally:
+            if postgres:
+                connection.execute(text(f"SELECT pg_advisory_unlock({MIGRATION_LOCK_KEY})"))
+                connection.commit()
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
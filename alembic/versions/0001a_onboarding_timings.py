@@ -0,0 +1,84 @@
+"""onboarding timings
+
+Stage entry times, per-attempt and per-step login timings and the stage
+transition log behind /api/admin/onboarding-funnel. These (and the
+tables in 0001b-0001d) used to be added by create_all alone, so a
+database built by an older release may have some of them already: only
+what is missing is created.
+
+Revision ID: 0001a
+Revises: 0001
+Create Date: 2026-10-19 02:10:04.612043
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0001a'
+down_revision: Union[str, None] = '0001'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    tables = inspector.get_table_names()
+    
+    if 'onboarding_stage_entered_at' not in {c['name'] for c in inspector.get_columns('users')}:
+        with op.batch_alter_table('users', schema=None) as batch_op:
+            batch_op.add_column(sa.Column('onboarding_stage_entered_at', sa.DateTime(), nullable=True))
+    
+    if 'duration_ms' not in {c['name'] for c in inspector.get_columns('login_attempts')}:
+        with op.batch_alter_table('login_attempts', schema=None) as batch_op:
+            batch_op.add_column(sa.Column('duration_ms', sa.Integer(), nullable=True))
+    
+    if 'login_step_timings' not in tables:
+        op.create_table('login_step_timings',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('attempt_id', sa.Integer(), nullable=False),
+        sa.Column('step', sa.String(length=50), nullable=False),
+        sa.Column('duration_ms', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['attempt_id'], ['login_attempts.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id')
+        )
+        with op.batch_alter_table('login_step_timings', schema=None) as batch_op:
+            batch_op.create_index(batch_op.f('ix_login_step_timings_attempt_id'), ['attempt_id'], unique=False)
+            batch_op.create_index(batch_op.f('ix_login_step_timings_step'), ['step'], unique=False)
+    
+    if 'onboarding_stage_transitions' not in tables:
+        # Type already created with users.onboarding_stage
+        stage = postgresql.ENUM('PASSWORD', 'TWO_FA', 'CHALLENGE', 'COMPLETE', name='onboardingstage', create_type=False)
+        op.create_table('onboarding_stage_transitions',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('from_stage', stage, nullable=True),
+        sa.Column('to_stage', stage, nullable=False),
+        sa.Column('duration_ms', sa.Integer(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+        )
+        with op.batch_alter_table('onboarding_stage_transitions', schema=None) as batch_op:
+            batch_op.create_index(batch_op.f('ix_onboarding_stage_transitions_user_id'), ['user_id'], unique=False)
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('onboarding_stage_transitions', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_onboarding_stage_transitions_user_id'))
+    
+    op.drop_table('onboarding_stage_transitions')
+    with op.batch_alter_table('login_step_timings', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_login_step_timings_step'))
+        batch_op.drop_index(batch_op.f('ix_login_step_timings_attempt_id'))
+    
+    op.drop_table('login_step_timings')
+    with op.batch_alter_table('login_attempts', schema=None) as batch_op:
+        batch_op.drop_column('duration_ms')
+    
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.drop_column('onboarding_stage_entered_at')
@@ -0,0 +1,102 @@
+"""proxy tables
+
+Proxy health check history, the proxy inventory behind the warm pool,
+expiry renewal and proxy scoring. Only what an older create_all did not
+build is created (see 0001a); a proxies table from before scoring gets
+the stats columns, zeroed.
+
+Revision ID: 0001b
+Revises: 0001a
+Create Date: 2026-10-19 02:11:37.094581
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0001b'
+down_revision: Union[str, None] = '0001a'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _stats_columns():
+    return [
+        sa.Column('latency_ms', sa.Float(), nullable=True),
+        sa.Column('error_rate', sa.Float(), server_default='0', nullable=False),
+        sa.Column('login_failure_rate', sa.Float(), server_default='0', nullable=False),
+        sa.Column('checkpoint_rate', sa.Float(), server_default='0', nullable=False),
+        sa.Column('probe_count', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('login_count', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('score', sa.Float(), nullable=True),
+        sa.Column('scored_at', sa.DateTime(), nullable=True)
+    ]
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    tables = inspector.get_table_names()
+    
+    if 'proxy_health_checks' not in tables:
+        op.create_table('proxy_health_checks',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=True),
+        sa.Column('proxy_url', sa.Text(), nullable=False),
+        sa.Column('healthy', sa.Boolean(), nullable=False),
+        sa.Column('latency_ms', sa.Integer(), nullable=True),
+        sa.Column('exit_ip', sa.String(length=64), nullable=True),
+        sa.Column('error', sa.Text(), nullable=True),
+        sa.Column('checked_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('id')
+        )
+        with op.batch_alter_table('proxy_health_checks', schema=None) as batch_op:
+            batch_op.create_index(batch_op.f('ix_proxy_health_checks_checked_at'), ['checked_at'], unique=False)
+            batch_op.create_index(batch_op.f('ix_proxy_health_checks_user_id'), ['user_id'], unique=False)
+    
+    if 'proxies' not in tables:
+        op.create_table('proxies',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('provider_id', sa.String(length=255), nullable=False),
+        sa.Column('proxy_url', sa.Text(), nullable=False),
+        sa.Column('city', sa.String(length=100), nullable=False),
+        sa.Column('status', sa.Enum('AVAILABLE', 'ASSIGNED', 'RETIRED', name='proxystatus'), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=True),
+        sa.Column('assigned_at', sa.DateTime(), nullable=True),
+        *_stats_columns(),
+        sa.Column('purchased_at', sa.DateTime(), nullable=False),
+        sa.Column('expires_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('provider_id')
+        )
+        with op.batch_alter_table('proxies', schema=None) as batch_op:
+            batch_op.create_index('ix_proxies_city_status', ['city', 'status'], unique=False)
+            batch_op.create_index('ix_proxies_status_expires_at', ['status', 'expires_at'], unique=False)
+            batch_op.create_index(batch_op.f('ix_proxies_user_id'), ['user_id'], unique=False)
+        return
+    
+    columns = {c['name'] for c in inspector.get_columns('proxies')}
+    indexes = {i['name'] for i in inspector.get_indexes('proxies')}
+    with op.batch_alter_table('proxies', schema=None) as batch_op:
+        for column in _stats_columns():
+            if column.name not in columns:
+                batch_op.add_column(column)
+        if 'ix_proxies_status_expires_at' not in indexes:
+            batch_op.create_index('ix_proxies_status_expires_at', ['status', 'expires_at'], unique=False)
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('proxies', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_proxies_user_id'))
+        batch_op.drop_index('ix_proxies_status_expires_at')
+        batch_op.drop_index('ix_proxies_city_status')
+    
+    op.drop_table('proxies')
+    sa.Enum(name='proxystatus').drop(op.get_bind(), checkfirst=True)
+    with op.batch_alter_table('proxy_health_checks', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_proxy_health_checks_user_id'))
+        batch_op.drop_index(batch_op.f('ix_proxy_health_checks_checked_at'))
+    
+    op.drop_table('proxy_health_checks')
@@ -0,0 +1,112 @@
+"""manychat tables
+
+The webhook event queue (with its dedup key), broadcasts and the local
+copy of synced tags and custom field values. Only what an older
+create_all did not build is created (see 0001a); events queued before
+event_key existed get a key of their own, so they never match a
+redelivery.
+
+Revision ID: 0001c
+Revises: 0001b
+Create Date: 2026-10-19 02:12:58.470316
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0001c'
+down_revision: Union[str, None] = '0001b'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    tables = inspector.get_table_names()
+    
+    if 'manychat_events' not in tables:
+        op.create_table('manychat_events',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('event_key', sa.String(length=64), nullable=False),
+        sa.Column('event_type', sa.String(length=50), nullable=True),
+        sa.Column('payload', sa.Text(), nullable=False),
+        sa.Column('status', sa.Enum('PENDING', 'DONE', 'FAILED', name='webhookeventstatus'), nullable=False),
+        sa.Column('attempts', sa.Integer(), nullable=False),
+        sa.Column('error', sa.Text(), nullable=True),
+        sa.Column('received_at', sa.DateTime(), nullable=False),
+        sa.Column('processed_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('event_key')
+        )
+        with op.batch_alter_table('manychat_events', schema=None) as batch_op:
+            batch_op.create_index(batch_op.f('ix_manychat_events_received_at'), ['received_at'], unique=False)
+            batch_op.create_index('ix_manychat_events_status_id', ['status', 'id'], unique=False)
+    elif 'event_key' not in {c['name'] for c in inspector.get_columns('manychat_events')}:
+        with op.batch_alter_table('manychat_events', schema=None) as batch_op:
+            batch_op.add_column(sa.Column('event_key', sa.String(length=64), nullable=True))
+        op.execute("UPDATE manychat_events SET event_key = 'legacy:' || id")
+        with op.batch_alter_table('manychat_events', schema=None) as batch_op:
+            batch_op.alter_column('event_key', existing_type=sa.String(length=64), nullable=False)
+            batch_op.create_unique_constraint('uq_manychat_events_event_key', ['event_key'])
+    
+    if 'manychat_broadcasts' not in tables:
+        op.create_table('manychat_broadcasts',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('message', sa.Text(), nullable=False),
+        sa.Column('message_tag', sa.String(length=50), nullable=False),
+        sa.Column('filters', sa.Text(), nullable=False),
+        sa.Column('status', sa.Enum('RUNNING', 'DONE', 'CANCELLED', 'FAILED', name='broadcaststatus'), nullable=False),
+        sa.Column('total', sa.Integer(), nullable=True),
+        sa.Column('sent', sa.Integer(), nullable=False),
+        sa.Column('failed', sa.Integer(), nullable=False),
+        sa.Column('last_user_id', sa.Integer(), nullable=False),
+        sa.Column('last_error', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('finished_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+        )
+    
+    if 'manychat_tags' not in tables:
+        op.create_table('manychat_tags',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('tag', sa.String(length=100), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('user_id', 'tag', name='uq_manychat_tags_user_tag')
+        )
+        with op.batch_alter_table('manychat_tags', schema=None) as batch_op:
+            batch_op.create_index('ix_manychat_tags_tag_user', ['tag', 'user_id'], unique=False)
+    
+    if 'manychat_field_values' not in tables:
+        op.create_table('manychat_field_values',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('field_id', sa.Integer(), nullable=False),
+        sa.Column('value', sa.Text(), nullable=True),
+        sa.Column('synced_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('user_id', 'field_id', name='uq_manychat_field_values_user_field')
+        )
+
+
+def downgrade() -> None:
+    op.drop_table('manychat_field_values')
+    with op.batch_alter_table('manychat_tags', schema=None) as batch_op:
+        batch_op.drop_index('ix_manychat_tags_tag_user')
+    
+    op.drop_table('manychat_tags')
+    op.drop_table('manychat_broadcasts')
+    sa.Enum(name='broadcaststatus').drop(op.get_bind(), checkfirst=True)
+    with op.batch_alter_table('manychat_events', schema=None) as batch_op:
+        batch_op.drop_index('ix_manychat_events_status_id')
+        batch_op.drop_index(batch_op.f('ix_manychat_events_received_at'))
+    
+    op.drop_table('manychat_events')
+    sa.Enum(name='webhookeventstatus').drop(op.get_bind(), checkfirst=True)
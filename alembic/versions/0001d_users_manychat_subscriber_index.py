@@ -0,0 +1,50 @@
+"""users manychat_subscriber_id index
+
+Webhook events resolve their user by manychat_subscriber_id. The model
+declares a named unique index on it instead of the baseline's unnamed
+unique constraint; keeping both would check every write twice.
+
+Revision ID: 0001d
+Revises: 0001c
+Create Date: 2026-10-19 02:14:21.853907
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0001d'
+down_revision: Union[str, None] = '0001c'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Names the unnamed SQLite constraint, so batch mode can drop it
+NAMING_CONVENTION = {"uq": "uq_%(table_name)s_%(column_0_name)s"}
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    constraints = [
+        u['name'] or 'uq_users_manychat_subscriber_id'
+        for u in inspector.get_unique_constraints('users')
+        if u['column_names'] == ['manychat_subscriber_id']
+    ]
+    indexed = 'ix_users_manychat_subscriber_id' in {i['name'] for i in inspector.get_indexes('users')}
+    if indexed and not constraints:
+        return
+    
+    with op.batch_alter_table('users', schema=None, naming_convention=NAMING_CONVENTION) as batch_op:
+        for name in constraints:
+            batch_op.drop_constraint(name, type_='unique')
+        if not indexed:
+            batch_op.create_index(batch_op.f('ix_users_manychat_subscriber_id'), ['manychat_subscriber_id'], unique=True)
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('users', schema=None, naming_convention=NAMING_CONVENTION) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_users_manychat_subscriber_id'))
+        batch_op.create_unique_constraint('uq_users_manychat_subscriber_id', ['manychat_subscriber_id'])
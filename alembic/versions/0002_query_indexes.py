@@ -0,0 +1,53 @@
+"""query indexes
+
+Composite and partial indexes for the admin list, batch approval and warm
+pool queries; see benchmarks/explain_indexes.py for the plans they serve.
+
+Revision ID: 0002
+Revises: 0001d
+Create Date: 2026-10-19 00:21:11.836753
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0002'
+down_revision: Union[str, None] = '0001d'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+PENDING_ONLY = sa.text("status = 'PENDING'")
+
+
+def upgrade() -> None:
+    # CONCURRENTLY keeps users/login_attempts writable while the indexes build
+    # on PostgreSQL; it can't run inside the migration transaction
+    with op.get_context().autocommit_block():
+        op.create_index('ix_users_status_created_at', 'users', ['status', 'created_at'], postgresql_concurrently=True)
+        op.create_index(
+            'ix_users_pending_city_created_at', 'users', ['city', 'created_at'],
+            postgresql_where=PENDING_ONLY, sqlite_where=PENDING_ONLY, postgresql_concurrently=True
+        )
+        op.create_index(
+            'ix_login_attempts_user_id_created_at', 'login_attempts', ['user_id', 'created_at'],
+            postgresql_concurrently=True
+        )
+        
+        # Covered by the composite index above / duplicates the primary key
+        op.drop_index('ix_login_attempts_user_id', table_name='login_attempts', postgresql_concurrently=True)
+        op.drop_index('ix_users_id', table_name='users', postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.create_index('ix_users_id', 'users', ['id'], postgresql_concurrently=True)
+        op.create_index('ix_login_attempts_user_id', 'login_attempts', ['user_id'], postgresql_concurrently=True)
+        
+        op.drop_index('ix_login_attempts_user_id_created_at', table_name='login_attempts', postgresql_concurrently=True)
+        op.drop_index('ix_users_pending_city_created_at', table_name='users', postgresql_concurrently=True)
+        op.drop_index('ix_users_status_created_at', table_name='users', postgresql_concurrently=True)
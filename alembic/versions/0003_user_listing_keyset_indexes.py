@@ -0,0 +1,37 @@
+"""user listing keyset indexes
+
+Keyset pagination of /users and /pending-users orders by (created_at, id);
+id joins the status index and a (created_at, id) index serves listings
+without a status filter. SQLite already appends the rowid to every index,
+PostgreSQL would otherwise sort ties.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-19 00:32:05.114203
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0003'
+down_revision: Union[str, None] = '0002'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.create_index('ix_users_status_created_at_id', 'users', ['status', 'created_at', 'id'], postgresql_concurrently=True)
+        op.create_index('ix_users_created_at_id', 'users', ['created_at', 'id'], postgresql_concurrently=True)
+        op.drop_index('ix_users_status_created_at', table_name='users', postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.create_index('ix_users_status_created_at', 'users', ['status', 'created_at'], postgresql_concurrently=True)
+        op.drop_index('ix_users_created_at_id', table_name='users', postgresql_concurrently=True)
+        op.drop_index('ix_users_status_created_at_id', table_name='users', postgresql_concurrently=True)
@@ -0,0 +1,31 @@
+"""login_attempts created_at index
+
+/api/admin/stats aggregates the last ADMIN_STATS_LOGIN_WINDOW_HOURS of
+login attempts; without this it scans the whole table.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-19 00:41:27.530114
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0004'
+down_revision: Union[str, None] = '0003'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.create_index('ix_login_attempts_created_at', 'login_attempts', ['created_at'], postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_login_attempts_created_at', table_name='login_attempts', postgresql_concurrently=True)
@@ -0,0 +1,40 @@
+"""login attempts daily rollup
+
+Per-user, per-day counts that login attempts past LOGIN_RETENTION_DAYS
+are rolled up into before being deleted (app/workers/login_retention.py).
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-19 00:32:30.210162
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0005'
+down_revision: Union[str, None] = '0004'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('login_attempts_daily',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('attempt_type', sa.String(length=50), nullable=False),
+    sa.Column('attempts', sa.Integer(), nullable=False),
+    sa.Column('succeeded', sa.Integer(), nullable=False),
+    sa.Column('duration_ms', sa.BigInteger(), nullable=False),
+    sa.Column('timed', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('user_id', 'day', 'attempt_type', name='uq_login_attempts_daily_user_day_type')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('login_attempts_daily')
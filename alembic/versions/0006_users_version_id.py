@@ -0,0 +1,32 @@
+"""users version id
+
+Row version for optimistic concurrency on users (mapper version_id_col):
+parallel onboarding submits for one user can't both apply. A constant
+default, so PostgreSQL adds the column without rewriting the table.
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-19 00:35:38.675889
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0006'
+down_revision: Union[str, None] = '0005'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('version_id', sa.Integer(), server_default='1', nullable=False))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.drop_column('version_id')
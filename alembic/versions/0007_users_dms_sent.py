@@ -0,0 +1,32 @@
+"""users dms sent
+
+Per-user DM counter, written behind with last_activity_at in batched
+UPDATEs (app/workers/user_activity.py). A constant default, so
+PostgreSQL adds the column without rewriting the table.
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-19 00:40:18.182559
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0007'
+down_revision: Union[str, None] = '0006'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('dms_sent', sa.Integer(), server_default='0', nullable=False))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.drop_column('dms_sent')
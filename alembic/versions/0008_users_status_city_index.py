@@ -0,0 +1,44 @@
+"""users status city index
+
+Replaces the partial pending-by-city index with a plain (status, city,
+created_at) one. The app binds status as a parameter, which the planner
+can't match against the partial index's literal predicate, so batch
+approval and the warm pool targets never used it.
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-19 03:02:47.519340
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0008'
+down_revision: Union[str, None] = '0007'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+PENDING_ONLY = sa.text("status = 'PENDING'")
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_users_status_city_created_at', 'users', ['status', 'city', 'created_at'],
+            postgresql_concurrently=True
+        )
+        op.drop_index('ix_users_pending_city_created_at', table_name='users', postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_users_pending_city_created_at', 'users', ['city', 'created_at'],
+            postgresql_where=PENDING_ONLY, sqlite_where=PENDING_ONLY, postgresql_concurrently=True
+        )
+        op.drop_index('ix_users_status_city_created_at', table_name='users', postgresql_concurrently=True)
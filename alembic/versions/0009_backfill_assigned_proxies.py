@@ -0,0 +1,99 @@
+"""backfill assigned proxies
+
+Users approved before the proxies table existed only have proxy_url and
+proxy_provider_id on their row, so the renewal job, which reads proxies,
+never renews them. Each gets an ASSIGNED proxies row with an estimated
+expiry of approved_at plus one plan length; renewal picks up the ones
+already past it on its first run and stores the provider's real expiry.
+Mock proxies (provider id mock-...) are skipped.
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-19 14:20:05.112734
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from datetime import timedelta
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0009'
+down_revision: Union[str, None] = '0008'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+PLAN_DAYS = 30  # PROXY_RENEWAL_DURATION_DAYS when this was written
+BATCH_SIZE = 1000
+
+users = sa.table('users',
+    sa.column('id', sa.Integer()),
+    sa.column('city', sa.String()),
+    sa.column('proxy_url', sa.Text()),
+    sa.column('proxy_provider_id', sa.String()),
+    sa.column('proxy_city', sa.String()),
+    sa.column('created_at', sa.DateTime()),
+    sa.column('approved_at', sa.DateTime())
+)
+proxies = sa.table('proxies',
+    sa.column('provider_id', sa.String()),
+    sa.column('proxy_url', sa.Text()),
+    sa.column('city', sa.String()),
+    sa.column('status', sa.Enum('AVAILABLE', 'ASSIGNED', 'RETIRED', name='proxystatus', create_type=False)),
+    sa.column('user_id', sa.Integer()),
+    sa.column('assigned_at', sa.DateTime()),
+    sa.column('error_rate', sa.Float()),
+    sa.column('login_failure_rate', sa.Float()),
+    sa.column('checkpoint_rate', sa.Float()),
+    sa.column('probe_count', sa.Integer()),
+    sa.column('login_count', sa.Integer()),
+    sa.column('purchased_at', sa.DateTime()),
+    sa.column('expires_at', sa.DateTime())
+)
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    missing = sa.select(
+        users.c.id, users.c.city, users.c.proxy_url, users.c.proxy_provider_id,
+        users.c.proxy_city, users.c.created_at, users.c.approved_at
+    ).where(
+        users.c.proxy_provider_id.isnot(None),
+        users.c.proxy_url.isnot(None),
+        users.c.proxy_provider_id.notlike('mock-%'),
+        ~sa.exists().where(proxies.c.provider_id == users.c.proxy_provider_id),
+        ~sa.exists().where(proxies.c.user_id == users.c.id, proxies.c.status == 'ASSIGNED')
+    ).order_by(users.c.id)
+    
+    rows, seen = [], set()
+    for user in bind.execute(missing):
+        if user.proxy_provider_id in seen:
+            continue  # provider_id is unique; the first user keeps it
+        seen.add(user.proxy_provider_id)
+        assigned_at = user.approved_at or user.created_at
+        rows.append({
+            'provider_id': user.proxy_provider_id,
+            'proxy_url': user.proxy_url,
+            'city': user.proxy_city or user.city,
+            'status': 'ASSIGNED',
+            'user_id': user.id,
+            'assigned_at': assigned_at,
+            'error_rate': 0.0,
+            'login_failure_rate': 0.0,
+            'checkpoint_rate': 0.0,
+            'probe_count': 0,
+            'login_count': 0,
+            'purchased_at': assigned_at,
+            'expires_at': assigned_at + timedelta(days=PLAN_DAYS)
+        })
+    
+    for i in range(0, len(rows), BATCH_SIZE):
+        op.bulk_insert(proxies, rows[i:i + BATCH_SIZE])
+
+
+def downgrade() -> None:
+    # Backfilled rows can't be told from ones renewal has updated since; keep them
+    pass
@@ -1,9 +1,20 @@
 from pydantic import BaseSettings  # Changed from pydantic_settings
 from functools import lru_cache
+from typing import Optional
 
 class Settings(BaseSettings):
     # Database
     database_url: str
+    async_database_url: Optional[str] = None  # Derived from database_url when unset
+    db_pool_size: int = 10
+    db_max_overflow: int = 20
+    db_pool_timeout: float = 30.0
+    db_pool_recycle: int = 1800     # Seconds; drop connections older than this
+    db_pool_pre_ping: bool = True   # Check connections on checkout (survives DB restarts)
+    database_replica_url: Optional[str] = None        # Read replica for admin/reporting reads; off when unset
+    async_database_replica_url: Optional[str] = None  # Derived from database_replica_url when unset
+    db_replica_max_lag_seconds: float = 10.0          # Reads go to the primary while the replica lags more (PostgreSQL)
+    db_replica_lag_check_seconds: float = 5.0
     
     # Security
     secret_key: str
@@ -12,12 +23,96 @@ class Settings(BaseSettings):
     # Proxy Provider
     proxy_provider_api_key: str
     proxy_provider_url: str
+    proxy_http_timeout: float = 10.0
+    proxy_http_connect_timeout: float = 5.0
+    proxy_http_max_connections: int = 50
+    proxy_http_max_keepalive: int = 20
+    proxy_health_check_url: str = "https://api.ipify.org?format=json"
+    proxy_health_enabled: bool = True
+    proxy_health_interval_seconds: int = 300
+    proxy_health_ttl_seconds: int = 600
+    proxy_health_concurrency: int = 20
+    proxy_pool_enabled: bool = True
+    proxy_pool_refill_interval_seconds: int = 60
+    proxy_pool_min_per_city: int = 1       # Kept warm for any city with pending applications
+    proxy_pool_pending_ratio: float = 1.0  # Extra proxies per pending application
+    proxy_pool_max_per_city: int = 20
+    proxy_pool_purchase_concurrency: int = 5
+    bulk_approve_batch_size: int = 100
+    proxy_renewal_enabled: bool = True
+    proxy_renewal_interval_seconds: int = 3600
+    proxy_renewal_window_days: int = 3     # Renew proxies expiring within this window
+    proxy_renewal_duration_days: int = 30
+    proxy_renewal_batch_size: int = 50
+    proxy_renewal_concurrency: int = 5
+    proxy_renewal_rate_per_second: float = 5.0
+    proxy_score_alpha: float = 0.2             # Weight of the newest sample in rolling stats
+    proxy_swap_score_threshold: float = 30.0   # Suggest a swap below this score
+    proxy_swap_min_samples: int = 5            # Probes needed before a proxy can be judged
     
     # Email
     smtp_host: str
     smtp_port: int
     smtp_user: str
     smtp_password: str
+    alert_email: Optional[str] = None  # Receives background job failure alerts
+    
+    # ManyChat
+    manychat_api_key: str = ""
+    manychat_webhook_secret: str = ""
+    manychat_api_url: str = "https://api.manychat.com"
+    manychat_timeout: float = 10.0
+    manychat_max_connections: int = 50
+    manychat_max_retries: int = 3
+    manychat_max_retry_after_seconds: float = 30.0  # Longer Retry-After values are cut to this
+    manychat_rate_per_second: float = 10.0       # ManyChat limit for most endpoints
+    manychat_send_rate_per_second: float = 25.0  # sendContent has a higher limit
+    manychat_webhook_workers: int = 2
+    manychat_webhook_batch_size: int = 100
+    manychat_webhook_poll_seconds: float = 1.0
+    manychat_webhook_max_attempts: int = 5
+    manychat_event_retention_hours: int = 24     # Processed events are deleted after this
+    manychat_dedup_window_seconds: int = 3600
+    manychat_dedup_max_entries: int = 100000
+    manychat_subscriber_index_refresh_seconds: int = 600  # Full reload of the in-memory subscriber index
+    manychat_broadcast_chunk_size: int = 500     # Recipients read and sent per chunk
+    manychat_broadcast_concurrency: int = 10
+    manychat_sync_batch_size: int = 200          # Users diffed per chunk in a fleet resync
+    manychat_sync_concurrency: int = 10
+    manychat_username_field_id: Optional[int] = 12345  # Custom field IDs; None = not synced
+    manychat_city_field_id: Optional[int] = None
+    
+    # Java backend (inbound message forwarding)
+    java_backend_url: Optional[str] = None  # Forwarding is off when unset
+    java_forward_path: str = "/inbox/messages/batch"
+    java_forward_batch_size: int = 100
+    java_forward_flush_seconds: float = 1.0
+    java_forward_max_retries: int = 3
+    java_forward_spool_dir: str = "./outbox"
+    java_forward_spool_max_age_hours: int = 24  # A spooled batch still failing after this is dead-lettered
+    
+    # Login attempt retention
+    login_retention_enabled: bool = True
+    login_retention_interval_seconds: int = 3600
+    login_retention_days: int = 30               # Raw attempts older than this are rolled up and deleted
+    login_retention_batch_size: int = 2000       # Rows rolled up and deleted per transaction
+    login_retention_batch_pause_seconds: float = 0.05
+    login_partition_months_ahead: int = 2        # Partitioned table only (PostgreSQL)
+    
+    # User activity (write-behind)
+    user_activity_flush_seconds: float = 5.0
+    user_activity_batch_size: int = 500       # Users per batched UPDATE
+    user_activity_max_pending: int = 10000    # Flush early once this many users are waiting
+    
+    # User lookups in routes (see app/utils/user_loader.py)
+    user_identity_ttl_seconds: float = 30.0   # Cached username/proxy_url; other processes' changes show up after this
+    user_identity_max_entries: int = 10000
+    
+    # Admin dashboard
+    admin_stats_ttl_seconds: int = 30          # /api/admin/stats snapshot lifetime
+    admin_stats_login_window_hours: int = 24   # Login success rates cover this window
+    application_import_batch_size: int = 1000  # Imported rows deduped, inserted and committed together
+    export_batch_size: int = 1000              # Exported rows fetched (yield_per) and serialized per chunk
     
     # Frontend
     frontend_url: str
@@ -1,25 +1,192 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from sqlalchemy.sql.dml import UpdateBase
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
-from dotenv import load_dotenv
+from sqlalchemy.orm import Session, sessionmaker
+from app.config import get_settings
+from alembic import command
+from alembic.config import Config
+from alembic.autogenerate import compare_metadata
+from alembic.migration import MigrationContext
+from contextlib import asynccontextmanager
+import asyncio
 import os
+import time
 
-load_dotenv()
+settings = get_settings()
 
-DATABASE_URL = os.getenv("DATABASE_URL")
+DATABASE_URL = settings.database_url
 
-engine = create_engine(DATABASE_URL)
+ALEMBIC_INI = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "alembic.ini")
+BASELINE_REVISION = "0001"  # The schema create_all used to build on startup
+
+# Drivers for the async engine, by backend
+ASYNC_DRIVERS = {
+    "postgresql": "asyncpg",
+    "sqlite": "aiosqlite"
+}
+
+def async_database_url(url: str) -> str:
+    """postgresql://... -> postgresql+asyncpg://..., sqlite://... -> sqlite+aiosqlite://..."""
+    parsed = make_url(url)
+    backend = parsed.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"No async driver configured for {backend}; set ASYNC_DATABASE_URL")
+    return parsed.set(drivername=f"{backend}+{ASYNC_DRIVERS[backend]}").render_as_string(hide_password=False)
+
+def pool_options(url: str) -> dict:
+    """Pool settings from Settings; in-memory SQLite keeps SQLAlchemy's single-connection pool"""
+    parsed = make_url(url)
+    if parsed.get_backend_name() == "sqlite" and parsed.database in (None, "", ":memory:"):
+        return {}
+    
+    options = {
+        "pool_size": settings.db_pool_size,
+        "max_overflow": settings.db_max_overflow,
+        "pool_timeout": settings.db_pool_timeout,
+        "pool_recycle": settings.db_pool_recycle,
+        "pool_pre_ping": settings.db_pool_pre_ping
+    }
+    if parsed.get_driver_name() == "aiosqlite":
+        # Otherwise NullPool: a new connection (and thread) per session
+        options["poolclass"] = AsyncAdaptedQueuePool
+    return options
+
+# Sync engine: background workers (run in threads) and migrations
+engine = create_engine(DATABASE_URL, **pool_options(DATABASE_URL))
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
-def get_db():
-    """Dependency for getting database session"""
-    db = SessionLocal()
+# Async engine: request handlers
+ASYNC_DATABASE_URL = settings.async_database_url or async_database_url(DATABASE_URL)
+async_engine = create_async_engine(ASYNC_DATABASE_URL, **pool_options(ASYNC_DATABASE_URL))
+# Objects stay usable after commit; lazy refreshes can't run on an AsyncSession
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+# Read replica: admin and reporting reads; None when DATABASE_REPLICA_URL is unset
+REPLICA_ASYNC_DATABASE_URL = settings.async_database_replica_url or (
+    async_database_url(settings.database_replica_url) if settings.database_replica_url else None
+)
+replica_async_engine = (
+    create_async_engine(REPLICA_ASYNC_DATABASE_URL, **pool_options(REPLICA_ASYNC_DATABASE_URL))
+    if REPLICA_ASYNC_DATABASE_URL else None
+)
+
+class RoutingSession(Session):
+    """
+    Session reading from the replica and writing to the primary
+    
+    Flushes and INSERT/UPDATE/DELETE statements always go to the primary,
+    as does everything once info["primary"] is set (read-your-writes, or a
+    lagging replica) or when no replica is configured.
+    """
+    
+    def get_bind(self, mapper=None, clause=None, **kw):
+        if (
+            replica_async_engine is None
+            or self.info.get("primary")
+            or self._flushing
+            or isinstance(clause, UpdateBase)
+        ):
+            return async_engine.sync_engine
+        return replica_async_engine.sync_engine
+
+ReadSessionLocal = async_sessionmaker(sync_session_class=RoutingSession, autoflush=False, expire_on_commit=False)
+
+_replica_lag = {"seconds": 0.0, "checked_at": None}
+
+async def replica_lag() -> float:
+    """
+    Replication delay of the replica in seconds, re-measured every DB_REPLICA_LAG_CHECK_SECONDS
+    
+    PostgreSQL only (0 for other backends, and when the replica has replayed
+    everything it received). An unreachable replica counts as infinitely
+    behind, so reads fall back to the primary.
+    """
+    if replica_async_engine is None or replica_async_engine.dialect.name != "postgresql":
+        return 0.0
+    
+    now = time.monotonic()
+    checked_at = _replica_lag["checked_at"]
+    if checked_at is not None and now - checked_at < settings.db_replica_lag_check_seconds:
+        return _replica_lag["seconds"]
+    _replica_lag["checked_at"] = now  # Concurrent callers keep the last value meanwhile
+    
     try:
+        async with replica_async_engine.connect() as conn:
+            lag = await conn.scalar(text(
+                "SELECT CASE WHEN NOT pg_is_in_recovery() "
+                "OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+                "ELSE coalesce(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END"
+            ))
+        _replica_lag["seconds"] = float(lag)
+    except Exception as e:
+        print(f"Replica lag check failed: {e}")
+        _replica_lag["seconds"] = float("inf")
+    return _replica_lag["seconds"]
+
+@asynccontextmanager
+async def read_session(fresh: bool = False):
+    """
+    Session for read-only work, on the replica when it is configured and caught up
+    
+    `fresh` reads from the primary instead, for reads that must see a
+    write just made.
+    """
+    async with ReadSessionLocal() as db:
+        db.info["primary"] = fresh or await replica_lag() > settings.db_replica_max_lag_seconds
+        yield db
+
+async def get_db():
+    """Dependency for getting database session"""
+    async with AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
+
+async def get_read_db(fresh: bool = False):
+    """
+    Dependency for read-only routes: a session on the read replica
+    
+    Adds a `fresh` query parameter to the route; ?fresh=true reads from the
+    primary (read-your-writes right after a change).
+    """
+    async with read_session(fresh) as db:
+        yield db
+
+async def uninterrupted(awaitable):
+    """
+    Await a DB round trip that cancelling the calling task must not cut short
+    
+    A cancel landing mid-statement invalidates the connection and can leave
+    its transaction (on SQLite, the write lock) behind. The cancel is
+    re-raised once the round trip is done.
+    """
+    inner = asyncio.ensure_future(awaitable)
+    try:
+        return await asyncio.shield(inner)
+    except asyncio.CancelledError:
+        await asyncio.wait([inner])
+        if not inner.cancelled():
+            inner.exception()  # Retrieved; the cancel wins
+        raise
 
 def init_db():
-    """Initialize database tables"""
-    Base.metadata.create_all(bind=engine)
+    """
+    Bring the schema up to date with the Alembic migrations in alembic/versions
+    
+    A database built by create_all is stamped first: as head when it matches
+    the models, otherwise with the baseline revision (created before
+    migrations existed). Blocking - run in a thread.
+    """
+    import app.models  # noqa: F401 - every table on Base.metadata
+    
+    config = Config(ALEMBIC_INI)
+    config.attributes["configure_logger"] = False
+    
+    tables = inspect(engine).get_table_names()
+    if "users" in tables and "alembic_version" not in tables:
+        with engine.connect() as conn:
+            current = not compare_metadata(MigrationContext.configure(conn), Base.metadata)
+        command.stamp(config, "head" if current else BASELINE_REVISION)
+    command.upgrade(config, "head")
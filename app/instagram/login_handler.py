@@ -7,8 +7,18 @@ from instagrapi.exceptions import (
 )
 from typing import Dict, Optional
 from app.instagram.session_manager import SessionManager
+from contextlib import contextmanager
 import time
 
+@contextmanager
+def timed(timings: Dict[str, int], step: str):
+    """Record wall time of the wrapped block in milliseconds under `step`"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[step] = timings.get(step, 0) + int((time.perf_counter() - start) * 1000)
+
 class LoginHandler:
     """Handles all Instagram login flows"""
     
@@ -58,18 +68,26 @@ class LoginHandler:
         - 2fa_required: Need 2FA code
         - challenge_required: Need challenge verification
         - error: Login failed
+        
+        Every result carries "timings": milliseconds spent in each
+        instagrapi step (init_client, session_load, session_verify, login,
+        session_save)
         """
+        timings = {}
         try:
             # Initialize client
-            cl = self.init_client(proxy_url, device_id, uuid, phone_id)
+            with timed(timings, "init_client"):
+                cl = self.init_client(proxy_url, device_id, uuid, phone_id)
             
             # Try to load existing session
             if self.session_manager.session_exists(username):
-                self.session_manager.load_session(cl, username)
+                with timed(timings, "session_load"):
+                    self.session_manager.load_session(cl, username)
                 
                 # Verify session is still valid
                 try:
-                    cl.get_timeline_feed()
+                    with timed(timings, "session_verify"):
+                        cl.get_timeline_feed()
                     return {
                         "status": "success",
                         "message": "Session restored successfully",
@@ -78,17 +96,20 @@ class LoginHandler:
                             "device_id": cl.device_id,
                             "uuid": cl.uuid,
                             "phone_id": cl.phone_id
-                        }
+                        },
+                        "timings": timings
                     }
                 except LoginRequired:
                     # Session expired, continue with login
                     pass
             
             # Attempt fresh login
-            cl.login(username, password)
+            with timed(timings, "login"):
+                cl.login(username, password)
             
             # Success! Save session
-            self.session_manager.save_session(cl, username)
+            with timed(timings, "session_save"):
+                self.session_manager.save_session(cl, username)
             
             return {
                 "status": "success",
@@ -98,7 +119,8 @@ class LoginHandler:
                     "device_id": cl.device_id,
                     "uuid": cl.uuid,
                     "phone_id": cl.phone_id
-                }
+                },
+                "timings": timings
             }
             
         except TwoFactorRequired:
@@ -111,7 +133,8 @@ class LoginHandler:
                     "device_id": cl.device_id if 'cl' in locals() else None,
                     "uuid": cl.uuid if 'cl' in locals() else None,
                     "phone_id": cl.phone_id if 'cl' in locals() else None
-                }
+                },
+                "timings": timings
             }
             
         except ChallengeRequired as e:
@@ -122,19 +145,23 @@ class LoginHandler:
                     "device_id": cl.device_id if 'cl' in locals() else None,
                     "uuid": cl.uuid if 'cl' in locals() else None,
                     "phone_id": cl.phone_id if 'cl' in locals() else None
-                }
+                },
+                "timings": timings
             }
             
         except BadPassword:
             return {
                 "status": "error",
-                "message": "Incorrect password"
+                "message": "Incorrect password",
+                "error_type": "bad_password",
+                "timings": timings
             }
             
         except Exception as e:
             return {
                 "status": "error",
-                "message": f"Login failed: {str(e)}"
+                "message": f"Login failed: {str(e)}",
+                "timings": timings
             }
     
     def complete_2fa(
@@ -147,18 +174,23 @@ class LoginHandler:
         phone_id: Optional[str] = None
     ) -> Dict:
         """Complete 2FA login"""
+        timings = {}
         try:
             # Reinitialize client with same settings
-            cl = self.init_client(proxy_url, device_id, uuid, phone_id)
+            with timed(timings, "init_client"):
+                cl = self.init_client(proxy_url, device_id, uuid, phone_id)
             
             # Load partial session if exists
-            self.session_manager.load_session(cl, username)
+            with timed(timings, "session_load"):
+                self.session_manager.load_session(cl, username)
             
             # Complete 2FA
-            cl.two_factor_login(verification_code)
+            with timed(timings, "two_factor_login"):
+                cl.two_factor_login(verification_code)
             
             # Save complete session
-            self.session_manager.save_session(cl, username)
+            with timed(timings, "session_save"):
+                self.session_manager.save_session(cl, username)
             
             return {
                 "status": "success",
@@ -168,13 +200,15 @@ class LoginHandler:
                     "device_id": cl.device_id,
                     "uuid": cl.uuid,
                     "phone_id": cl.phone_id
-                }
+                },
+                "timings": timings
             }
             
         except Exception as e:
             return {
                 "status": "error",
-                "message": f"2FA failed: {str(e)}"
+                "message": f"2FA failed: {str(e)}",
+                "timings": timings
             }
     
     def request_challenge_code(
@@ -187,22 +221,28 @@ class LoginHandler:
         phone_id: Optional[str] = None
     ) -> Dict:
         """Request challenge verification code"""
+        timings = {}
         try:
-            cl = self.init_client(proxy_url, device_id, uuid, phone_id)
-            self.session_manager.load_session(cl, username)
+            with timed(timings, "init_client"):
+                cl = self.init_client(proxy_url, device_id, uuid, phone_id)
+            with timed(timings, "session_load"):
+                self.session_manager.load_session(cl, username)
             
             # Request code
-            cl.challenge_code_handler(username, method)
+            with timed(timings, "challenge_code_handler"):
+                cl.challenge_code_handler(username, method)
             
             return {
                 "status": "code_sent",
-                "message": f"Code sent via {'SMS' if method == '1' else 'email'}"
+                "message": f"Code sent via {'SMS' if method == '1' else 'email'}",
+                "timings": timings
             }
             
         except Exception as e:
             return {
                 "status": "error",
-                "message": f"Failed to send code: {str(e)}"
+                "message": f"Failed to send code: {str(e)}",
+                "timings": timings
             }
     
     def complete_challenge(
@@ -215,15 +255,20 @@ class LoginHandler:
         phone_id: Optional[str] = None
     ) -> Dict:
         """Complete challenge verification"""
+        timings = {}
         try:
-            cl = self.init_client(proxy_url, device_id, uuid, phone_id)
-            self.session_manager.load_session(cl, username)
+            with timed(timings, "init_client"):
+                cl = self.init_client(proxy_url, device_id, uuid, phone_id)
+            with timed(timings, "session_load"):
+                self.session_manager.load_session(cl, username)
             
             # Resolve challenge
-            cl.challenge_resolve(username, verification_code)
+            with timed(timings, "challenge_resolve"):
+                cl.challenge_resolve(username, verification_code)
             
             # Save session
-            self.session_manager.save_session(cl, username)
+            with timed(timings, "session_save"):
+                self.session_manager.save_session(cl, username)
             
             return {
                 "status": "success",
@@ -233,11 +278,13 @@ class LoginHandler:
                     "device_id": cl.device_id,
                     "uuid": cl.uuid,
                     "phone_id": cl.phone_id
-                }
+                },
+                "timings": timings
             }
             
         except Exception as e:
             return {
                 "status": "error",
-                "message": f"Challenge failed: {str(e)}"
+                "message": f"Challenge failed: {str(e)}",
+                "timings": timings
             }
@@ -0,0 +1,294 @@
+import httpx
+from typing import IO, Dict, List, Optional
+from pathlib import Path
+from app.config import get_settings
+import asyncio
+import json
+import random
+import threading
+import time
+import uuid
+
+settings = get_settings()
+
+# Outcomes of JavaForwarder._send
+SENT = "sent"
+REJECTED = "rejected"        # 4xx: resending the same batch will not help
+FAILED = "failed"            # 5xx after retries: the backend got the batch and failed on it
+UNREACHABLE = "unreachable"  # Transport errors or 429 after retries
+
+class JavaForwarder:
+    """
+    Forwards inbound ManyChat messages to the Java backend in batches
+    
+    Messages are buffered in memory and flushed when the buffer reaches
+    `batch_size` or every `flush_interval` seconds, over one pooled
+    httpx.AsyncClient. Each enqueued message is also appended to a journal
+    in `spool_dir`, so a crash before the flush loses nothing: the next
+    start spools what the journal holds.
+    
+    A batch that still fails after retries is spooled to `spool_dir` and
+    resent on later flushes, including after a restart. A batch the
+    backend rejects (4xx other than 429) goes to `spool_dir`/dead instead,
+    as does a spooled batch still failing after `spool_max_age` seconds.
+    One forwarder process per `spool_dir`.
+    """
+    
+    def __init__(
+        self,
+        base_url: Optional[str],
+        path: str = "/inbox/messages/batch",
+        batch_size: int = 100,
+        flush_interval: float = 1.0,
+        max_retries: int = 3,
+        backoff_seconds: float = 0.5,
+        timeout: float = 10.0,
+        spool_dir: str = "./outbox",
+        spool_max_age: float = 86400.0
+    ):
+        self.base_url = base_url
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self.timeout = httpx.Timeout(timeout)
+        self.spool_dir = Path(spool_dir)
+        self.dead_letter_dir = self.spool_dir / "dead"
+        self.spool_max_age = spool_max_age
+        
+        self._buffer: List[Dict] = []
+        self._lock = threading.Lock()  # enqueue() is called from webhook worker threads
+        self._journal: Optional[IO[str]] = None
+        self._recovered = False
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._flush_requested: Optional[asyncio.Event] = None
+        self._flush_lock = asyncio.Lock()
+        self._client: Optional[httpx.AsyncClient] = None
+        
+        self.metrics = {
+            "batches_sent": 0,
+            "messages_sent": 0,
+            "batches_failed": 0,
+            "batches_dead_lettered": 0,
+            "last_flush_ms": 0,
+            "max_flush_ms": 0
+        }
+    
+    @property
+    def enabled(self) -> bool:
+        return bool(self.base_url)
+    
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """Shared backend client, created lazily inside the running loop"""
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(base_url=self.base_url, timeout=self.timeout)
+        return self._client
+    
+    def enqueue(self, message: Dict):
+        """Buffer and journal one message; thread-safe"""
+        if not self.enabled:
+            return
+        
+        with self._lock:
+            if self._journal is None:
+                self._recover_journals()
+                self._journal = (self.spool_dir / "buffer.jsonl").open("a")
+            # Flushed to the OS on every message: survives a crash of this
+            # process, not of the machine
+            self._journal.write(json.dumps(message) + "\n")
+            self._journal.flush()
+            self._buffer.append(message)
+            full = len(self._buffer) >= self.batch_size
+        
+        if full and self._loop is not None:
+            self._loop.call_soon_threadsafe(self._flush_requested.set)
+    
+    def stats(self) -> Dict:
+        with self._lock:
+            buffered = len(self._buffer)
+        
+        return {
+            "enabled": self.enabled,
+            "buffered": buffered,
+            "spooled_batches": len(list(self.spool_dir.glob("*.json"))) if self.spool_dir.exists() else 0,
+            "dead_letter_batches": len(list(self.dead_letter_dir.glob("*.json"))) if self.dead_letter_dir.exists() else 0,
+            **self.metrics
+        }
+    
+    def _recover_journals(self):
+        """
+        Spool what journals left by a previous process hold; call with _lock held
+        
+        Those messages were buffered but never flushed (or their flush was cut
+        short), so some may already have been sent: delivery is at least once.
+        """
+        if self._recovered:
+            return
+        self._recovered = True
+        self.spool_dir.mkdir(parents=True, exist_ok=True)
+        
+        for path in sorted(self.spool_dir.glob("buffer*.jsonl")):
+            messages = []
+            for line in path.read_text().splitlines():
+                try:
+                    messages.append(json.loads(line))
+                except ValueError:
+                    pass  # A line cut short by the crash
+            for i in range(0, len(messages), self.batch_size):
+                self._spool(messages[i:i + self.batch_size])
+            path.unlink()
+    
+    def _rotate_journal(self) -> Optional[Path]:
+        """Set the current journal aside for the flush that took its messages; call with _lock held"""
+        if self._journal is None:
+            return None
+        self._journal.close()
+        self._journal = None
+        path = self.spool_dir / f"buffer-{time.time_ns()}.jsonl"
+        (self.spool_dir / "buffer.jsonl").rename(path)
+        return path
+    
+    async def _send(self, batch: List[Dict], retries: Optional[int] = None) -> str:
+        """POST one batch, retrying with exponential backoff; one of the outcomes above"""
+        retries = self.max_retries if retries is None else retries
+        outcome = UNREACHABLE
+        
+        for attempt in range(retries + 1):
+            try:
+                response = await self.client.post(self.path, json={"messages": batch})
+                if response.status_code < 400:
+                    return SENT
+                if response.status_code < 500 and response.status_code != 429:
+                    print(f"Java backend rejected batch: {response.status_code} {response.text}")
+                    return REJECTED
+                outcome = UNREACHABLE if response.status_code == 429 else FAILED
+            except httpx.HTTPError as e:
+                print(f"Java backend unreachable: {e}")
+                outcome = UNREACHABLE
+            
+            if attempt < retries:
+                await asyncio.sleep(self.backoff_seconds * (2 ** attempt) * (0.5 + random.random()))
+        return outcome
+    
+    def _spool(self, batch: List[Dict], directory: Optional[Path] = None):
+        """Write a batch file named <send order>-<spooled at>-<random>.json"""
+        directory = directory or self.spool_dir
+        directory.mkdir(parents=True, exist_ok=True)
+        now = time.time_ns()
+        path = directory / f"{now}-{now}-{uuid.uuid4().hex[:8]}.json"
+        path.write_text(json.dumps(batch))
+    
+    def _dead_letter(self, path: Path):
+        self.dead_letter_dir.mkdir(parents=True, exist_ok=True)
+        path.rename(self.dead_letter_dir / path.name)
+        self.metrics["batches_dead_lettered"] += 1
+        print(f"Java forwarder: batch {path.name} moved to {self.dead_letter_dir}")
+    
+    async def _drain_spool(self) -> bool:
+        """
+        Resend spooled batches oldest first, one attempt each
+        
+        A batch the backend fails on (5xx) moves to the back of the spool so
+        it does not hold up the others; a rejected or expired one goes to
+        the dead-letter directory. Stops early, returning False, when the
+        backend is unreachable or throttling.
+        """
+        if not self.spool_dir.exists():
+            return True
+        
+        for path in sorted(self.spool_dir.glob("*.json")):
+            order, _, rest = path.name.partition("-")
+            # Files spooled before the send order was added are named <spooled at>-<random>.json
+            spooled_at = int(rest.split("-")[0]) if rest.count("-") else int(order)
+            try:
+                batch = json.loads(path.read_text())
+            except ValueError:
+                self._dead_letter(path)
+                continue
+            
+            outcome = await self._send(batch, retries=0)
+            if outcome == SENT:
+                path.unlink()
+                self.metrics["batches_sent"] += 1
+                self.metrics["messages_sent"] += len(batch)
+            elif outcome == REJECTED or time.time_ns() - spooled_at > self.spool_max_age * 1e9:
+                self._dead_letter(path)
+            elif outcome == FAILED:
+                path.rename(self.spool_dir / f"{time.time_ns()}-{spooled_at}-{uuid.uuid4().hex[:8]}.json")
+            else:
+                return False
+        return True
+    
+    async def flush(self):
+        """Send everything buffered (and anything spooled) now"""
+        async with self._flush_lock:
+            with self._lock:
+                self._recover_journals()
+                pending, self._buffer = self._buffer, []
+                journal = self._rotate_journal()
+            
+            sent_before = self.metrics["batches_sent"]
+            start = time.perf_counter()
+            reachable = await self._drain_spool()
+            
+            for i in range(0, len(pending), self.batch_size):
+                batch = pending[i:i + self.batch_size]
+                # Straight to the spool while the backend is unreachable
+                outcome = await self._send(batch) if reachable else UNREACHABLE
+                if outcome == SENT:
+                    self.metrics["batches_sent"] += 1
+                    self.metrics["messages_sent"] += len(batch)
+                elif outcome == REJECTED:
+                    self.metrics["batches_dead_lettered"] += 1
+                    self._spool(batch, self.dead_letter_dir)
+                else:
+                    reachable = reachable and outcome != UNREACHABLE
+                    self.metrics["batches_failed"] += 1
+                    self._spool(batch)
+            
+            # Every message it held is now sent, spooled or dead-lettered
+            if journal is not None:
+                journal.unlink()
+            
+            if self.metrics["batches_sent"] != sent_before:
+                elapsed_ms = int((time.perf_counter() - start) * 1000)
+                self.metrics["last_flush_ms"] = elapsed_ms
+                self.metrics["max_flush_ms"] = max(self.metrics["max_flush_ms"], elapsed_ms)
+    
+    async def run(self):
+        """Background job started on app startup"""
+        self._loop = asyncio.get_running_loop()
+        self._flush_requested = asyncio.Event()
+        
+        while True:
+            try:
+                await asyncio.wait_for(self._flush_requested.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._flush_requested.clear()
+            
+            try:
+                await self.flush()
+            except Exception as e:
+                print(f"Java forwarder flush failed: {e}")
+    
+    async def aclose(self):
+        """Flush what is left (spooling on failure) and close the client"""
+        if self.enabled:
+            await self.flush()
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+# Singleton instance
+java_forwarder = JavaForwarder(
+    base_url=settings.java_backend_url,
+    path=settings.java_forward_path,
+    batch_size=settings.java_forward_batch_size,
+    flush_interval=settings.java_forward_flush_seconds,
+    max_retries=settings.java_forward_max_retries,
+    spool_dir=settings.java_forward_spool_dir,
+    spool_max_age=settings.java_forward_spool_max_age_hours * 3600
+)
@@ -1,22 +1,126 @@
-import requests
+import httpx
 from typing import Dict, Optional
+from app.utils.rate_limiter import RateLimiter
+from app.config import get_settings
+import asyncio
+import random
+
+settings = get_settings()
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# Failures where the request never reached ManyChat: safe to retry even
+# when repeating it would act twice (sending a message, creating a subscriber)
+NOT_SENT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
 
 class ManyChatHandler:
     """
     Handles ManyChat API integration
     
     Docs: https://api.manychat.com/docs
+    
+    Calls share one pooled httpx.AsyncClient, are paced by client-side rate
+    limiters matching ManyChat's API limits (sending has its own, higher
+    limit) and are retried with exponential backoff on 429/5xx and
+    connection errors. Calls that must not run twice are not retried after
+    a read timeout or a dropped connection, when ManyChat may have acted.
     """
     
-    def __init__(self, api_key: str):
+    def __init__(
+        self,
+        api_key: str,
+        base_url: str = "https://api.manychat.com",
+        timeout: float = 10.0,
+        connect_timeout: float = 5.0,
+        max_connections: int = 50,
+        max_keepalive_connections: int = 20,
+        max_retries: int = 3,
+        backoff_seconds: float = 0.5,
+        rate_per_second: float = 10.0,
+        send_rate_per_second: float = 25.0,
+        max_retry_after: float = 30.0
+    ):
         self.api_key = api_key
-        self.base_url = "https://api.manychat.com"
+        self.base_url = base_url
         self.headers = {
             "Authorization": f"Bearer {api_key}",
             "Content-Type": "application/json"
         }
+        self.timeout = httpx.Timeout(timeout, connect=connect_timeout)
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections
+        )
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self.max_retry_after = max_retry_after
+        self.limiter = RateLimiter(rate_per_second, burst=max(1, int(rate_per_second)))
+        self.send_limiter = RateLimiter(send_rate_per_second, burst=max(1, int(send_rate_per_second)))
+        self._client: Optional[httpx.AsyncClient] = None
+    
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """Shared API client, created lazily inside the running loop"""
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                headers=self.headers,
+                timeout=self.timeout,
+                limits=self.limits
+            )
+        return self._client
     
-    def create_subscriber(
+    async def aclose(self):
+        """Close pooled connections (called on app shutdown)"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+    
+    def _retry_delay(self, attempt: int, response: Optional[httpx.Response] = None) -> float:
+        """Retry-After (capped at max_retry_after) when ManyChat sends one, otherwise exponential backoff with jitter"""
+        if response is not None:
+            try:
+                return min(max(float(response.headers["Retry-After"]), 0.0), self.max_retry_after)
+            except (KeyError, ValueError):
+                pass
+        return self.backoff_seconds * (2 ** attempt) * (0.5 + random.random())
+    
+    async def _request(
+        self,
+        method: str,
+        path: str,
+        limiter: Optional[RateLimiter] = None,
+        idempotent: bool = True,
+        **kwargs
+    ) -> httpx.Response:
+        """
+        Rate-limited request with retries
+        
+        With `idempotent=False` only NOT_SENT_ERRORS and retryable statuses
+        are retried. Raises httpx.HTTPError once retries are exhausted or
+        on a non-retryable error.
+        """
+        limiter = limiter or self.limiter
+        retryable = httpx.TransportError if idempotent else NOT_SENT_ERRORS
+        
+        for attempt in range(self.max_retries + 1):
+            await limiter.acquire()
+            try:
+                response = await self.client.request(method, path, **kwargs)
+            except retryable:
+                if attempt == self.max_retries:
+                    raise
+                await asyncio.sleep(self._retry_delay(attempt))
+                continue
+            
+            if response.status_code in RETRY_STATUSES and attempt < self.max_retries:
+                await asyncio.sleep(self._retry_delay(attempt, response))
+                continue
+            
+            response.raise_for_status()
+            return response
+    
+    async def create_subscriber(
         self,
         instagram_user_id: str,
         instagram_username: str,
@@ -29,8 +133,6 @@ class ManyChatHandler:
         
         This links the Instagram user to your ManyChat account
         """
-        url = f"{self.base_url}/fb/subscriber/createSubscriber"
-        
         payload = {
             "psid": instagram_user_id,  # Instagram User ID
             "whitelisted": True,
@@ -41,28 +143,27 @@ class ManyChatHandler:
             "has_opt_in_sms": False,
             "has_opt_in_email": bool(email),
             "consent_phrase": "GES Instagram Automation",
-            "custom_fields": [
-                {
-                    "id": 12345,  # Your custom field ID
-                    "value": instagram_username
-                }
-            ]
+            "custom_fields": []
         }
+        if settings.manychat_username_field_id:
+            payload["custom_fields"].append({
+                "id": settings.manychat_username_field_id,
+                "value": instagram_username
+            })
         
         try:
-            response = requests.post(url, json=payload, headers=self.headers)
-            response.raise_for_status()
+            response = await self._request("POST", "/fb/subscriber/createSubscriber", idempotent=False, json=payload)
             return {
                 "status": "success",
                 "data": response.json()
             }
-        except requests.exceptions.HTTPError as e:
+        except httpx.HTTPError as e:
             return {
                 "status": "error",
                 "message": f"Failed to create subscriber: {str(e)}"
             }
     
-    def send_message(
+    async def send_message(
         self,
         subscriber_id: str,
         message: str,
@@ -73,8 +174,6 @@ class ManyChatHandler:
         
         Tags: ACCOUNT_UPDATE, CONFIRMED_EVENT_UPDATE, POST_PURCHASE_UPDATE, etc.
         """
-        url = f"{self.base_url}/fb/sending/sendContent"
-        
         payload = {
             "subscriber_id": subscriber_id,
             "data": {
@@ -92,63 +191,82 @@ class ManyChatHandler:
         }
         
         try:
-            response = requests.post(url, json=payload, headers=self.headers)
-            response.raise_for_status()
+            response = await self._request(
+                "POST",
+                "/fb/sending/sendContent",
+                limiter=self.send_limiter,
+                idempotent=False,
+                json=payload
+            )
             return {
                 "status": "success",
                 "data": response.json()
             }
-        except requests.exceptions.HTTPError as e:
+        except httpx.HTTPError as e:
             return {
                 "status": "error",
                 "message": f"Failed to send message: {str(e)}"
             }
     
-    def get_subscriber_info(self, subscriber_id: str) -> Dict:
+    async def get_subscriber_info(self, subscriber_id: str) -> Dict:
         """
         Get subscriber information
         """
-        url = f"{self.base_url}/fb/subscriber/getInfo"
-        
         params = {"subscriber_id": subscriber_id}
         
         try:
-            response = requests.get(url, params=params, headers=self.headers)
-            response.raise_for_status()
+            response = await self._request("GET", "/fb/subscriber/getInfo", params=params)
             return {
                 "status": "success",
                 "data": response.json()
             }
-        except requests.exceptions.HTTPError as e:
+        except httpx.HTTPError as e:
             return {
                 "status": "error",
                 "message": f"Failed to get subscriber: {str(e)}"
             }
     
-    def add_tag(self, subscriber_id: str, tag_name: str) -> Dict:
+    async def add_tag(self, subscriber_id: str, tag_name: str) -> Dict:
         """
         Add a tag to subscriber (for segmentation)
         """
-        url = f"{self.base_url}/fb/subscriber/addTag"
-        
         payload = {
             "subscriber_id": subscriber_id,
             "tag_name": tag_name
         }
         
         try:
-            response = requests.post(url, json=payload, headers=self.headers)
-            response.raise_for_status()
+            await self._request("POST", "/fb/subscriber/addTag", json=payload)
             return {
                 "status": "success"
             }
-        except requests.exceptions.HTTPError as e:
+        except httpx.HTTPError as e:
             return {
                 "status": "error",
                 "message": f"Failed to add tag: {str(e)}"
             }
     
-    def set_custom_field(
+    async def remove_tag(self, subscriber_id: str, tag_name: str) -> Dict:
+        """
+        Remove a tag from subscriber
+        """
+        payload = {
+            "subscriber_id": subscriber_id,
+            "tag_name": tag_name
+        }
+        
+        try:
+            await self._request("POST", "/fb/subscriber/removeTag", json=payload)
+            return {
+                "status": "success"
+            }
+        except httpx.HTTPError as e:
+            return {
+                "status": "error",
+                "message": f"Failed to remove tag: {str(e)}"
+            }
+    
+    async def set_custom_field(
         self,
         subscriber_id: str,
         field_id: int,
@@ -163,8 +281,6 @@ class ManyChatHandler:
         - VIP status
         - etc.
         """
-        url = f"{self.base_url}/fb/subscriber/setCustomField"
-        
         payload = {
             "subscriber_id": subscriber_id,
             "field_id": field_id,
@@ -172,13 +288,24 @@ class ManyChatHandler:
         }
         
         try:
-            response = requests.post(url, json=payload, headers=self.headers)
-            response.raise_for_status()
+            await self._request("POST", "/fb/subscriber/setCustomField", json=payload)
             return {
                 "status": "success"
             }
-        except requests.exceptions.HTTPError as e:
+        except httpx.HTTPError as e:
             return {
                 "status": "error",
                 "message": f"Failed to set custom field: {str(e)}"
             }
+
+# Singleton instance
+manychat = ManyChatHandler(
+    api_key=settings.manychat_api_key,
+    base_url=settings.manychat_api_url,
+    timeout=settings.manychat_timeout,
+    max_connections=settings.manychat_max_connections,
+    max_retries=settings.manychat_max_retries,
+    rate_per_second=settings.manychat_rate_per_second,
+    send_rate_per_second=settings.manychat_send_rate_per_second,
+    max_retry_after=settings.manychat_max_retry_after_seconds
+)
@@ -1,10 +1,23 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from app.database import init_db, engine, Base
-from app.routes import onboarding, admin, settings, dm  
+from app.database import init_db, async_engine, replica_async_engine
+from app.routes import onboarding, admin, settings, dm, manychat
 from app.config import get_settings
+from app.utils.proxy_manager import proxy_manager
+from app.integrations.manychat_handler import manychat as manychat_handler
+from app.integrations.java_forwarder import java_forwarder
+from app.workers.user_activity import user_activity
+from app.workers.manychat_broadcast import stop_broadcasts
+from app.workers.manychat_sync import stop_resync
+from app.workers.proxy_health import run_proxy_health_loop
+from app.workers.proxy_pool import run_proxy_pool_loop
+from app.workers.proxy_renewal import run_proxy_renewal_loop
+from app.workers.login_retention import run_login_partition_loop, run_login_retention_loop
+from app.workers.manychat_webhooks import run_webhook_worker, load_subscriber_index
+import asyncio
 
 settings_config = get_settings()
+background_tasks = []
 
 app = FastAPI(
     title="GES Instagram Automation API",
@@ -25,7 +38,8 @@ app.add_middleware(
 app.include_router(onboarding.router)
 app.include_router(admin.router)
 app.include_router(settings.router)
-app.include_router(dm.router)  
+app.include_router(dm.router)
+app.include_router(manychat.router)
 
 @app.get("/")
 async def root():
@@ -37,6 +51,7 @@ async def root():
             "onboarding": "/api/onboarding/*",
             "admin": "/api/admin/*",
             "dm": "/api/dm/*",
+            "manychat": "/api/manychat/*",
             "docs": "/docs"
         }
     }
@@ -47,6 +62,42 @@ async def health_check():
 
 @app.on_event("startup")
 async def startup_event():
-    print("Creating database tables...")
-    Base.metadata.create_all(bind=engine)
+    print("Running database migrations...")
+    await asyncio.to_thread(init_db)
     print("Database initialized successfully!")
+    
+    loaded = await asyncio.to_thread(load_subscriber_index)
+    print(f"Loaded {loaded} ManyChat subscribers into the index")
+    
+    if settings_config.proxy_health_enabled:
+        background_tasks.append(asyncio.create_task(run_proxy_health_loop()))
+    if settings_config.proxy_pool_enabled:
+        background_tasks.append(asyncio.create_task(run_proxy_pool_loop()))
+    if settings_config.proxy_renewal_enabled:
+        background_tasks.append(asyncio.create_task(run_proxy_renewal_loop()))
+    if settings_config.login_retention_enabled:
+        background_tasks.append(asyncio.create_task(run_login_retention_loop()))
+    # Independent of retention: inserts past the last monthly partition land in the default one
+    background_tasks.append(asyncio.create_task(run_login_partition_loop()))
+    for worker_id in range(settings_config.manychat_webhook_workers):
+        background_tasks.append(asyncio.create_task(run_webhook_worker(worker_id)))
+    if java_forwarder.enabled:
+        background_tasks.append(asyncio.create_task(java_forwarder.run()))
+    background_tasks.append(asyncio.create_task(user_activity.run()))
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    for task in background_tasks:
+        task.cancel()
+    await asyncio.gather(*background_tasks, return_exceptions=True)
+    background_tasks.clear()
+    
+    await stop_broadcasts()
+    await stop_resync()
+    await java_forwarder.aclose()
+    await user_activity.aclose()
+    await proxy_manager.aclose()
+    await manychat_handler.aclose()
+    await async_engine.dispose()
+    if replica_async_engine is not None:
+        await replica_async_engine.dispose()
@@ -1 +1,18 @@
-from app.models.user import User, LoginAttempt, UserStatus, OnboardingStage
+from app.models.user import (
+    User,
+    LoginAttempt,
+    LoginAttemptDaily,
+    LoginStepTiming,
+    OnboardingStageTransition,
+    UserStatus,
+    OnboardingStage
+)
+from app.models.proxy import Proxy, ProxyStatus, ProxyHealthCheck
+from app.models.manychat import (
+    ManyChatEvent,
+    WebhookEventStatus,
+    ManyChatTag,
+    ManyChatFieldValue,
+    ManyChatBroadcast,
+    BroadcastStatus
+)
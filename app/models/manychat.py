@@ -0,0 +1,78 @@
+from sqlalchemy import Column, Integer, String, DateTime, Enum, Text, Index, ForeignKey, UniqueConstraint
+from datetime import datetime
+import enum
+from app.database import Base
+
+class WebhookEventStatus(enum.Enum):
+    PENDING = "pending"           # Acknowledged, waiting for a worker
+    DONE = "done"                 # Processed
+    FAILED = "failed"             # Gave up after max attempts
+
+class ManyChatEvent(Base):
+    """Raw ManyChat webhook deliveries, queued for the webhook workers"""
+    __tablename__ = "manychat_events"
+    __table_args__ = (
+        Index("ix_manychat_events_status_id", "status", "id"),
+    )
+    
+    id = Column(Integer, primary_key=True)
+    event_key = Column(String(64), unique=True, nullable=False)  # See event_key() in app/workers/manychat_webhooks.py
+    event_type = Column(String(50), nullable=True)
+    payload = Column(Text, nullable=False)  # Body exactly as received
+    status = Column(Enum(WebhookEventStatus), default=WebhookEventStatus.PENDING, nullable=False)
+    attempts = Column(Integer, default=0, nullable=False)
+    error = Column(Text, nullable=True)
+    received_at = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)
+    processed_at = Column(DateTime, nullable=True)
+
+class ManyChatTag(Base):
+    """Tags we have applied to a user's ManyChat subscriber, for local segmentation"""
+    __tablename__ = "manychat_tags"
+    __table_args__ = (
+        UniqueConstraint("user_id", "tag", name="uq_manychat_tags_user_tag"),
+        Index("ix_manychat_tags_tag_user", "tag", "user_id"),
+    )
+    
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    tag = Column(String(100), nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+class ManyChatFieldValue(Base):
+    """Custom field values last pushed to a user's ManyChat subscriber"""
+    __tablename__ = "manychat_field_values"
+    __table_args__ = (
+        UniqueConstraint("user_id", "field_id", name="uq_manychat_field_values_user_field"),
+    )
+    
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    field_id = Column(Integer, nullable=False)  # ManyChat custom field ID
+    value = Column(Text, nullable=True)
+    synced_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+class BroadcastStatus(enum.Enum):
+    RUNNING = "running"
+    DONE = "done"
+    CANCELLED = "cancelled"
+    FAILED = "failed"             # Crashed or interrupted by a restart
+
+class ManyChatBroadcast(Base):
+    """A message sent to every user matching a filter, with its progress"""
+    __tablename__ = "manychat_broadcasts"
+    
+    id = Column(Integer, primary_key=True)
+    message = Column(Text, nullable=False)
+    message_tag = Column(String(50), nullable=False)
+    filters = Column(Text, nullable=False)  # JSON: chatbot_enabled, city, tags
+    status = Column(Enum(BroadcastStatus), default=BroadcastStatus.RUNNING, nullable=False)
+    
+    # Progress, committed after every chunk
+    total = Column(Integer, nullable=True)
+    sent = Column(Integer, default=0, nullable=False)
+    failed = Column(Integer, default=0, nullable=False)
+    last_user_id = Column(Integer, default=0, nullable=False)  # Keyset cursor
+    last_error = Column(Text, nullable=True)
+    
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    finished_at = Column(DateTime, nullable=True)
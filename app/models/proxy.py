@@ -0,0 +1,54 @@
+from sqlalchemy import Column, Integer, String, DateTime, Enum, Boolean, Text, Float, Index
+from datetime import datetime
+import enum
+from app.database import Base
+
+class ProxyStatus(enum.Enum):
+    AVAILABLE = "available"       # Purchased, waiting in the warm pool
+    ASSIGNED = "assigned"         # Given to a user on approval
+    RETIRED = "retired"           # Expired, released or replaced
+
+class Proxy(Base):
+    """Every proxy we have purchased, whether pooled or assigned"""
+    __tablename__ = "proxies"
+    __table_args__ = (
+        Index("ix_proxies_city_status", "city", "status"),
+        Index("ix_proxies_status_expires_at", "status", "expires_at"),
+    )
+    
+    id = Column(Integer, primary_key=True)
+    provider_id = Column(String(255), unique=True, nullable=False)
+    proxy_url = Column(Text, nullable=False)
+    city = Column(String(100), nullable=False)
+    status = Column(Enum(ProxyStatus), default=ProxyStatus.AVAILABLE, nullable=False)
+    
+    # Assignment
+    user_id = Column(Integer, nullable=True, index=True)
+    assigned_at = Column(DateTime, nullable=True)
+    
+    # Rolling quality stats (exponentially weighted, see app/utils/proxy_scoring.py)
+    latency_ms = Column(Float, nullable=True)
+    error_rate = Column(Float, default=0.0, nullable=False)          # Failed health probes
+    login_failure_rate = Column(Float, default=0.0, nullable=False)  # Logins failing through this proxy
+    checkpoint_rate = Column(Float, default=0.0, nullable=False)     # Logins hitting an Instagram challenge
+    probe_count = Column(Integer, default=0, nullable=False)
+    login_count = Column(Integer, default=0, nullable=False)
+    score = Column(Float, nullable=True)  # 0-100, higher is better; None until first probe
+    scored_at = Column(DateTime, nullable=True)
+    
+    # Timestamps
+    purchased_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    expires_at = Column(DateTime, nullable=True)
+
+class ProxyHealthCheck(Base):
+    """History of proxy health probes run by the fleet checker"""
+    __tablename__ = "proxy_health_checks"
+    
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, nullable=True, index=True)
+    proxy_url = Column(Text, nullable=False)
+    healthy = Column(Boolean, nullable=False)
+    latency_ms = Column(Integer, nullable=True)
+    exit_ip = Column(String(64), nullable=True)
+    error = Column(Text, nullable=True)
+    checked_at = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)
@@ -1,4 +1,5 @@
-from sqlalchemy import Column, Integer, String, DateTime, Enum, Boolean, Text
+from sqlalchemy import Column, Integer, BigInteger, String, DateTime, Date, Enum, Boolean, Text, ForeignKey, Index, UniqueConstraint
+from sqlalchemy.orm import relationship
 from datetime import datetime
 import enum
 from app.database import Base
@@ -19,9 +20,16 @@ class OnboardingStage(enum.Enum):
 
 class User(Base):
     __tablename__ = "users"
+    __table_args__ = (
+        # Admin lists (/users, /pending-users): newest first, keyset on (created_at, id)
+        Index("ix_users_status_created_at_id", "status", "created_at", "id"),
+        Index("ix_users_created_at_id", "created_at", "id"),
+        # Batch approval (by city, oldest first) and warm pool targets (pending per city)
+        Index("ix_users_status_city_created_at", "status", "city", "created_at"),
+    )
     
     # Primary key
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True)
     
     # Application data
     email = Column(String(255), unique=True, nullable=False, index=True)
@@ -47,12 +55,16 @@ class User(Base):
     # Status tracking
     status = Column(Enum(UserStatus), default=UserStatus.PENDING, nullable=False)
     onboarding_stage = Column(Enum(OnboardingStage), nullable=True)
+    onboarding_stage_entered_at = Column(DateTime, nullable=True)
     
     # Timestamps
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
     approved_at = Column(DateTime, nullable=True)
     last_login_at = Column(DateTime, nullable=True)
-    last_activity_at = Column(DateTime, nullable=True)
+    last_activity_at = Column(DateTime, nullable=True)  # Written behind, see app/workers/user_activity.py
+    
+    # Activity counters (written behind with last_activity_at)
+    dms_sent = Column(Integer, nullable=False, default=0, server_default="0")
     
     # Challenge/Checkpoint tracking
     checkpoint_count = Column(Integer, default=0)
@@ -61,22 +73,72 @@ class User(Base):
     # Account health
     is_active = Column(Boolean, default=True)
     ban_reason = Column(Text, nullable=True)
-
+    
     # ManyChat Integration
-    manychat_subscriber_id = Column(String(255), nullable=True, unique=True)
+    manychat_subscriber_id = Column(String(255), nullable=True, unique=True, index=True)
     manychat_connected_at = Column(DateTime, nullable=True)
     chatbot_enabled = Column(Boolean, default=False)
     
+    # Optimistic concurrency: ORM updates only apply to the version they read (StaleDataError otherwise)
+    version_id = Column(Integer, nullable=False, server_default="1")
+    __mapper_args__ = {"version_id_col": version_id}
+    
     def __repr__(self):
         return f"<User {self.instagram_username} - {self.status.value}>"
 
 class LoginAttempt(Base):
     """Track all login attempts for debugging"""
     __tablename__ = "login_attempts"
+    __table_args__ = (
+        # A user's attempts by time; also serves plain user_id lookups
+        Index("ix_login_attempts_user_id_created_at", "user_id", "created_at"),
+    )
     
     id = Column(Integer, primary_key=True)
-    user_id = Column(Integer, nullable=False, index=True)
+    user_id = Column(Integer, nullable=False)
     attempt_type = Column(String(50))  # password, 2fa, challenge
     success = Column(Boolean, default=False)
     error_message = Column(Text, nullable=True)
+    duration_ms = Column(Integer, nullable=True)  # Total time spent in LoginHandler
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)  # Recent-window stats
+    
+    # Lets one flush insert an attempt and its timings (attempt_id comes from the INSERT)
+    step_timings = relationship("LoginStepTiming", passive_deletes=True)
+
+class LoginAttemptDaily(Base):
+    """Per-user daily counts of login attempts, kept after the raw rows are deleted"""
+    __tablename__ = "login_attempts_daily"
+    __table_args__ = (
+        # Upsert target of the rollup; also serves a user's history by day
+        UniqueConstraint("user_id", "day", "attempt_type", name="uq_login_attempts_daily_user_day_type"),
+    )
+    
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, nullable=False)
+    day = Column(Date, nullable=False)
+    attempt_type = Column(String(50), nullable=False)  # "unknown" for attempts without one
+    attempts = Column(Integer, nullable=False, default=0)
+    succeeded = Column(Integer, nullable=False, default=0)
+    duration_ms = Column(BigInteger, nullable=False, default=0)  # Sum over timed attempts
+    timed = Column(Integer, nullable=False, default=0)           # Attempts with a duration_ms
+
+class LoginStepTiming(Base):
+    """Duration of each instagrapi call made during a login attempt"""
+    __tablename__ = "login_step_timings"
+    
+    id = Column(Integer, primary_key=True)
+    attempt_id = Column(Integer, ForeignKey("login_attempts.id", ondelete="CASCADE"), nullable=False, index=True)
+    step = Column(String(50), nullable=False, index=True)  # init_client, session_load, login, two_factor_login, ...
+    duration_ms = Column(Integer, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+class OnboardingStageTransition(Base):
+    """Time a user spent in an onboarding stage before moving to the next one"""
+    __tablename__ = "onboarding_stage_transitions"
+    
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, nullable=False, index=True)
+    from_stage = Column(Enum(OnboardingStage), nullable=True)  # None = approved, not started yet
+    to_stage = Column(Enum(OnboardingStage), nullable=False)
+    duration_ms = Column(Integer, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
@@ -1,32 +1,141 @@
-from fastapi import APIRouter, HTTPException, Depends
-from sqlalchemy.orm import Session
-from pydantic import BaseModel
-from app.database import get_db
-from app.models import User, UserStatus
-from app.utils.proxy_manager import ProxyManager
+from fastapi import APIRouter, HTTPException, Depends, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+from sqlalchemy import select, func, distinct, or_, case
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+from pydantic import BaseModel, ValidationError
+from app.database import get_db, get_read_db, read_session
+from app.models import (
+    User,
+    UserStatus,
+    OnboardingStage,
+    Proxy,
+    ProxyStatus,
+    LoginAttempt,
+    LoginStepTiming,
+    OnboardingStageTransition
+)
+from app.utils.proxy_manager import proxy_manager
+from app.workers.proxy_health import proxy_health_cache, check_fleet
+from app.workers.proxy_pool import (
+    assign_pooled_proxy,
+    ensure_available,
+    pool_targets,
+    refill_pool,
+    request_refill
+)
+from app.workers.proxy_renewal import renew_expiring_proxies
+from app.workers.login_retention import purge_login_attempts
+from app.workers.manychat_webhooks import queue_metrics
+from app.integrations.java_forwarder import java_forwarder
+from app.workers.user_activity import user_activity
+from app.utils.subscriber_index import subscriber_index
+from app.utils.pagination import keyset_page, split_page
+from app.utils.application_import import FORMATS, iter_applications, iter_lines
+from app.utils.export import EXPORT_MEDIA_TYPES, encode_rows, export_headers
+from app.utils.user_loader import commit_user, user_identities
+from app.routes.onboarding import ApplicationRequest
+from app.utils.cache import SingleFlightCache
 from app.config import get_settings
-from datetime import datetime
-from typing import List
+from datetime import datetime, timedelta
+from typing import List, Optional
+from collections import Counter
+import asyncio
 
 router = APIRouter(prefix="/api/admin", tags=["admin"])
 settings = get_settings()
-proxy_manager = ProxyManager(
-    api_key=settings.proxy_provider_api_key,
-    api_url=settings.proxy_provider_url
-)
+
+MAX_PAGE_SIZE = 500  # User listings
+
+# Fleet stats snapshot shared by every dashboard, see get_fleet_stats
+stats_cache = SingleFlightCache(ttl=settings.admin_stats_ttl_seconds)
 
 class ApprovalRequest(BaseModel):
     use_mock_proxy: bool = False  # For testing
 
+class BulkApprovalRequest(BaseModel):
+    # Select by explicit ids and/or a filter; at least one is required
+    user_ids: Optional[List[int]] = None
+    city: Optional[str] = None
+    applied_before: Optional[datetime] = None
+    limit: int = 500
+    use_mock_proxy: bool = False  # For testing
+
+class ChatbotToggleRequest(BaseModel):
+    enabled: bool
+
+def _page_limit(limit: int) -> int:
+    if not 1 <= limit <= MAX_PAGE_SIZE:
+        raise HTTPException(status_code=400, detail=f"limit must be between 1 and {MAX_PAGE_SIZE}")
+    return limit
+
+def _user_filters(status: Optional[str], city: Optional[str], stage: Optional[str]) -> List:
+    """WHERE conditions for the user listings; 400 for an unknown status/stage"""
+    conditions = []
+    
+    if status:
+        try:
+            conditions.append(User.status == UserStatus[status.upper()])
+        except KeyError:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Invalid status. Valid options: {[s.value for s in UserStatus]}"
+            )
+    if city:
+        conditions.append(User.city == city)
+    if stage:
+        try:
+            conditions.append(User.onboarding_stage == OnboardingStage(stage))
+        except ValueError:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Invalid stage. Valid options: {[s.value for s in OnboardingStage]}"
+            )
+    
+    return conditions
+
+async def _list_page(db: AsyncSession, columns: List, conditions: List, cursor: Optional[str], limit: int, include_total: bool):
+    """One newest-first page of users; (rows, next_cursor, total or None)"""
+    try:
+        query = keyset_page(select(*columns).where(*conditions), User.created_at, User.id, cursor, limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    rows, next_cursor = split_page((await db.execute(query)).all(), limit)
+    
+    total = None
+    if include_total:
+        total = await db.scalar(select(func.count(User.id)).where(*conditions))
+    
+    return rows, next_cursor, total
+
 @router.get("/pending-users")
-async def get_pending_users(db: Session = Depends(get_db)):
-    """Get all users waiting for approval"""
-    users = db.query(User).filter(
-        User.status == UserStatus.PENDING
-    ).order_by(User.created_at.desc()).all()
+async def get_pending_users(
+    city: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = 50,
+    include_total: bool = False,
+    db: AsyncSession = Depends(get_read_db)
+):
+    """
+    Users waiting for approval, newest first
+    
+    Paginated: pass the returned `next_cursor` as `cursor` for the next page.
+    `total` is only counted when `include_total=true`.
+    """
+    rows, next_cursor, total = await _list_page(
+        db,
+        [User.id, User.email, User.instagram_username, User.city, User.created_at],
+        _user_filters("pending", city, None),
+        cursor,
+        _page_limit(limit),
+        include_total
+    )
     
     return {
-        "count": len(users),
+        "count": len(rows),
+        "total": total,
+        "next_cursor": next_cursor,
         "users": [
             {
                 "id": u.id,
@@ -35,7 +144,7 @@ async def get_pending_users(db: Session = Depends(get_db)):
                 "city": u.city,
                 "applied_at": u.created_at.isoformat()
             }
-            for u in users
+            for u in rows
         ]
     }
 
@@ -43,14 +152,16 @@ async def get_pending_users(db: Session = Depends(get_db)):
 async def approve_user(
     user_id: int,
     req: ApprovalRequest,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """
-    Approve user and purchase proxy
+    Approve user and assign a proxy from the warm pool
     
-    This is the CRITICAL step that enables user onboarding
+    This is the CRITICAL step that enables user onboarding. Proxies are
+    bought ahead of time by the pool refill job, so approval is a pure
+    DB operation and never waits on the provider.
     """
-    user = db.query(User).filter(User.id == user_id).first()
+    user = await db.get(User, user_id, with_for_update=True)
     
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
@@ -61,35 +172,33 @@ async def approve_user(
             detail=f"User status is {user.status.value}, not pending"
         )
     
-    # Buy proxy for user's city
     if req.use_mock_proxy:
         # For testing
         proxy_result = await proxy_manager.get_mock_proxy_for_testing(user.city)
-    else:
-        # Production: buy real proxy
-        proxy_result = await proxy_manager.buy_mobile_proxy(user.city)
+        user.proxy_url = proxy_result["proxy_url"]
+        user.proxy_provider_id = proxy_result["provider_id"]
+        user.proxy_city = proxy_result["city"]
+    elif not await db.run_sync(assign_pooled_proxy, user):
+        # Read before rollback expires the object
+        detail = f"No proxy available for {user.city} yet. The pool is being refilled, please retry shortly."
+        await db.rollback()
+        request_refill()
+        raise HTTPException(status_code=503, detail=detail)
     
-    if not proxy_result["success"]:
-        raise HTTPException(
-            status_code=500,
-            detail=f"Failed to purchase proxy: {proxy_result.get('error')}"
-        )
-    
-    # Update user with proxy info
-    user.proxy_url = proxy_result["proxy_url"]
-    user.proxy_provider_id = proxy_result["provider_id"]
-    user.proxy_city = proxy_result["city"]
     user.status = UserStatus.APPROVED
     user.approved_at = datetime.utcnow()
     
-    db.commit()
-    db.refresh(user)
+    await commit_user(db)
+    await db.refresh(user)
+    
+    # Top the pool back up for the next approval
+    request_refill()
     
     # TODO: Send email to user: "Your account is approved! Start onboarding here..."
     
     return {
         "status": "success",
-        "message": f"User approved and proxy purchased for {user.city}",
+        "message": f"User approved and proxy assigned for {user.city}",
         "data": {
             "user_id": user.id,
             "instagram_username": user.instagram_username,
@@ -98,28 +207,284 @@ async def approve_user(
         }
     }
 
-@router.get("/users")
-async def get_all_users(
-    status: str = None,
-    db: Session = Depends(get_db)
+@router.post("/approve-bulk")
+async def approve_users_bulk(
+    req: BulkApprovalRequest,
+    db: AsyncSession = Depends(get_db)
 ):
-    """Get all users, optionally filtered by status"""
-    query = db.query(User)
+    """
+    Approve many pending users at once
     
-    if status:
+    Missing pool proxies for the selected cities are bought concurrently
+    (PROXY_POOL_PURCHASE_CONCURRENCY at a time), then approvals are
+    committed in batches of BULK_APPROVE_BATCH_SIZE. A user that cannot be
+    approved is reported in the results and does not affect the others.
+    """
+    if not (req.user_ids or req.city or req.applied_before):
+        raise HTTPException(
+            status_code=400,
+            detail="Provide user_ids or a filter (city, applied_before)"
+        )
+    
+    query = select(User.id, User.city).where(User.status == UserStatus.PENDING)
+    if req.user_ids:
+        query = query.where(User.id.in_(req.user_ids))
+    if req.city:
+        query = query.where(User.city == req.city)
+    if req.applied_before:
+        query = query.where(User.created_at < req.applied_before)
+    candidates = (await db.execute(query.order_by(User.created_at).limit(req.limit))).all()
+    
+    results = {}
+    for user_id in req.user_ids or []:
+        results[user_id] = {"user_id": user_id, "status": "error", "error": "User not found or not pending"}
+    
+    if not req.use_mock_proxy:
+        purchase = await ensure_available(Counter(c.city for c in candidates))
+        if purchase["failed"]:
+            print(f"Bulk approval: {purchase['failed']} proxy purchases failed")
+    
+    batch_size = settings.bulk_approve_batch_size
+    for i in range(0, len(candidates), batch_size):
+        batch_ids = [c.id for c in candidates[i:i + batch_size]]
+        batch_results = {}
+        
         try:
-            status_enum = UserStatus[status.upper()]
-            query = query.filter(User.status == status_enum)
-        except KeyError:
-            raise HTTPException(
-                status_code=400,
-                detail=f"Invalid status. Valid options: {[s.value for s in UserStatus]}"
+            users = (await db.scalars(
+                select(User).where(
+                    User.id.in_(batch_ids),
+                    User.status == UserStatus.PENDING
+                ).with_for_update(skip_locked=True)
+            )).all()
+            
+            for user in users:
+                if req.use_mock_proxy:
+                    proxy_result = await proxy_manager.get_mock_proxy_for_testing(user.city)
+                    user.proxy_url = proxy_result["proxy_url"]
+                    user.proxy_provider_id = proxy_result["provider_id"]
+                    user.proxy_city = proxy_result["city"]
+                elif not await db.run_sync(assign_pooled_proxy, user):
+                    batch_results[user.id] = {
+                        "user_id": user.id,
+                        "status": "error",
+                        "error": f"No proxy available for {user.city}"
+                    }
+                    continue
+                
+                user.status = UserStatus.APPROVED
+                user.approved_at = datetime.utcnow()
+                batch_results[user.id] = {
+                    "user_id": user.id,
+                    "status": "approved",
+                    "proxy_city": user.proxy_city
+                }
+            
+            await db.commit()
+        except Exception as e:
+            await db.rollback()
+            batch_results = {
+                user_id: {"user_id": user_id, "status": "error", "error": f"Batch failed: {str(e)}"}
+                for user_id in batch_ids
+            }
+        
+        for user_id in batch_ids:
+            results[user_id] = batch_results.get(
+                user_id,
+                {"user_id": user_id, "status": "error", "error": "User is being approved by another request"}
             )
     
-    users = query.order_by(User.created_at.desc()).all()
+    request_refill()
+    
+    approved = sum(1 for r in results.values() if r["status"] == "approved")
+    failed = len(results) - approved
+    
+    return {
+        "status": "success" if failed == 0 else ("partial" if approved else "error"),
+        "total": len(results),
+        "approved": approved,
+        "failed": failed,
+        "results": list(results.values())
+    }
+
+def _validation_error(e: ValidationError) -> str:
+    return "; ".join(f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in e.errors())
+
+def _validate_applications(rows: List) -> List:
+    """(row, ApplicationRequest or None, error) per parsed (row, fields); CPU-bound (email checks) - run in a thread"""
+    validated = []
+    for row, fields in rows:
+        try:
+            validated.append((row, ApplicationRequest(**fields), None))
+        except ValidationError as e:
+            validated.append((row, None, _validation_error(e)))
+    return validated
+
+async def _import_batch(db: AsyncSession, batch: List, results: dict):
+    """
+    Insert one batch of validated (row, ApplicationRequest), recording each row's result
+    
+    Two IN queries find the usernames and emails already registered; the
+    rest go in one multi-row INSERT ... ON CONFLICT DO NOTHING RETURNING,
+    so an application that lands between the check and the insert is
+    reported as a duplicate instead of failing the batch.
+    """
+    usernames = [a.instagram_username for _, a in batch]
+    emails = [a.email for _, a in batch]
+    
+    try:
+        taken_usernames = set(await db.scalars(
+            select(User.instagram_username).where(User.instagram_username.in_(usernames))
+        ))
+        taken_emails = set(await db.scalars(select(User.email).where(User.email.in_(emails))))
+        
+        new = []
+        for row, application in batch:
+            if application.instagram_username in taken_usernames:
+                results[row] = {"row": row, "status": "duplicate", "error": "This Instagram account is already registered"}
+            elif application.email in taken_emails:
+                results[row] = {"row": row, "status": "duplicate", "error": "This email is already registered"}
+            else:
+                new.append((row, application))
+        
+        if new:
+            insert = postgresql.insert if db.get_bind().dialect.name == "postgresql" else sqlite.insert
+            created = dict((await db.execute(
+                # Core insert on the table: skips the ORM bulk-insert bookkeeping
+                insert(User.__table__).on_conflict_do_nothing().returning(User.instagram_username, User.id),
+                [
+                    {
+                        "email": a.email,
+                        "instagram_username": a.instagram_username,
+                        "city": a.city,
+                        "status": UserStatus.PENDING
+                    }
+                    for _, a in new
+                ]
+            )).all())
+            for row, application in new:
+                user_id = created.get(application.instagram_username)
+                results[row] = (
+                    {"row": row, "status": "created", "user_id": user_id} if user_id is not None
+                    else {"row": row, "status": "duplicate", "error": "Registered by another request meanwhile"}
+                )
+        
+        await db.commit()
+    except Exception as e:
+        await db.rollback()
+        for row, _ in batch:
+            results[row] = {"row": row, "status": "error", "error": f"Batch failed: {str(e)}"}
+
+@router.post("/import-applications")
+async def import_applications(
+    request: Request,
+    format: Optional[str] = None,
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Create pending applications in bulk from a CSV or NDJSON request body
+    
+    `format` defaults from the Content-Type (NDJSON for anything JSON). The
+    body is parsed as it streams in and validated like /apply, a batch of
+    APPLICATION_IMPORT_BATCH_SIZE rows at a time: rows are deduped within
+    the file and against the database, inserted and committed per batch.
+    Every row gets a result: created (with its user_id), duplicate, invalid
+    or error.
+    """
+    fmt = format or ("ndjson" if "json" in request.headers.get("content-type", "") else "csv")
+    if fmt not in FORMATS:
+        raise HTTPException(status_code=400, detail=f"Invalid format. Valid options: {list(FORMATS)}")
+    
+    results = {}
+    first_row_by_username, first_row_by_email = {}, {}
+    parsed = []
+    
+    async def import_parsed():
+        batch = []
+        for row, application, error in await asyncio.to_thread(_validate_applications, parsed):
+            if error is not None:
+                results[row] = {"row": row, "status": "invalid", "error": error}
+                continue
+            
+            first = first_row_by_username.get(application.instagram_username) or first_row_by_email.get(application.email)
+            if first is not None:
+                results[row] = {"row": row, "status": "duplicate", "error": f"Same account as row {first}"}
+                continue
+            first_row_by_username[application.instagram_username] = row
+            first_row_by_email[application.email] = row
+            batch.append((row, application))
+        
+        parsed.clear()
+        if batch:
+            await _import_batch(db, batch, results)
+    
+    try:
+        async for row, fields, error in iter_applications(iter_lines(request.stream()), fmt):
+            if error is not None:
+                results[row] = {"row": row, "status": "invalid", "error": error}
+                continue
+            parsed.append((row, fields))
+            if len(parsed) >= settings.application_import_batch_size:
+                await import_parsed()
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    await import_parsed()
+    
+    created = sum(1 for r in results.values() if r["status"] == "created")
+    if created:
+        request_refill()  # Pool targets follow pending applications per city
+    counts = Counter(r["status"] for r in results.values())
+    
+    # Already JSON types: skips jsonable_encoder, slow on 100k result rows
+    return JSONResponse({
+        "status": "success" if created == len(results) else ("partial" if created else "error"),
+        "total": len(results),
+        "created": created,
+        "duplicates": counts["duplicate"],
+        "invalid": counts["invalid"],
+        "failed": counts["error"],
+        "results": [results[row] for row in sorted(results)]
+    })
+
+@router.get("/users")
+async def get_all_users(
+    status: Optional[str] = None,
+    city: Optional[str] = None,
+    stage: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = 50,
+    include_total: bool = False,
+    db: AsyncSession = Depends(get_read_db)
+):
+    """
+    Users, newest first, optionally filtered by status, city and onboarding stage
+    
+    Paginated like /pending-users.
+    """
+    rows, next_cursor, total = await _list_page(
+        db,
+        [
+            User.id,
+            User.email,
+            User.instagram_username,
+            User.city,
+            User.status,
+            User.onboarding_stage,
+            User.proxy_city,
+            User.checkpoint_count,
+            User.created_at,
+            User.approved_at,
+            User.last_login_at
+        ],
+        _user_filters(status, city, stage),
+        cursor,
+        _page_limit(limit),
+        include_total
+    )
     
     return {
-        "count": len(users),
+        "count": len(rows),
+        "total": total,
+        "next_cursor": next_cursor,
         "users": [
             {
                 "id": u.id,
@@ -134,21 +499,26 @@ async def get_all_users(
                 "approved_at": u.approved_at.isoformat() if u.approved_at else None,
                 "last_login_at": u.last_login_at.isoformat() if u.last_login_at else None
             }
-            for u in users
+            for u in rows
         ]
     }
 
 @router.get("/user/{user_id}")
 async def get_user_details(
     user_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     """Get detailed user information"""
-    user = db.query(User).filter(User.id == user_id).first()
+    user = await db.get(User, user_id)
     
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
+    proxy_expires_at = await db.scalar(select(Proxy.expires_at).where(
+        Proxy.user_id == user.id,
+        Proxy.status == ProxyStatus.ASSIGNED
+    ))
+    
     return {
         "id": user.id,
         "email": user.email,
@@ -158,6 +528,7 @@ async def get_user_details(
         "onboarding_stage": user.onboarding_stage.value if user.onboarding_stage else None,
         "proxy_url": user.proxy_url,  # Be careful exposing this
         "proxy_city": user.proxy_city,
+        "proxy_expires_at": proxy_expires_at.isoformat() if proxy_expires_at else None,
         "device_id": user.device_id,
         "uuid": user.uuid,
         "checkpoint_count": user.checkpoint_count,
@@ -165,5 +536,499 @@ async def get_user_details(
         "created_at": user.created_at.isoformat(),
         "approved_at": user.approved_at.isoformat() if user.approved_at else None,
         "last_login_at": user.last_login_at.isoformat() if user.last_login_at else None,
+        "last_activity_at": user.last_activity_at.isoformat() if user.last_activity_at else None,  # Up to USER_ACTIVITY_FLUSH_SECONDS behind
+        "dms_sent": user.dms_sent,
         "last_checkpoint_at": user.last_checkpoint_at.isoformat() if user.last_checkpoint_at else None
     }
+
+@router.post("/user/{user_id}/chatbot")
+async def set_chatbot_enabled(
+    user_id: int,
+    req: ChatbotToggleRequest,
+    db: AsyncSession = Depends(get_db)
+):
+    """Turn the ManyChat chatbot on or off for a user"""
+    user = await db.get(User, user_id)
+    
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    
+    user.chatbot_enabled = req.enabled
+    await commit_user(db)
+    subscriber_index.put(user)
+    
+    return {
+        "status": "success",
+        "user_id": user.id,
+        "chatbot_enabled": user.chatbot_enabled
+    }
+
+PERCENTILES = {"p50_ms": 0.5, "p95_ms": 0.95, "p99_ms": 0.99}
+
+async def _percentile(db: AsyncSession, condition, duration, count: int, fraction: float) -> float:
+    """
+    percentile_cont of `duration` over the `count` non-null rows matching `condition`
+    
+    Linear interpolation between the two closest ranks, fetched with
+    ORDER BY ... OFFSET so only those rows come back.
+    """
+    position = fraction * (count - 1)
+    lower = int(position)
+    values = (await db.scalars(
+        select(duration).where(condition, duration.isnot(None)).order_by(duration).offset(lower).limit(2)
+    )).all()
+    upper = values[1] if len(values) > 1 else values[0]
+    return values[0] + (upper - values[0]) * (position - lower)
+
+async def _latency_by(db: AsyncSession, key, duration) -> dict:
+    """
+    count/p50/p95/p99 of a duration column per value of `key`
+    
+    PostgreSQL aggregates them (percentile_cont). Other databases have no
+    ordered-set aggregates: each percentile is one ORDER BY/OFFSET query
+    per group, so no more than two durations are read at a time.
+    """
+    if db.get_bind().dialect.name == "postgresql":
+        rows = (await db.execute(select(
+            key,
+            func.count(duration),
+            *(func.percentile_cont(fraction).within_group(duration) for fraction in PERCENTILES.values())
+        ).group_by(key))).all()
+        return {
+            row[0]: {
+                "count": row[1],
+                **{name: round(value) if value is not None else None for name, value in zip(PERCENTILES, row[2:])}
+            }
+            for row in rows
+        }
+    
+    latency = {}
+    for group, count in (await db.execute(select(key, func.count(duration)).group_by(key))).all():
+        condition = key.is_(None) if group is None else key == group
+        latency[group] = {"count": count}
+        for name, fraction in PERCENTILES.items():
+            latency[group][name] = round(await _percentile(db, condition, duration, count, fraction)) if count else None
+    return latency
+
+# Export columns; no proxy credentials or session data
+USER_EXPORT_COLUMNS = [
+    User.id,
+    User.email,
+    User.instagram_username,
+    User.city,
+    User.status,
+    User.onboarding_stage,
+    User.proxy_city,
+    User.checkpoint_count,
+    User.dms_sent,
+    User.manychat_subscriber_id,
+    User.chatbot_enabled,
+    User.created_at,
+    User.approved_at,
+    User.last_login_at,
+    User.last_activity_at
+]
+LOGIN_ATTEMPT_EXPORT_COLUMNS = [
+    LoginAttempt.id,
+    LoginAttempt.user_id,
+    LoginAttempt.attempt_type,
+    LoginAttempt.success,
+    LoginAttempt.error_message,
+    LoginAttempt.duration_ms,
+    LoginAttempt.created_at
+]
+
+def _export_response(name: str, columns: List, conditions: List, fmt: str, gzip: bool, fresh: bool) -> StreamingResponse:
+    """
+    Stream `columns` of the rows matching `conditions`, in id order, as CSV or NDJSON
+    
+    The query runs on a replica session opened by the response body itself
+    and is read through a server-side cursor, EXPORT_BATCH_SIZE rows at a
+    time (yield_per), each batch serialized and sent before the next is
+    fetched: memory stays flat and the first rows go out right away.
+    """
+    if fmt not in EXPORT_MEDIA_TYPES:
+        raise HTTPException(status_code=400, detail=f"Invalid format. Valid options: {list(EXPORT_MEDIA_TYPES)}")
+    
+    query = select(*columns).where(*conditions).order_by(columns[0]).execution_options(
+        yield_per=settings.export_batch_size
+    )
+    
+    async def body():
+        async with read_session(fresh) as db:
+            result = await db.stream(query)
+            async for chunk in encode_rows(result.partitions(), [c.name for c in columns], fmt, gzip):
+                yield chunk
+    
+    return StreamingResponse(
+        body(),
+        media_type="application/gzip" if gzip else EXPORT_MEDIA_TYPES[fmt],
+        headers=export_headers(name, fmt, gzip)
+    )
+
+@router.get("/export/users")
+async def export_users(
+    format: str = "csv",
+    gzip: bool = False,
+    status: Optional[str] = None,
+    city: Optional[str] = None,
+    stage: Optional[str] = None,
+    fresh: bool = False
+):
+    """Every user matching the /users filters, streamed as CSV or NDJSON (optionally gzipped)"""
+    return _export_response("users", USER_EXPORT_COLUMNS, _user_filters(status, city, stage), format, gzip, fresh)
+
+@router.get("/export/login-attempts")
+async def export_login_attempts(
+    format: str = "csv",
+    gzip: bool = False,
+    user_id: Optional[int] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    fresh: bool = False
+):
+    """Raw login attempts, optionally of one user and/or created in [since, until), streamed like /export/users"""
+    conditions = []
+    if user_id is not None:
+        conditions.append(LoginAttempt.user_id == user_id)
+    if since:
+        conditions.append(LoginAttempt.created_at >= since)
+    if until:
+        conditions.append(LoginAttempt.created_at < until)
+    
+    return _export_response("login-attempts", LOGIN_ATTEMPT_EXPORT_COLUMNS, conditions, format, gzip, fresh)
+
+@router.get("/onboarding-funnel")
+async def get_onboarding_funnel(db: AsyncSession = Depends(get_read_db)):
+    """
+    Onboarding funnel conversion and latency per stage
+    
+    - funnel: users that reached each step, and conversion from application
+    - stage_latency: time users spent in a stage before leaving it
+    - step_latency: duration of each instagrapi call made by LoginHandler
+    
+    Counts are aggregated in SQL; so are the latency percentiles on
+    PostgreSQL (see _latency_by).
+    """
+    applied, approved = (await db.execute(select(
+        func.count(User.id),
+        func.count(User.approved_at)
+    ))).one()
+    
+    reached = dict((await db.execute(
+        select(
+            OnboardingStageTransition.to_stage,
+            func.count(distinct(OnboardingStageTransition.user_id))
+        ).group_by(OnboardingStageTransition.to_stage)
+    )).all())
+    
+    funnel = [
+        {"step": "applied", "users": applied},
+        {"step": "approved", "users": approved}
+    ] + [
+        {"step": stage.value, "users": reached.get(stage, 0)}
+        for stage in OnboardingStage
+    ]
+    for step in funnel:
+        step["conversion"] = round(step["users"] / applied, 4) if applied else None
+    
+    stage_latency = await _latency_by(db, OnboardingStageTransition.from_stage, OnboardingStageTransition.duration_ms)
+    step_latency = await _latency_by(db, LoginStepTiming.step, LoginStepTiming.duration_ms)
+    
+    return {
+        "funnel": funnel,
+        "stage_latency": {
+            (stage.value if stage else "approved"): latency
+            for stage, latency in stage_latency.items()
+        },
+        "step_latency": step_latency
+    }
+
+def _rate(part: int, whole: int) -> Optional[float]:
+    return round(part / whole, 4) if whole else None
+
+async def _compute_fleet_stats() -> dict:
+    """Fleet snapshot from four GROUP BY queries; runs in its own replica session (shared by all callers)"""
+    login_since = datetime.utcnow() - timedelta(hours=settings.admin_stats_login_window_hours)
+    
+    async with read_session() as db:
+        # Status x city, with checkpoint counts; statuses, cities and fleet totals roll up from it
+        user_rows = (await db.execute(select(
+            User.city,
+            User.status,
+            func.count(User.id).label("users"),
+            func.count(case((User.checkpoint_count > 0, 1))).label("checkpointed"),
+            func.coalesce(func.sum(User.checkpoint_count), 0).label("checkpoints")
+        ).group_by(User.city, User.status))).all()
+        
+        stage_rows = (await db.execute(select(
+            User.onboarding_stage,
+            func.count(User.id)
+        ).where(User.onboarding_stage.isnot(None)).group_by(User.onboarding_stage))).all()
+        
+        login_columns = (
+            func.count(LoginAttempt.id).label("attempts"),
+            func.count(case((LoginAttempt.success, 1))).label("succeeded")
+        )
+        login_by_type = (await db.execute(
+            select(LoginAttempt.attempt_type, *login_columns).where(
+                LoginAttempt.created_at >= login_since
+            ).group_by(LoginAttempt.attempt_type)
+        )).all()
+        login_by_city = (await db.execute(
+            select(User.city, *login_columns).join(
+                User, User.id == LoginAttempt.user_id
+            ).where(LoginAttempt.created_at >= login_since).group_by(User.city)
+        )).all()
+    
+    totals = {"users": 0, "checkpointed": 0, "checkpoints": 0}
+    by_status = Counter()
+    by_city = {}
+    for row in user_rows:
+        city = by_city.setdefault(row.city, {"users": 0, "checkpointed": 0, "checkpoints": 0, "by_status": {}})
+        city["by_status"][row.status.value] = row.users
+        by_status[row.status.value] += row.users
+        for key in totals:
+            city[key] += getattr(row, key)
+            totals[key] += getattr(row, key)
+    
+    def checkpoint_stats(counts: dict) -> dict:
+        return {
+            "users_with_checkpoints": counts["checkpointed"],
+            "checkpoints": counts["checkpoints"],
+            "checkpoint_rate": _rate(counts["checkpointed"], counts["users"])
+        }
+    
+    def login_stats(rows) -> dict:
+        return {
+            (row[0] or "unknown"): {
+                "attempts": row.attempts,
+                "succeeded": row.succeeded,
+                "success_rate": _rate(row.succeeded, row.attempts)
+            }
+            for row in rows
+        }
+    
+    attempts = sum(row.attempts for row in login_by_type)
+    succeeded = sum(row.succeeded for row in login_by_type)
+    
+    return {
+        "generated_at": datetime.utcnow().isoformat(),
+        "users": {
+            "total": totals["users"],
+            "by_status": {status.value: by_status.get(status.value, 0) for status in UserStatus},
+            "by_stage": {stage.value: count for stage, count in stage_rows},
+            "by_city": {
+                name: {
+                    "total": city["users"],
+                    "by_status": city["by_status"],
+                    **checkpoint_stats(city)
+                }
+                for name, city in sorted(by_city.items())
+            },
+            **checkpoint_stats(totals)
+        },
+        "logins": {
+            "window_hours": settings.admin_stats_login_window_hours,
+            "attempts": attempts,
+            "succeeded": succeeded,
+            "success_rate": _rate(succeeded, attempts),
+            "by_type": login_stats(login_by_type),
+            "by_city": login_stats(login_by_city)
+        }
+    }
+
+@router.get("/stats")
+async def get_fleet_stats():
+    """
+    Fleet counts by status, stage and city, checkpoint rates and login success rates
+    
+    Computed with GROUP BY in the database and cached for
+    ADMIN_STATS_TTL_SECONDS; concurrent requests on an expired snapshot
+    wait for a single refresh. `generated_at` tells how old it is.
+    """
+    return await stats_cache.get("fleet", _compute_fleet_stats)
+
+@router.post("/login-attempts/purge")
+async def purge_old_login_attempts():
+    """Roll up and delete login attempts past LOGIN_RETENTION_DAYS now instead of waiting for the next scheduled run"""
+    summary = await purge_login_attempts()
+    
+    return {
+        "status": "success",
+        "data": summary
+    }
+
+@router.get("/proxies/unhealthy")
+async def get_unhealthy_proxies():
+    """Proxies that failed their latest health check (from the in-memory cache)"""
+    # Assigned proxies first, then warm pool proxies (no user)
+    proxies = sorted(
+        proxy_health_cache.unhealthy(),
+        key=lambda r: (r["user_id"] is None, r["user_id"] or 0)
+    )
+    
+    return {
+        "count": len(proxies),
+        "proxies": [
+            {
+                "user_id": r["user_id"],
+                "instagram_username": r["instagram_username"],
+                "proxy_provider_id": r["proxy_provider_id"],
+                "latency_ms": r["latency_ms"],
+                "error": r["error"],
+                "checked_at": r["checked_at"].isoformat()
+            }
+            for r in proxies
+        ]
+    }
+
+@router.post("/proxies/check")
+async def run_proxy_health_check():
+    """Probe the whole fleet now instead of waiting for the next scheduled run"""
+    summary = await check_fleet()
+    
+    return {
+        "status": "success",
+        "data": summary
+    }
+
+@router.get("/proxies/pool")
+async def get_proxy_pool(db: AsyncSession = Depends(get_db)):
+    """Warm proxy inventory per city against its target size"""
+    targets = await db.run_sync(pool_targets)
+    
+    return {
+        "cities": [
+            {"city": city, **t}
+            for city, t in sorted(targets.items())
+        ]
+    }
+
+@router.post("/proxies/pool/refill")
+async def refill_proxy_pool():
+    """Buy missing pool proxies now instead of waiting for the next scheduled run"""
+    summary = await refill_pool()
+    
+    return {
+        "status": "success",
+        "data": summary
+    }
+
+@router.get("/proxies/expiring")
+async def get_expiring_proxies(days: int = 7, db: AsyncSession = Depends(get_read_db)):
+    """Live proxies expiring within `days`, soonest first"""
+    proxies = (await db.execute(select(
+        Proxy.provider_id,
+        Proxy.city,
+        Proxy.status,
+        Proxy.user_id,
+        Proxy.expires_at
+    ).where(
+        Proxy.status != ProxyStatus.RETIRED,
+        Proxy.expires_at <= datetime.utcnow() + timedelta(days=days)
+    ).order_by(Proxy.expires_at))).all()
+    
+    return {
+        "count": len(proxies),
+        "proxies": [
+            {
+                "provider_id": p.provider_id,
+                "city": p.city,
+                "status": p.status.value,
+                "user_id": p.user_id,
+                "expires_at": p.expires_at.isoformat()
+            }
+            for p in proxies
+        ]
+    }
+
+@router.post("/proxies/renew")
+async def renew_proxies():
+    """Renew expiring proxies now instead of waiting for the next scheduled run"""
+    summary = await renew_expiring_proxies()
+    
+    return {
+        "status": "success",
+        "data": summary
+    }
+
+@router.get("/proxies/swap-suggestions")
+async def get_proxy_swap_suggestions(db: AsyncSession = Depends(get_read_db)):
+    """
+    Accounts that would likely do better on another proxy
+    
+    An assigned proxy qualifies once it has PROXY_SWAP_MIN_SAMPLES probes and
+    scores below PROXY_SWAP_SCORE_THRESHOLD, or when its user is stuck in a
+    checkpoint loop. A swap is suggested only if the warm pool in the same
+    city has a better-scoring proxy.
+    """
+    stuck = (await db.execute(select(
+        Proxy.provider_id,
+        Proxy.city,
+        Proxy.score,
+        Proxy.latency_ms,
+        Proxy.error_rate,
+        Proxy.checkpoint_rate,
+        User.id.label("user_id"),
+        User.instagram_username,
+        User.checkpoint_count
+    ).join(User, User.id == Proxy.user_id).where(
+        Proxy.status == ProxyStatus.ASSIGNED,
+        or_(
+            (Proxy.probe_count >= settings.proxy_swap_min_samples)
+            & (Proxy.score < settings.proxy_swap_score_threshold),
+            User.checkpoint_count > 3
+        )
+    ).order_by(Proxy.score))).all()
+    
+    best_available = dict((await db.execute(
+        select(Proxy.city, func.max(Proxy.score)).where(
+            Proxy.status == ProxyStatus.AVAILABLE
+        ).group_by(Proxy.city)
+    )).all())
+    
+    suggestions = []
+    for p in stuck:
+        candidate_score = best_available.get(p.city)
+        if candidate_score is None or (p.score is not None and candidate_score <= p.score):
+            continue
+        suggestions.append({
+            "user_id": p.user_id,
+            "instagram_username": p.instagram_username,
+            "checkpoint_count": p.checkpoint_count,
+            "city": p.city,
+            "current_proxy": {
+                "provider_id": p.provider_id,
+                "score": p.score,
+                "latency_ms": round(p.latency_ms) if p.latency_ms is not None else None,
+                "error_rate": round(p.error_rate, 3),
+                "checkpoint_rate": round(p.checkpoint_rate, 3)
+            },
+            "best_available_score": candidate_score
+        })
+    
+    return {
+        "count": len(suggestions),
+        "suggestions": suggestions
+    }
+
+@router.get("/manychat/queue")
+async def get_manychat_queue_metrics(db: AsyncSession = Depends(get_db)):
+    """Webhook queue depth, lag and worker counters"""
+    return await db.run_sync(queue_metrics)
+
+@router.get("/java-forwarder")
+async def get_java_forwarder_metrics():
+    """Buffered/spooled messages and flush latency of the Java backend forwarder"""
+    return java_forwarder.stats()
+
+@router.get("/user-activity")
+async def get_user_activity_metrics():
+    """Users with unwritten activity and flush latency of the write-behind buffer"""
+    return user_activity.stats()
+
+@router.get("/user-identity-cache")
+async def get_user_identity_cache_metrics():
+    """Entries and hit rate of the usernames/proxy URLs cached for the user routes"""
+    return user_identities.stats()
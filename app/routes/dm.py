@@ -1,10 +1,9 @@
 from fastapi import APIRouter, HTTPException, Depends
-from sqlalchemy.orm import Session
 from pydantic import BaseModel
 from typing import List
-from app.database import get_db
-from app.models import User, UserStatus
 from app.instagram.dm_handler import DMHandler
+from app.workers.user_activity import user_activity
+from app.utils.user_loader import ACTIVE_SENDER, UserRecord, load_user
 
 router = APIRouter(prefix="/api/dm", tags=["dm"])
 dm_handler = DMHandler()
@@ -30,7 +29,10 @@ class GetThreadRequest(BaseModel):
     limit: int = 50
 
 @router.post("/send")
-async def send_dm(req: SendDMRequest, db: Session = Depends(get_db)):
+async def send_dm(
+    req: SendDMRequest,
+    user: UserRecord = Depends(load_user(ACTIVE_SENDER, SendDMRequest))
+):
     """
     Send a DM to a single user
     
@@ -42,18 +44,6 @@ async def send_dm(req: SendDMRequest, db: Session = Depends(get_db)):
         "message": "Hey! Check out our club tonight! "
     }
     """
-    # Get user
-    user = db.query(User).filter(User.id == req.user_id).first()
-    
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-    
-    if user.status != UserStatus.ACTIVE:
-        raise HTTPException(
-            status_code=400,
-            detail="User must complete onboarding first"
-        )
-    
     # Send DM
     result = dm_handler.send_dm(
         username=user.instagram_username,
@@ -65,10 +55,16 @@ async def send_dm(req: SendDMRequest, db: Session = Depends(get_db)):
     if result["status"] == "error":
         raise HTTPException(status_code=400, detail=result["message"])
     
+    # Coalesced and written in batches, not an UPDATE of the user row per DM
+    user_activity.touch(user.id, dms_sent=1)
+    
     return result
 
 @router.post("/send-bulk")
-async def send_bulk_dms(req: BulkDMRequest, db: Session = Depends(get_db)):
+async def send_bulk_dms(
+    req: BulkDMRequest,
+    user: UserRecord = Depends(load_user(ACTIVE_SENDER, BulkDMRequest))
+):
     """
     Send DMs to multiple users
     
@@ -81,17 +77,6 @@ async def send_bulk_dms(req: BulkDMRequest, db: Session = Depends(get_db)):
         "delay_seconds": 30
     }
     """
-    user = db.query(User).filter(User.id == req.user_id).first()
-    
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-    
-    if user.status != UserStatus.ACTIVE:
-        raise HTTPException(
-            status_code=400,
-            detail="User must complete onboarding first"
-        )
-    
     # Send bulk DMs
     result = dm_handler.send_bulk_dms(
         username=user.instagram_username,
@@ -100,11 +85,15 @@ async def send_bulk_dms(req: BulkDMRequest, db: Session = Depends(get_db)):
         message=req.message,
         delay_seconds=req.delay_seconds
     )
+    user_activity.touch(user.id, dms_sent=result["sent"])
     
     return result
 
 @router.post("/inbox")
-async def get_inbox(req: GetInboxRequest, db: Session = Depends(get_db)):
+async def get_inbox(
+    req: GetInboxRequest,
+    user: UserRecord = Depends(load_user(ACTIVE_SENDER, GetInboxRequest))
+):
     """
     Get user's DM inbox
     
@@ -115,17 +104,6 @@ async def get_inbox(req: GetInboxRequest, db: Session = Depends(get_db)):
         "limit": 20
     }
     """
-    user = db.query(User).filter(User.id == req.user_id).first()
-    
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-    
-    if user.status != UserStatus.ACTIVE:
-        raise HTTPException(
-            status_code=400,
-            detail="User must complete onboarding first"
-        )
-    
     result = dm_handler.get_inbox(
         username=user.instagram_username,
         proxy_url=user.proxy_url,
@@ -135,24 +113,17 @@ async def get_inbox(req: GetInboxRequest, db: Session = Depends(get_db)):
     if result["status"] == "error":
         raise HTTPException(status_code=400, detail=result["message"])
     
+    user_activity.touch(user.id)
     return result
 
 @router.post("/thread")
-async def get_thread_messages(req: GetThreadRequest, db: Session = Depends(get_db)):
+async def get_thread_messages(
+    req: GetThreadRequest,
+    user: UserRecord = Depends(load_user(ACTIVE_SENDER, GetThreadRequest))
+):
     """
     Get messages from a specific thread
     """
-    user = db.query(User).filter(User.id == req.user_id).first()
-    
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-    
-    if user.status != UserStatus.ACTIVE:
-        raise HTTPException(
-            status_code=400,
-            detail="User must complete onboarding first"
-        )
-    
     result = dm_handler.get_thread_messages(
         username=user.instagram_username,
         proxy_url=user.proxy_url,
@@ -163,4 +134,5 @@ async def get_thread_messages(req: GetThreadRequest, db: Session = Depends(get_d
     if result["status"] == "error":
         raise HTTPException(status_code=400, detail=result["message"])
     
+    user_activity.touch(user.id)
     return result
@@ -1,17 +1,43 @@
 from fastapi import APIRouter, HTTPException, Depends, Request
-from sqlalchemy.orm import Session
+from sqlalchemy import select, func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 from pydantic import BaseModel
+from typing import List, Optional
 from app.database import get_db
-from app.models import User, UserStatus
-from app.integrations.manychat_handler import ManyChatHandler
+from app.models import (
+    User,
+    ManyChatEvent,
+    ManyChatBroadcast,
+    BroadcastStatus
+)
+from app.integrations.manychat_handler import manychat
+from app.workers.manychat_webhooks import (
+    event_key,
+    notify_new_event,
+    webhook_dedup,
+    metrics as webhook_metrics
+)
+from app.workers.manychat_broadcast import (
+    recipients_select,
+    broadcast_summary,
+    start_broadcast,
+    cancel_broadcast as cancel_running_broadcast
+)
+from app.workers.manychat_sync import sync_users, start_resync, sync_status
+from app.utils.subscriber_index import subscriber_index
+from app.utils.user_loader import LOGGED_IN, MANYCHAT_CONNECTED, UserGuard, UserRecord, commit_user, load_user
 from app.config import get_settings
 from datetime import datetime
 import hmac
 import hashlib
+import json
 
 router = APIRouter(prefix="/api/manychat", tags=["manychat"])
 settings = get_settings()
-manychat = ManyChatHandler(api_key=settings.manychat_api_key)
+
+# Columns desired_state reads; the sync doesn't change the user
+SUBSCRIBER_SYNC = UserGuard(manychat=True, columns=("city", "instagram_username"))
 
 class ConnectManyChatRequest(BaseModel):
     user_id: int
@@ -20,26 +46,29 @@ class SendMessageRequest(BaseModel):
     user_id: int
     message: str
 
+class ResyncRequest(BaseModel):
+    force: bool = False  # Re-send everything, not just what changed
+
+class BroadcastRequest(BaseModel):
+    message: str
+    message_tag: str = "ACCOUNT_UPDATE"
+    chatbot_enabled: Optional[bool] = True  # None = any
+    city: Optional[str] = None
+    tags: List[str] = []                    # Recipients must have all of them
+
 @router.post("/connect")
-async def connect_manychat(req: ConnectManyChatRequest, db: Session = Depends(get_db)):
+async def connect_manychat(
+    req: ConnectManyChatRequest,
+    user: User = Depends(load_user(LOGGED_IN, ConnectManyChatRequest, entity=True)),
+    db: AsyncSession = Depends(get_db)
+):
     """
     Connect user to ManyChat
     
     Called after successful Instagram login
     """
-    user = db.query(User).filter(User.id == req.user_id).first()
-    
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-    
-    if user.status != UserStatus.ACTIVE:
-        raise HTTPException(
-            status_code=400,
-            detail="User must complete Instagram login first"
-        )
-    
     # Create subscriber in ManyChat
-    result = manychat.create_subscriber(
+    result = await manychat.create_subscriber(
         instagram_user_id=user.instagram_user_id,
         instagram_username=user.instagram_username,
         email=user.email
@@ -49,15 +78,17 @@ async def connect_manychat(req: ConnectManyChatRequest, db: Session = Depends(ge
         raise HTTPException(status_code=400, detail=result["message"])
     
     # Save ManyChat subscriber ID
+    previous_subscriber_id = user.manychat_subscriber_id
     user.manychat_subscriber_id = result["data"]["data"]["id"]
     user.manychat_connected_at = datetime.utcnow()
     user.chatbot_enabled = True
+    await commit_user(db)
+    if previous_subscriber_id != user.manychat_subscriber_id:
+        subscriber_index.discard(previous_subscriber_id)  # Reconnected: the old id no longer maps to this user
+    subscriber_index.put(user)
     
-    # Add tags for segmentation
-    manychat.add_tag(user.manychat_subscriber_id, user.city)
-    manychat.add_tag(user.manychat_subscriber_id, "nightlife")
-    
-    db.commit()
+    # Tags and custom fields for segmentation, sent concurrently
+    await sync_users([user])
     
     return {
         "status": "success",
@@ -66,7 +97,7 @@ async def connect_manychat(req: ConnectManyChatRequest, db: Session = Depends(ge
     }
 
 @router.post("/webhook")
-async def manychat_webhook(request: Request, db: Session = Depends(get_db)):
+async def manychat_webhook(request: Request, db: AsyncSession = Depends(get_db)):
     """
     Webhook endpoint for receiving messages from ManyChat
     
@@ -75,9 +106,13 @@ async def manychat_webhook(request: Request, db: Session = Depends(get_db)):
     Setup in ManyChat:
     Settings → API → Webhooks → Add webhook URL:
     https://your-domain.com/api/manychat/webhook
+    
+    Events are only verified and stored here; the webhook workers process
+    them (app/workers/manychat_webhooks.py). Acknowledging right away keeps
+    ManyChat from timing out and redelivering during bursts.
     """
     # Verify webhook signature (security)
-    signature = request.headers.get("X-Hub-Signature-256")
+    signature = request.headers.get("X-Hub-Signature-256") or ""
     body = await request.body()
     
     # Verify signature
@@ -87,61 +122,53 @@ async def manychat_webhook(request: Request, db: Session = Depends(get_db)):
         hashlib.sha256
     ).hexdigest()
     
-    if signature != expected_signature:
+    if not hmac.compare_digest(signature, expected_signature):
         raise HTTPException(status_code=403, detail="Invalid signature")
     
-    # Parse webhook data
-    data = await request.json()
-    
-    event_type = data.get("type")
-    
-    if event_type == "message":
-        # New message received
-        subscriber_id = data["data"]["subscriber"]["id"]
-        message_text = data["data"]["message"]["text"]
-        
-        # Find user by subscriber ID
-        user = db.query(User).filter(
-            User.manychat_subscriber_id == subscriber_id
-        ).first()
-        
-        if user:
-            # TODO: Process message with your AI
-            # TODO: Store in your custom inbox
-            # TODO: Send to your Java backend
-            
-            # For now, log it
-            print(f"Message from {user.instagram_username}: {message_text}")
-            
-            # You can forward to your Java backend here
-            # requests.post("http://your-java-backend:8080/inbox/message", json={
-            #     "user_id": user.id,
-            #     "message": message_text,
-            #     "timestamp": data["data"]["timestamp"]
-            # })
+    # Parse webhook data (once)
+    try:
+        data = json.loads(body)
+    except ValueError:
+        data = None
+    
+    if not isinstance(data, dict):
+        raise HTTPException(status_code=400, detail="Invalid JSON body")
+    
+    # Drop redeliveries before doing any work
+    key = event_key(data)
+    if webhook_dedup.seen(key):
+        webhook_metrics["duplicates"] += 1
+        return {"status": "duplicate"}
+    
+    # Durably queue the raw event
+    db.add(ManyChatEvent(
+        event_key=key,
+        event_type=data.get("type"),
+        payload=body.decode("utf-8", errors="replace")
+    ))
+    try:
+        await db.commit()
+    except IntegrityError:
+        # Seen by another worker process, or before a restart
+        await db.rollback()
+        webhook_metrics["duplicates"] += 1
+        return {"status": "duplicate"}
+    except Exception:
+        webhook_dedup.forget(key)
+        raise
+    notify_new_event()
     
     return {"status": "received"}
 
 @router.post("/send-message")
 async def send_message_via_manychat(
     req: SendMessageRequest,
-    db: Session = Depends(get_db)
+    user: UserRecord = Depends(load_user(MANYCHAT_CONNECTED, SendMessageRequest))
 ):
     """
     Send a message to user via ManyChat
     """
-    user = db.query(User).filter(User.id == req.user_id).first()
-    
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-    
-    if not user.manychat_subscriber_id:
-        raise HTTPException(
-            status_code=400,
-            detail="User not connected to ManyChat"
-        )
-    
-    result = manychat.send_message(
+    result = await manychat.send_message(
         subscriber_id=user.manychat_subscriber_id,
         message=req.message
     )
@@ -150,3 +177,97 @@ async def send_message_via_manychat(
         raise HTTPException(status_code=400, detail=result["message"])
     
     return result
+
+@router.post("/broadcast")
+async def create_broadcast(req: BroadcastRequest, db: AsyncSession = Depends(get_db)):
+    """
+    Send a message to every connected user matching the filter
+    
+    Runs in the background; poll GET /broadcast/{broadcast_id} for progress.
+    """
+    filters = {
+        "chatbot_enabled": req.chatbot_enabled,
+        "city": req.city,
+        "tags": req.tags
+    }
+    
+    broadcast = ManyChatBroadcast(
+        message=req.message,
+        message_tag=req.message_tag,
+        filters=json.dumps(filters),
+        total=await db.scalar(
+            select(func.count()).select_from(recipients_select(filters).subquery())
+        )
+    )
+    db.add(broadcast)
+    await db.commit()
+    
+    start_broadcast(broadcast.id)
+    
+    return broadcast_summary(broadcast)
+
+@router.get("/broadcast/{broadcast_id}")
+async def get_broadcast(broadcast_id: int, db: AsyncSession = Depends(get_db)):
+    """Broadcast progress"""
+    broadcast = await db.get(ManyChatBroadcast, broadcast_id)
+    
+    if not broadcast:
+        raise HTTPException(status_code=404, detail="Broadcast not found")
+    
+    return broadcast_summary(broadcast)
+
+@router.post("/broadcast/{broadcast_id}/cancel")
+async def cancel_broadcast(broadcast_id: int, db: AsyncSession = Depends(get_db)):
+    """
+    Stop a running broadcast
+    
+    Also works for broadcasts running in another process (they stop after
+    their current chunk) or left "running" by a crash.
+    """
+    broadcast = await db.get(ManyChatBroadcast, broadcast_id)
+    
+    if not broadcast:
+        raise HTTPException(status_code=404, detail="Broadcast not found")
+    
+    if broadcast.status != BroadcastStatus.RUNNING:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Broadcast is already {broadcast.status.value}"
+        )
+    
+    if not cancel_running_broadcast(broadcast_id):
+        broadcast.status = BroadcastStatus.CANCELLED
+        broadcast.finished_at = datetime.utcnow()
+        await db.commit()
+    
+    return {
+        "status": "success",
+        "message": "Broadcast cancelled",
+        "broadcast_id": broadcast_id
+    }
+
+@router.post("/sync")
+async def resync_subscribers(req: ResyncRequest):
+    """
+    Re-sync tags and custom fields of every connected subscriber
+    
+    Run after changing segmentation; only differing tags/fields are sent.
+    Progress at GET /sync.
+    """
+    if not start_resync(force=req.force):
+        raise HTTPException(status_code=409, detail="A resync is already running")
+    
+    return {
+        "status": "success",
+        "message": "Resync started"
+    }
+
+@router.get("/sync")
+async def get_resync_status():
+    """Progress of the last fleet resync"""
+    return sync_status
+
+@router.post("/sync/{user_id}")
+async def resync_subscriber(user: UserRecord = Depends(load_user(SUBSCRIBER_SYNC))):
+    """Re-sync tags and custom fields of one subscriber"""
+    return await sync_users([user])
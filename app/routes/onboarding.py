@@ -1,14 +1,36 @@
 from fastapi import APIRouter, HTTPException, Depends
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from pydantic import BaseModel, EmailStr
 from app.database import get_db
-from app.models import User, UserStatus, OnboardingStage, LoginAttempt
+from app.models import (
+    User,
+    UserStatus,
+    OnboardingStage,
+    LoginAttempt,
+    LoginStepTiming,
+    OnboardingStageTransition
+)
 from app.instagram.login_handler import LoginHandler
+from app.utils.proxy_scoring import record_login_outcome
+from app.utils.user_loader import (
+    APPROVED_ONBOARDER,
+    CHALLENGE_ONBOARDER,
+    TWO_FA_ONBOARDER,
+    UserGuard,
+    UserRecord,
+    commit_user,
+    load_user
+)
 from datetime import datetime
+from typing import Dict, Optional
 
 router = APIRouter(prefix="/api/onboarding", tags=["onboarding"])
 login_handler = LoginHandler()
 
+# Columns /status reads; any status may check it
+APPLICATION_STATUS = UserGuard(columns=("status", "instagram_username", "city", "approved_at"))
+
 # Pydantic schemas
 class ApplicationRequest(BaseModel):
     email: EmailStr
@@ -28,11 +50,91 @@ class ChallengeRequest(BaseModel):
     code: str
     method: str = "1"  # 1=SMS, 0=email
 
+# Funnel instrumentation
+def _enter_stage(db: AsyncSession, user: User, stage: OnboardingStage):
+    """Move user to `stage`, recording how long they spent in the previous one"""
+    now = datetime.utcnow()
+    since = user.onboarding_stage_entered_at or user.approved_at
+    
+    db.add(OnboardingStageTransition(
+        user_id=user.id,
+        from_stage=user.onboarding_stage,
+        to_stage=stage,
+        duration_ms=int((now - since).total_seconds() * 1000) if since else None,
+        created_at=now
+    ))
+    user.onboarding_stage = stage
+    user.onboarding_stage_entered_at = now
+
+def _record_timings(attempt: LoginAttempt, result: Dict):
+    """Store per-step instagrapi timings returned by LoginHandler on the attempt"""
+    timings = result.get("timings") or {}
+    
+    for step, duration_ms in timings.items():
+        attempt.step_timings.append(LoginStepTiming(
+            step=step,
+            duration_ms=duration_ms
+        ))
+    attempt.duration_ms = (attempt.duration_ms or 0) + sum(timings.values())
+
+# State transitions
+def _save_device_ids(user: User, result: Dict):
+    """Keep the device IDs (and Instagram user id) LoginHandler returned, leaving missing ones as they are"""
+    data = result.get("data") or {}
+    
+    for field, key in (("device_id", "device_id"), ("uuid", "uuid"), ("phone_id", "phone_id"), ("instagram_user_id", "user_id")):
+        if data.get(key):
+            setattr(user, field, data[key])
+
+async def _commit_transition(
+    db: AsyncSession,
+    user: User,
+    attempt: LoginAttempt,
+    result: Dict,
+    status: Optional[UserStatus] = None,
+    stage: Optional[OnboardingStage] = None,
+    outcome: Optional[Dict] = None
+):
+    """
+    Apply a LoginHandler result and commit everything the request changed, at once
+    
+    Sets `status` and `stage`, keeps the returned device IDs and step
+    timings, folds `outcome` (record_login_outcome kwargs) into the proxy
+    stats and commits it together with the attempt and any other change
+    the route made to `user`. The users UPDATE only applies to the version
+    load_user read: if a parallel submit for the same user committed
+    first, nothing is written and the request fails with 409.
+    """
+    _record_timings(attempt, result)
+    _save_device_ids(user, result)
+    
+    if status is not None:
+        user.status = status
+    if status == UserStatus.ACTIVE:
+        user.last_login_at = datetime.utcnow()
+        attempt.success = True
+    if stage is not None:
+        _enter_stage(db, user, stage)
+    if outcome is not None:
+        await db.run_sync(record_login_outcome, user.id, **outcome)
+    
+    await commit_user(db, detail="This step was already submitted. Check your status and try again.")
+
+def _start_attempt(db: AsyncSession, user: User, attempt_type: str) -> LoginAttempt:
+    """Log an attempt; written with the rest of the request by _commit_transition"""
+    attempt = LoginAttempt(
+        user_id=user.id,
+        attempt_type=attempt_type,
+        success=False
+    )
+    db.add(attempt)
+    return attempt
+
 # Routes
 @router.post("/apply")
 async def apply_for_account(
     req: ApplicationRequest,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Step 1: User applies with email + Instagram username + city
@@ -40,9 +142,9 @@ async def apply_for_account(
     This creates a PENDING user awaiting admin approval
     """
     # Check if username already exists
-    existing = db.query(User).filter(
+    existing = await db.scalar(select(User.id).where(
         User.instagram_username == req.instagram_username
-    ).first()
+    ))
     
     if existing:
         raise HTTPException(
@@ -51,9 +153,9 @@ async def apply_for_account(
         )
     
     # Check if email already exists
-    existing_email = db.query(User).filter(
+    existing_email = await db.scalar(select(User.id).where(
         User.email == req.email
-    ).first()
+    ))
     
     if existing_email:
         raise HTTPException(
@@ -70,8 +172,8 @@ async def apply_for_account(
     )
     
     db.add(user)
-    db.commit()
-    db.refresh(user)
+    await db.commit()
+    await db.refresh(user)
     
     # TODO: Send email notification to admin
     # TODO: Send confirmation email to user
@@ -89,15 +191,9 @@ async def apply_for_account(
 
 @router.get("/status/{user_id}")
 async def check_application_status(
-    user_id: int,
-    db: Session = Depends(get_db)
+    user: UserRecord = Depends(load_user(APPLICATION_STATUS))
 ):
     """Check if user has been approved and can start onboarding"""
-    user = db.query(User).filter(User.id == user_id).first()
-    
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-    
     return {
         "status": user.status.value,
         "instagram_username": user.instagram_username,
@@ -109,43 +205,18 @@ async def check_application_status(
 @router.post("/login")
 async def start_login(
     req: LoginRequest,
-    db: Session = Depends(get_db)
+    user: User = Depends(load_user(APPROVED_ONBOARDER, LoginRequest, entity=True)),
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Step 2: User enters password to start login
     
     This initiates the login flow with their dedicated proxy
     """
-    user = db.query(User).filter(User.id == req.user_id).first()
-    
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-    
-    if user.status != UserStatus.APPROVED:
-        raise HTTPException(
-            status_code=400,
-            detail="Account not approved yet. Please wait for admin approval."
-        )
-    
-    if not user.proxy_url:
-        raise HTTPException(
-            status_code=500,
-            detail="Proxy not configured. Please contact support."
-        )
-    
-    # Update status
+    # Update status and log attempt; all written in one commit with the result
     user.status = UserStatus.ONBOARDING
-    user.onboarding_stage = OnboardingStage.PASSWORD
-    db.commit()
-    
-    # Log attempt
-    attempt = LoginAttempt(
-        user_id=user.id,
-        attempt_type="password",
-        success=False
-    )
-    db.add(attempt)
-    db.commit()
+    _enter_stage(db, user, OnboardingStage.PASSWORD)
+    attempt = _start_attempt(db, user, "password")
     
     # Attempt login
     result = login_handler.attempt_login(
@@ -160,19 +231,12 @@ async def start_login(
     # Update based on result
     if result["status"] == "success":
         # Login succeeded without 2FA!
-        user.status = UserStatus.ACTIVE
-        user.onboarding_stage = OnboardingStage.COMPLETE
-        user.last_login_at = datetime.utcnow()
-        
-        # Save device IDs
-        if "data" in result:
-            user.device_id = result["data"].get("device_id")
-            user.uuid = result["data"].get("uuid")
-            user.phone_id = result["data"].get("phone_id")
-            user.instagram_user_id = result["data"].get("user_id")
-        
-        attempt.success = True
-        db.commit()
+        await _commit_transition(
+            db, user, attempt, result,
+            status=UserStatus.ACTIVE,
+            stage=OnboardingStage.COMPLETE,
+            outcome={}
+        )
         
         return {
             "status": "success",
@@ -182,18 +246,7 @@ async def start_login(
     
     elif result["status"] == "2fa_required":
         # Need 2FA code
-        user.onboarding_stage = OnboardingStage.TWO_FA
-        
-        # Save device IDs if provided
-        if "data" in result:
-            if result["data"].get("device_id"):
-                user.device_id = result["data"]["device_id"]
-            if result["data"].get("uuid"):
-                user.uuid = result["data"]["uuid"]
-            if result["data"].get("phone_id"):
-                user.phone_id = result["data"]["phone_id"]
-        
-        db.commit()
+        await _commit_transition(db, user, attempt, result, stage=OnboardingStage.TWO_FA, outcome={})
         
         return {
             "status": "2fa_required",
@@ -203,20 +256,9 @@ async def start_login(
     
     elif result["status"] == "challenge_required":
         # Need challenge verification
-        user.onboarding_stage = OnboardingStage.CHALLENGE
         user.checkpoint_count += 1
         user.last_checkpoint_at = datetime.utcnow()
-        
-        # Save device IDs if provided
-        if "data" in result:
-            if result["data"].get("device_id"):
-                user.device_id = result["data"]["device_id"]
-            if result["data"].get("uuid"):
-                user.uuid = result["data"]["uuid"]
-            if result["data"].get("phone_id"):
-                user.phone_id = result["data"]["phone_id"]
-        
-        db.commit()
+        _save_device_ids(user, result)
         
         # Auto-request SMS code
         code_result = login_handler.request_challenge_code(
@@ -227,6 +269,12 @@ async def start_login(
             uuid=user.uuid,
             phone_id=user.phone_id
         )
+        _record_timings(attempt, code_result)
+        await _commit_transition(
+            db, user, attempt, result,
+            stage=OnboardingStage.CHALLENGE,
+            outcome={"checkpoint": True}
+        )
         
         return {
             "status": "challenge_required",
@@ -238,7 +286,11 @@ async def start_login(
     else:
         # Error
         attempt.error_message = result.get("message")
-        db.commit()
+        # A wrong password says nothing about the proxy
+        await _commit_transition(
+            db, user, attempt, result,
+            outcome={"failed": result.get("error_type") != "bad_password"}
+        )
         
         raise HTTPException(
             status_code=400,
@@ -248,30 +300,14 @@ async def start_login(
 @router.post("/submit-2fa")
 async def submit_2fa_code(
     req: TwoFactorRequest,
-    db: Session = Depends(get_db)
+    user: User = Depends(load_user(TWO_FA_ONBOARDER, TwoFactorRequest, entity=True)),
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Step 3: User submits 2FA code
     """
-    user = db.query(User).filter(User.id == req.user_id).first()
-    
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-    
-    if user.onboarding_stage != OnboardingStage.TWO_FA:
-        raise HTTPException(
-            status_code=400,
-            detail="Invalid onboarding stage"
-        )
-    
     # Log attempt
-    attempt = LoginAttempt(
-        user_id=user.id,
-        attempt_type="2fa",
-        success=False
-    )
-    db.add(attempt)
-    db.commit()
+    attempt = _start_attempt(db, user, "2fa")
     
     # Complete 2FA
     result = login_handler.complete_2fa(
@@ -285,19 +321,12 @@ async def submit_2fa_code(
     
     if result["status"] == "success":
         # Success!
-        user.status = UserStatus.ACTIVE
-        user.onboarding_stage = OnboardingStage.COMPLETE
-        user.last_login_at = datetime.utcnow()
-        
-        # Save device IDs
-        if "data" in result:
-            user.device_id = result["data"].get("device_id")
-            user.uuid = result["data"].get("uuid")
-            user.phone_id = result["data"].get("phone_id")
-            user.instagram_user_id = result["data"].get("user_id")
-        
-        attempt.success = True
-        db.commit()
+        await _commit_transition(
+            db, user, attempt, result,
+            status=UserStatus.ACTIVE,
+            stage=OnboardingStage.COMPLETE,
+            outcome={}
+        )
         
         return {
             "status": "success",
@@ -307,7 +336,7 @@ async def submit_2fa_code(
     else:
         # Failed
         attempt.error_message = result.get("message")
-        db.commit()
+        await _commit_transition(db, user, attempt, result)
         
         raise HTTPException(
             status_code=400,
@@ -317,22 +346,12 @@ async def submit_2fa_code(
 @router.post("/submit-challenge")
 async def submit_challenge_code(
     req: ChallengeRequest,
-    db: Session = Depends(get_db)
+    user: User = Depends(load_user(CHALLENGE_ONBOARDER, ChallengeRequest, entity=True)),
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Step 4: User submits challenge verification code
     """
-    user = db.query(User).filter(User.id == req.user_id).first()
-    
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-    
-    if user.onboarding_stage != OnboardingStage.CHALLENGE:
-        raise HTTPException(
-            status_code=400,
-            detail="Invalid onboarding stage"
-        )
-    
     # Check checkpoint loop
     if user.checkpoint_count > 3:
         raise HTTPException(
@@ -341,13 +360,7 @@ async def submit_challenge_code(
         )
     
     # Log attempt
-    attempt = LoginAttempt(
-        user_id=user.id,
-        attempt_type="challenge",
-        success=False
-    )
-    db.add(attempt)
-    db.commit()
+    attempt = _start_attempt(db, user, "challenge")
     
     # Complete challenge
     result = login_handler.complete_challenge(
@@ -361,20 +374,13 @@ async def submit_challenge_code(
     
     if result["status"] == "success":
         # Success!
-        user.status = UserStatus.ACTIVE
-        user.onboarding_stage = OnboardingStage.COMPLETE
-        user.last_login_at = datetime.utcnow()
         user.checkpoint_count = 0  # Reset on success
-        
-        # Save device IDs
-        if "data" in result:
-            user.device_id = result["data"].get("device_id")
-            user.uuid = result["data"].get("uuid")
-            user.phone_id = result["data"].get("phone_id")
-            user.instagram_user_id = result["data"].get("user_id")
-        
-        attempt.success = True
-        db.commit()
+        await _commit_transition(
+            db, user, attempt, result,
+            status=UserStatus.ACTIVE,
+            stage=OnboardingStage.COMPLETE,
+            outcome={}
+        )
         
         return {
             "status": "success",
@@ -386,7 +392,7 @@ async def submit_challenge_code(
         user.checkpoint_count += 1
         user.last_checkpoint_at = datetime.utcnow()
         attempt.error_message = result.get("message")
-        db.commit()
+        await _commit_transition(db, user, attempt, result, outcome={"checkpoint": True})
         
         raise HTTPException(
             status_code=400,
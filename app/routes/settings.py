@@ -1,9 +1,10 @@
-from fastapi import APIRouter, HTTPException, Depends
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends
+from sqlalchemy.ext.asyncio import AsyncSession
 from pydantic import BaseModel
 from app.database import get_db
 from app.models import User
 from app.utils.encryption import encryption
+from app.utils.user_loader import ANY_USER, commit_user, load_user
 
 router = APIRouter(prefix="/api/settings", tags=["settings"])
 
@@ -14,7 +15,8 @@ class BackupCodeRequest(BaseModel):
 @router.post("/add-backup-code")
 async def add_backup_code(
     req: BackupCodeRequest,
-    db: Session = Depends(get_db)
+    user: User = Depends(load_user(ANY_USER, BackupCodeRequest, entity=True)),
+    db: AsyncSession = Depends(get_db)
 ):
     """
     User adds backup code for permanent access
@@ -24,17 +26,12 @@ async def add_backup_code(
     - Skip 2FA in future
     - More stable sessions
     """
-    user = db.query(User).filter(User.id == req.user_id).first()
-    
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-    
     # Encrypt and save backup code
     encrypted_code = encryption.encrypt(req.backup_code)
     user.backup_code_encrypted = encrypted_code
     user.has_backup_code = True
     
-    db.commit()
+    await commit_user(db)
     
     return {
         "status": "success",
@@ -43,19 +40,14 @@ async def add_backup_code(
 
 @router.delete("/remove-backup-code/{user_id}")
 async def remove_backup_code(
-    user_id: int,
-    db: Session = Depends(get_db)
+    user: User = Depends(load_user(ANY_USER, entity=True)),
+    db: AsyncSession = Depends(get_db)
 ):
     """Remove stored backup code"""
-    user = db.query(User).filter(User.id == user_id).first()
-    
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-    
     user.backup_code_encrypted = None
     user.has_backup_code = False
     
-    db.commit()
+    await commit_user(db)
     
     return {
         "status": "success",
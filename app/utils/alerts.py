@@ -0,0 +1,31 @@
+from email.message import EmailMessage
+from app.config import get_settings
+import smtplib
+
+settings = get_settings()
+
+def send_alert(subject: str, body: str):
+    """
+    Notify ops about a failure in a background job
+    
+    Always logged; also emailed to ALERT_EMAIL through the SMTP settings when
+    configured. Blocking - call with asyncio.to_thread from async code.
+    """
+    print(f"ALERT: {subject}\n{body}")
+    
+    if not settings.alert_email:
+        return
+    
+    message = EmailMessage()
+    message["Subject"] = f"[GES] {subject}"
+    message["From"] = settings.smtp_user
+    message["To"] = settings.alert_email
+    message.set_content(body)
+    
+    try:
+        with smtplib.SMTP(settings.smtp_host, settings.smtp_port, timeout=10) as smtp:
+            smtp.starttls()
+            smtp.login(settings.smtp_user, settings.smtp_password)
+            smtp.send_message(message)
+    except Exception as e:
+        print(f"Failed to send alert email: {e}")
@@ -0,0 +1,79 @@
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+import codecs
+import csv
+import json
+
+FIELDS = ("email", "instagram_username", "city")
+FIELD_ALIASES = {"username": "instagram_username", "instagram": "instagram_username"}
+FORMATS = ("csv", "ndjson")
+
+async def iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """Lines of a UTF-8 byte stream as its chunks arrive (BOM and line endings stripped)"""
+    decoder = codecs.getincrementaldecoder("utf-8-sig")(errors="replace")
+    pending = ""
+    
+    async for chunk in chunks:
+        pending += decoder.decode(chunk)
+        *lines, pending = pending.split("\n")
+        for line in lines:
+            yield line.rstrip("\r")
+    
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield pending.rstrip("\r")
+
+def _field_name(name: str) -> str:
+    name = name.strip().lower()
+    return FIELD_ALIASES.get(name, name)
+
+def _application(values: Dict) -> Dict:
+    """The application fields of a parsed row, stripped; missing ones left out for validation to report"""
+    return {
+        field: value.strip() if isinstance(value, str) else value
+        for field, value in values.items()
+        if field in FIELDS and value not in (None, "")
+    }
+
+async def iter_applications(lines: AsyncIterator[str], fmt: str) -> AsyncIterator[Tuple[int, Optional[Dict], Optional[str]]]:
+    """
+    (row number, application fields, parse error) per non-blank record of `lines`
+    
+    CSV needs a header row naming email, instagram_username (or username)
+    and city, in any order; other columns are ignored and trailing ones may
+    be left off. One record per line: quoted fields can't span lines.
+    NDJSON is one JSON object per line.
+    ValueError for a CSV header missing a field.
+    """
+    header: Optional[List[str]] = None
+    row = 0
+    
+    async for line in lines:
+        if not line.strip():
+            continue
+        
+        if fmt == "ndjson":
+            row += 1
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                yield row, None, f"Invalid JSON: {e}"
+                continue
+            if not isinstance(record, dict):
+                yield row, None, "Expected a JSON object"
+                continue
+            yield row, _application({_field_name(k): v for k, v in record.items()}), None
+            continue
+        
+        values = next(csv.reader([line]))
+        if header is None:
+            header = [_field_name(name) for name in values]
+            missing = [field for field in FIELDS if field not in header]
+            if missing:
+                raise ValueError(f"CSV header is missing: {', '.join(missing)}")
+            continue
+        
+        row += 1
+        if len(values) > len(header):
+            yield row, None, f"Expected {len(header)} columns, got {len(values)}"
+            continue
+        yield row, _application(dict(zip(header, values))), None
@@ -0,0 +1,102 @@
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+from collections import OrderedDict
+import asyncio
+import time
+
+class SingleFlightCache:
+    """
+    Values produced by an async loader, reused for `ttl` seconds
+    
+    Concurrent misses for a key share one in-flight load instead of each
+    running it. A failed load is not cached; everyone waiting on it gets
+    the error.
+    """
+    
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._entries: Dict[Hashable, Tuple[float, Any]] = {}
+        self._loading: Dict[Hashable, asyncio.Task] = {}
+        self.hits = 0
+        self.loads = 0
+    
+    async def get(self, key: Hashable, loader: Callable[[], Awaitable[Any]]) -> Any:
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] > time.monotonic():
+            self.hits += 1
+            return entry[1]
+        
+        task = self._loading.get(key)
+        if task is None:
+            task = asyncio.create_task(self._load(key, loader))
+            self._loading[key] = task
+        
+        # A caller going away (client disconnect) must not cancel the load others wait on
+        return await asyncio.shield(task)
+    
+    def invalidate(self, key: Optional[Hashable] = None):
+        """Drop `key`, or everything; an in-flight load still stores its result"""
+        if key is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(key, None)
+    
+    def stats(self) -> Dict:
+        return {"entries": len(self._entries), "hits": self.hits, "loads": self.loads}
+    
+    async def _load(self, key: Hashable, loader: Callable[[], Awaitable[Any]]) -> Any:
+        try:
+            value = await loader()
+            self.loads += 1
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            return value
+        finally:
+            self._loading.pop(key, None)
+
+class TTLCache:
+    """
+    Values kept for `ttl` seconds, at most `max_entries` of them
+    
+    Plain get/put for values loaded as part of another query (no loader
+    to share). Entries are in insertion order, which is also expiry order;
+    once full, the oldest go first. invalidate() may be called from worker
+    threads.
+    
+    A load racing a change passes the `generation` read before it started
+    to put(): if anything was invalidated since, its possibly stale value
+    is not stored.
+    """
+    
+    def __init__(self, ttl: float, max_entries: int):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+    
+    def get(self, key: Hashable) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None or entry[0] <= time.monotonic():
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry[1]
+    
+    def put(self, key: Hashable, value: Any, generation: Optional[int] = None):
+        if generation is not None and generation != self.generation:
+            return
+        self._entries.pop(key, None)
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+    
+    def invalidate(self, key: Optional[Hashable] = None):
+        """Drop `key`, or everything"""
+        self.generation += 1
+        if key is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(key, None)
+    
+    def stats(self) -> Dict:
+        return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
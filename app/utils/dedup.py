@@ -0,0 +1,43 @@
+from collections import OrderedDict
+import time
+
+class DedupWindow:
+    """
+    Keys seen in the last `ttl` seconds, with O(1) check-and-insert
+    
+    Keys are kept in insertion order, which is also expiry order, so
+    eviction only ever looks at the oldest entry. `max_entries` bounds
+    memory during bursts by dropping the oldest keys early.
+    """
+    
+    def __init__(self, ttl: float, max_entries: int):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._expires: "OrderedDict[str, float]" = OrderedDict()
+    
+    def seen(self, key: str) -> bool:
+        """Record `key`; True if it was already seen within the window"""
+        now = time.monotonic()
+        self._evict(now)
+        
+        if key in self._expires:
+            return True
+        
+        self._expires[key] = now + self.ttl
+        if len(self._expires) > self.max_entries:
+            self._expires.popitem(last=False)
+        return False
+    
+    def forget(self, key: str):
+        """Drop `key`, e.g. when storing the event failed and a redelivery must get through"""
+        self._expires.pop(key, None)
+    
+    def __len__(self) -> int:
+        return len(self._expires)
+    
+    def _evict(self, now: float):
+        while self._expires:
+            key, expires_at = next(iter(self._expires.items()))
+            if expires_at > now:
+                break
+            self._expires.popitem(last=False)
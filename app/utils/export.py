@@ -0,0 +1,62 @@
+from typing import AsyncIterator, Dict, Iterable, List, Optional, Sequence
+from datetime import date, datetime
+import csv
+import enum
+import io
+import json
+import zlib
+
+EXPORT_MEDIA_TYPES = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson"
+}
+
+def _plain(value):
+    """JSON/CSV-ready value: enums by value, datetimes as ISO 8601"""
+    if isinstance(value, enum.Enum):
+        return value.value
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+def _encode_csv(rows: Iterable[Sequence], header: Optional[List[str]] = None) -> bytes:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if header:
+        writer.writerow(header)
+    writer.writerows([_plain(v) for v in row] for row in rows)
+    return buffer.getvalue().encode()
+
+def _encode_ndjson(rows: Iterable[Sequence], columns: List[str]) -> bytes:
+    return "".join(
+        json.dumps(dict(zip(columns, map(_plain, row))), separators=(",", ":")) + "\n"
+        for row in rows
+    ).encode()
+
+async def encode_rows(partitions: AsyncIterator[List[Sequence]], columns: List[str], fmt: str, compress: bool = False) -> AsyncIterator[bytes]:
+    """
+    Serialize `partitions` (lists of rows, e.g. AsyncResult.partitions()) as they arrive
+    
+    One chunk per partition, so memory stays at one partition whatever the
+    row count. CSV starts with a header row (sent before the first
+    partition, so the download starts right away); NDJSON writes one
+    object per row. `compress` gzips the stream, flushed per chunk so the
+    client gets each partition as soon as it is read.
+    """
+    gzip = zlib.compressobj(wbits=31) if compress else None  # 31: gzip container
+    
+    def chunk(data: bytes) -> bytes:
+        return gzip.compress(data) + gzip.flush(zlib.Z_SYNC_FLUSH) if gzip else data
+    
+    if fmt == "csv":
+        yield chunk(_encode_csv([], columns))
+    async for rows in partitions:
+        data = _encode_csv(rows) if fmt == "csv" else _encode_ndjson(rows, columns)
+        if data:
+            yield chunk(data)
+    if gzip:
+        yield gzip.flush()
+
+def export_headers(name: str, fmt: str, compress: bool) -> Dict[str, str]:
+    filename = f"{name}-{datetime.utcnow():%Y%m%d-%H%M%S}.{fmt}{'.gz' if compress else ''}"
+    return {"Content-Disposition": f'attachment; filename="{filename}"'}
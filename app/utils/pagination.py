@@ -0,0 +1,39 @@
+from typing import List, Optional, Tuple
+from sqlalchemy import tuple_
+from sqlalchemy.sql import Select
+from datetime import datetime
+import base64
+import json
+
+def encode_cursor(created_at: datetime, row_id: int) -> str:
+    """Opaque cursor pointing just past the row (created_at, id)"""
+    raw = json.dumps([created_at.isoformat(), row_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Inverse of encode_cursor; ValueError for anything it didn't produce"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, row_id = json.loads(raw)
+        return datetime.fromisoformat(created_at), int(row_id)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+def keyset_page(query: Select, created_at_column, id_column, cursor: Optional[str], limit: int) -> Select:
+    """
+    Newest-first page of `query` after `cursor`
+    
+    Keyset on (created_at, id) instead of OFFSET, so page N costs the same
+    as page 1 and rows inserted meanwhile don't shift pages. Fetches one
+    extra row; pass the result to split_page.
+    """
+    if cursor:
+        query = query.where(tuple_(created_at_column, id_column) < decode_cursor(cursor))
+    return query.order_by(created_at_column.desc(), id_column.desc()).limit(limit + 1)
+
+def split_page(rows: List, limit: int) -> Tuple[List, Optional[str]]:
+    """(rows of this page, cursor of the next page or None) from keyset_page's result"""
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor(rows[-1].created_at, rows[-1].id)
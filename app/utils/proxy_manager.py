@@ -1,6 +1,23 @@
-import requests
-from typing import Dict
+import httpx
+from typing import Dict, Optional
+from app.config import get_settings
+from datetime import datetime, timezone
 import random
+import time
+
+settings = get_settings()
+
+def parse_expires_at(value: Optional[str]) -> Optional[datetime]:
+    """Provider ISO-8601 expiry ("2025-01-19T00:00:00Z") as naive UTC, like our other columns"""
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
 
 class ProxyManager:
     """
@@ -8,11 +25,52 @@ class ProxyManager:
     
     This is a template - integrate with your actual proxy provider
     Examples: Bright Data, IPRoyal, Proxy-Seller, etc.
+    
+    All provider calls go through one pooled httpx.AsyncClient, so
+    concurrent purchases reuse keep-alive connections instead of doing a
+    TCP/TLS handshake per call and never block the event loop.
     """
     
-    def __init__(self, api_key: str, api_url: str):
+    def __init__(
+        self,
+        api_key: str,
+        api_url: str,
+        timeout: float = 10.0,
+        connect_timeout: float = 5.0,
+        max_connections: int = 50,
+        max_keepalive_connections: int = 20,
+        health_check_url: str = "https://api.ipify.org?format=json"
+    ):
         self.api_key = api_key
         self.api_url = api_url
+        self.timeout = httpx.Timeout(timeout, connect=connect_timeout)
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections
+        )
+        self.health_check_url = health_check_url
+        self._client: Optional[httpx.AsyncClient] = None
+        # Loading CA certs costs more than the check itself; do it once
+        self._ssl_context = httpx.create_ssl_context()
+    
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """Shared provider API client, created lazily inside the running loop"""
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                base_url=self.api_url,
+                headers={"Authorization": f"Bearer {self.api_key}"},
+                timeout=self.timeout,
+                limits=self.limits,
+                verify=self._ssl_context
+            )
+        return self._client
+    
+    async def aclose(self):
+        """Close pooled connections (called on app shutdown)"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
     
     async def buy_mobile_proxy(self, city: str) -> Dict:
         """
@@ -30,9 +88,8 @@ class ProxyManager:
         # Example implementation (adapt to your provider)
         try:
             # Most proxy APIs work like this:
-            response = requests.post(
-                f"{self.api_url}/purchase",
-                headers={"Authorization": f"Bearer {self.api_key}"},
+            response = await self.client.post(
+                "/purchase",
                 json={
                     "proxy_type": "mobile_4g",
                     "location": city,
@@ -56,29 +113,108 @@ class ProxyManager:
                     "success": False,
                     "error": f"Proxy purchase failed: {response.text}"
                 }
-                
+        
         except Exception as e:
             return {
                 "success": False,
                 "error": f"Proxy purchase error: {str(e)}"
             }
     
+    async def renew_proxy(self, provider_id: str, duration_days: int = 30) -> Dict:
+        """
+        Extend a purchased proxy so the user keeps the same sticky IP
+        
+        Adapt to your provider's renewal endpoint, like buy_mobile_proxy()
+        """
+        try:
+            response = await self.client.post(
+                "/renew",
+                json={
+                    "proxy_id": provider_id,
+                    "duration_days": duration_days
+                }
+            )
+            
+            if response.status_code == 200:
+                data = response.json()
+                
+                return {
+                    "success": True,
+                    "provider_id": provider_id,
+                    "expires_at": data["expires_at"]
+                }
+            else:
+                return {
+                    "success": False,
+                    "provider_id": provider_id,
+                    "error": f"Proxy renewal failed: {response.text}"
+                }
+        
+        except Exception as e:
+            return {
+                "success": False,
+                "provider_id": provider_id,
+                "error": f"Proxy renewal error: {str(e)}"
+            }
+    
     async def check_proxy_health(self, proxy_url: str) -> bool:
         """
         Check if proxy is working and not banned
         """
+        result = await self.probe_proxy(proxy_url)
+        return result["healthy"]
+    
+    async def probe_proxy(self, proxy_url: str) -> Dict:
+        """
+        Measure reachability, latency and exit IP of a proxy
+        
+        Connections are tunnelled through `proxy_url` itself, so they cannot
+        be shared with the provider pool; a short-lived client is used instead.
+        
+        Returns:
+            {
+                "healthy": bool,
+                "latency_ms": int | None,
+                "exit_ip": str | None,
+                "error": str | None
+            }
+        """
+        start = time.perf_counter()
         try:
-            response = requests.get(
-                "https://api.ipify.org?format=json",
-                proxies={
-                    "http": proxy_url,
-                    "https": proxy_url
-                },
-                timeout=10
-            )
-            return response.status_code == 200
-        except:
-            return False
+            async with httpx.AsyncClient(
+                proxy=proxy_url,
+                timeout=self.timeout,
+                verify=self._ssl_context
+            ) as client:
+                response = await client.get(self.health_check_url)
+            latency_ms = int((time.perf_counter() - start) * 1000)
+            
+            if response.status_code != 200:
+                return {
+                    "healthy": False,
+                    "latency_ms": latency_ms,
+                    "exit_ip": None,
+                    "error": f"HTTP {response.status_code}"
+                }
+            
+            try:
+                exit_ip = response.json().get("ip")
+            except ValueError:
+                exit_ip = None
+            
+            return {
+                "healthy": True,
+                "latency_ms": latency_ms,
+                "exit_ip": exit_ip,
+                "error": None
+            }
+        except Exception as e:
+            return {
+                "healthy": False,
+                "latency_ms": None,
+                "exit_ip": None,
+                "error": str(e) or e.__class__.__name__
+            }
     
     async def get_mock_proxy_for_testing(self, city: str) -> Dict:
         """
@@ -92,3 +228,14 @@ class ProxyManager:
             "city": city,
             "expires_at": "2025-01-19T00:00:00Z"
         }
+
+# Singleton instance
+proxy_manager = ProxyManager(
+    api_key=settings.proxy_provider_api_key,
+    api_url=settings.proxy_provider_url,
+    timeout=settings.proxy_http_timeout,
+    connect_timeout=settings.proxy_http_connect_timeout,
+    max_connections=settings.proxy_http_max_connections,
+    max_keepalive_connections=settings.proxy_http_max_keepalive,
+    health_check_url=settings.proxy_health_check_url
+)
@@ -0,0 +1,109 @@
+from typing import Dict
+from sqlalchemy import Float, Numeric, bindparam, case, cast, func, null, update
+from sqlalchemy.orm import Session
+from app.models import Proxy, ProxyStatus
+from app.config import get_settings
+from datetime import datetime
+
+settings = get_settings()
+
+# Stats are updated with one UPDATE computed from the row's current values,
+# so concurrent probes and login outcomes for a proxy can't overwrite each other
+proxies = Proxy.__table__
+
+def _ewma(current, count, value):
+    """Exponentially weighted moving average, in SQL; the first sample (count 0) is taken as is"""
+    return case(
+        (func.coalesce(count, 0) == 0, value),
+        else_=current + settings.proxy_score_alpha * (value - current)
+    )
+
+def _score(latency_ms, error_rate, login_failure_rate, checkpoint_rate):
+    """
+    0-100, higher is better; NULL until the first latency sample
+    
+    Latency sets the base (500 ms -> 50), then the probe error rate, login
+    failure rate and checkpoint rate each scale it down.
+    """
+    return case(
+        (latency_ms.is_(None), null()),
+        else_=func.round(cast(
+            100 * 500 / (500 + latency_ms)
+            * (1 - error_rate)
+            * (1 - login_failure_rate)
+            * (1 - checkpoint_rate),
+            Numeric
+        ), 2)
+    )
+
+def _probe_update():
+    c = proxies.c
+    error = bindparam("error", type_=Float)
+    latency = bindparam("latency", type_=Float)
+    
+    error_rate = _ewma(c.error_rate, c.probe_count, error)
+    # Failed probes have no latency; the average is kept as is
+    latency_ms = case(
+        (latency.is_(None), c.latency_ms),
+        (c.latency_ms.is_(None), latency),
+        else_=c.latency_ms + settings.proxy_score_alpha * (latency - c.latency_ms)
+    )
+    return update(proxies).where(c.id == bindparam("proxy_id")).values(
+        probe_count=func.coalesce(c.probe_count, 0) + 1,
+        error_rate=error_rate,
+        latency_ms=latency_ms,
+        score=_score(latency_ms, error_rate, c.login_failure_rate, c.checkpoint_rate),
+        scored_at=bindparam("now")
+    )
+
+def _login_update():
+    c = proxies.c
+    login_failure_rate = _ewma(c.login_failure_rate, c.login_count, bindparam("failed", type_=Float))
+    checkpoint_rate = _ewma(c.checkpoint_rate, c.login_count, bindparam("checkpoint", type_=Float))
+    
+    return update(proxies).where(
+        c.user_id == bindparam("owner_id"),
+        c.status == ProxyStatus.ASSIGNED
+    ).values(
+        login_count=func.coalesce(c.login_count, 0) + 1,
+        login_failure_rate=login_failure_rate,
+        checkpoint_rate=checkpoint_rate,
+        score=_score(c.latency_ms, c.error_rate, login_failure_rate, checkpoint_rate),
+        scored_at=bindparam("now")
+    )
+
+PROBE_UPDATE = _probe_update()
+LOGIN_UPDATE = _login_update()
+
+def apply_probes(db: Session, results: Dict[int, Dict]):
+    """
+    Fold health probes (ProxyManager.probe_proxy), keyed by proxy id, into
+    the proxies' stats, in one executemany. The caller commits.
+    """
+    if not results:
+        return
+    
+    now = datetime.utcnow()
+    db.execute(PROBE_UPDATE, [
+        {
+            "proxy_id": proxy_id,
+            "error": 0.0 if result["healthy"] else 1.0,
+            "latency": result["latency_ms"],
+            "now": now
+        }
+        for proxy_id, result in results.items()
+    ])
+
+def record_login_outcome(db: Session, user_id: int, failed: bool = False, checkpoint: bool = False):
+    """
+    Fold a login outcome into the stats of the user's assigned proxy
+    
+    Called wherever a LoginAttempt is resolved or User.checkpoint_count
+    increases. The caller commits.
+    """
+    db.execute(LOGIN_UPDATE, {
+        "owner_id": user_id,
+        "failed": 1.0 if failed else 0.0,
+        "checkpoint": 1.0 if checkpoint else 0.0,
+        "now": datetime.utcnow()
+    })
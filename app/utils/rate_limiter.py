@@ -0,0 +1,29 @@
+import asyncio
+import time
+
+class RateLimiter:
+    """
+    Async token bucket: at most `rate` acquisitions per second, with bursts
+    of up to `burst`
+    
+    Shared by every coroutine calling a rate-limited third-party API.
+    """
+    
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+    
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
@@ -0,0 +1,91 @@
+from typing import Dict, Optional
+from sqlalchemy.orm import Session
+from app.models import User
+
+class SubscriberRecord:
+    """The few user fields the webhook path needs"""
+    __slots__ = ("id", "instagram_username", "city", "chatbot_enabled")
+    
+    def __init__(self, id: int, instagram_username: str, city: str, chatbot_enabled: bool):
+        self.id = id
+        self.instagram_username = instagram_username
+        self.city = city
+        self.chatbot_enabled = chatbot_enabled
+
+class SubscriberIndex:
+    """
+    In-memory ManyChat subscriber_id -> SubscriberRecord map
+    
+    Loaded on startup and updated by the routes that change a user's
+    subscriber mapping, so webhook events resolve their user without a
+    query. A miss (e.g. a user connected through another process) falls back
+    to the DB and is cached; a periodic reload picks up anything else
+    changed elsewhere.
+    """
+    
+    def __init__(self):
+        self._records: Dict[str, SubscriberRecord] = {}
+        self.hits = 0
+        self.misses = 0
+    
+    def __len__(self) -> int:
+        return len(self._records)
+    
+    @staticmethod
+    def _record(user) -> SubscriberRecord:
+        return SubscriberRecord(
+            user.id,
+            user.instagram_username,
+            user.city,
+            bool(user.chatbot_enabled)
+        )
+    
+    def load(self, db: Session) -> int:
+        """Rebuild from the users table; swapped in at once so readers never see a partial map"""
+        records = {}
+        rows = db.query(
+            User.manychat_subscriber_id,
+            User.id,
+            User.instagram_username,
+            User.city,
+            User.chatbot_enabled
+        ).filter(User.manychat_subscriber_id.isnot(None)).yield_per(5000)
+        
+        for row in rows:
+            records[row.manychat_subscriber_id] = self._record(row)
+        
+        self._records = records
+        return len(records)
+    
+    def put(self, user):
+        """Add or refresh a user after a committed change"""
+        if user.manychat_subscriber_id:
+            self._records[user.manychat_subscriber_id] = self._record(user)
+    
+    def discard(self, subscriber_id: Optional[str]):
+        """Drop an id that no longer maps to its user, e.g. replaced on reconnect"""
+        if subscriber_id:
+            self._records.pop(subscriber_id, None)
+    
+    def lookup(self, db: Session, subscriber_id: str) -> Optional[SubscriberRecord]:
+        record = self._records.get(subscriber_id)
+        if record is not None:
+            self.hits += 1
+            return record
+        
+        self.misses += 1
+        user = db.query(User).filter(User.manychat_subscriber_id == subscriber_id).first()
+        if user is None:
+            return None
+        self.put(user)
+        return self._records[subscriber_id]
+    
+    def stats(self) -> Dict:
+        return {
+            "size": len(self._records),
+            "hits": self.hits,
+            "misses": self.misses
+        }
+
+# Singleton instance
+subscriber_index = SubscriberIndex()
@@ -0,0 +1,228 @@
+from typing import Optional, Sequence, Tuple, Type
+from fastapi import Depends, HTTPException
+from pydantic import BaseModel
+from sqlalchemy import event, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, object_session
+from sqlalchemy.orm.exc import StaleDataError
+from app.database import get_db
+from app.models import User, UserStatus, OnboardingStage
+from app.workers.proxy_health import proxy_health_cache
+from app.utils.cache import TTLCache
+from app.config import get_settings
+
+settings = get_settings()
+
+# Columns cached per user; set only through the ORM, which invalidates them (see below)
+IDENTITY_FIELDS = ("instagram_username", "proxy_url")
+_CHANGED_KEY = "user_identity_changed"
+
+class UserRecord:
+    """The columns of one user a guarded route reads; the ones not loaded are left unset"""
+    __slots__ = (
+        "id",
+        "status",
+        "onboarding_stage",
+        "manychat_subscriber_id",
+        "instagram_username",
+        "proxy_url",
+        "city",
+        "approved_at"
+    )
+    
+    def __init__(self, **fields):
+        for name, value in fields.items():
+            setattr(self, name, value)
+
+class UserGuard:
+    """
+    What a route requires of the user it acts for, checked in this order:
+    - `statuses`: 400 with `status_detail` unless the user is in one of them
+    - `stage`: 400 unless at this onboarding stage
+    - `proxy_required`: 500 while no proxy is assigned
+    - `proxy_healthy`: 503 while the assigned proxy is known to be down
+    - `manychat`: 400 unless connected to ManyChat
+    `columns` are the other UserRecord fields the route reads.
+    """
+    
+    def __init__(
+        self,
+        statuses: Sequence[UserStatus] = (),
+        status_detail: str = "",
+        stage: Optional[OnboardingStage] = None,
+        proxy_required: bool = False,
+        proxy_healthy: bool = False,
+        manychat: bool = False,
+        columns: Sequence[str] = ()
+    ):
+        self.statuses = tuple(statuses)
+        self.status_detail = status_detail
+        self.stage = stage
+        self.proxy_required = proxy_required
+        self.proxy_healthy = proxy_healthy
+        self.manychat = manychat
+        
+        needed = ["id"]
+        if self.statuses:
+            needed.append("status")
+        if stage is not None:
+            needed.append("onboarding_stage")
+        if manychat:
+            needed.append("manychat_subscriber_id")
+        if proxy_required or proxy_healthy:
+            needed.append("proxy_url")
+        needed += [c for c in columns if c not in needed]
+        
+        # Read on every request, so a status change applies right away
+        self.fresh_columns: Tuple[str, ...] = tuple(c for c in needed if c not in IDENTITY_FIELDS)
+        self.needs_identity = any(c in IDENTITY_FIELDS for c in needed)
+    
+    def check(self, user):
+        if self.statuses and user.status not in self.statuses:
+            raise HTTPException(status_code=400, detail=self.status_detail)
+        
+        if self.stage is not None and user.onboarding_stage != self.stage:
+            raise HTTPException(status_code=400, detail="Invalid onboarding stage")
+        
+        if self.proxy_required and not user.proxy_url:
+            raise HTTPException(
+                status_code=500,
+                detail="Proxy not configured. Please contact support."
+            )
+        
+        if self.proxy_healthy and proxy_health_cache.is_unhealthy(user.proxy_url):
+            raise HTTPException(
+                status_code=503,
+                detail="Your proxy is currently unreachable. Please try again later."
+            )
+        
+        if self.manychat and not user.manychat_subscriber_id:
+            raise HTTPException(status_code=400, detail="User not connected to ManyChat")
+
+# Guards shared by the routes
+ANY_USER = UserGuard()
+ACTIVE_SENDER = UserGuard(
+    statuses=(UserStatus.ACTIVE,),
+    status_detail="User must complete onboarding first",
+    proxy_healthy=True,
+    columns=("instagram_username",)
+)
+APPROVED_ONBOARDER = UserGuard(
+    statuses=(UserStatus.APPROVED,),
+    status_detail="Account not approved yet. Please wait for admin approval.",
+    proxy_required=True,
+    proxy_healthy=True
+)
+TWO_FA_ONBOARDER = UserGuard(stage=OnboardingStage.TWO_FA, proxy_healthy=True)
+CHALLENGE_ONBOARDER = UserGuard(stage=OnboardingStage.CHALLENGE, proxy_healthy=True)
+LOGGED_IN = UserGuard(
+    statuses=(UserStatus.ACTIVE,),
+    status_detail="User must complete Instagram login first"
+)
+MANYCHAT_CONNECTED = UserGuard(manychat=True)
+
+async def _load_record(db: AsyncSession, user_id: int, guard: UserGuard) -> UserRecord:
+    """The guard's columns in one primary-key query; the identifiers come from user_identities when cached"""
+    identity = user_identities.get(user_id) if guard.needs_identity else None
+    load_identity = guard.needs_identity and identity is None
+    names = guard.fresh_columns + (IDENTITY_FIELDS if load_identity else ())
+    generation = user_identities.generation
+    
+    row = (await db.execute(
+        select(*(getattr(User, name) for name in names)).where(User.id == user_id)
+    )).first()
+    
+    if row is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    
+    # Hands the connection back now; no COMMIT round trip, nothing was written
+    await db.close()
+    fields = dict(zip(names, row))
+    if load_identity:
+        user_identities.put(user_id, tuple(fields[name] for name in IDENTITY_FIELDS), generation)
+    elif identity is not None:
+        fields.update(zip(IDENTITY_FIELDS, identity))
+    return UserRecord(**fields)
+
+async def _load_entity(db: AsyncSession, user_id: int) -> User:
+    """The full row, for routes that change it; its identifiers refresh user_identities"""
+    generation = user_identities.generation
+    user = await db.get(User, user_id)
+    
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    
+    user_identities.put(user.id, tuple(getattr(user, name) for name in IDENTITY_FIELDS), generation)
+    # As in _load_record; closing detaches the user (loaded attributes and
+    # version kept), so it is added back for the route's changes
+    await db.close()
+    db.add(user)
+    return user
+
+def load_user(guard: UserGuard, body: Optional[Type[BaseModel]] = None, entity: bool = False):
+    """
+    Dependency returning the user a request acts for, after `guard`'s checks (404 if missing)
+    
+    The user id is the `user_id` path parameter, or the field of the
+    `body` model (which must be the route's `req` parameter: FastAPI then
+    parses the body once for both). Returns a UserRecord of the guard's
+    columns, or with `entity` the full User for routes that change it
+    (User's version counter guards that write against a parallel one:
+    commit it with commit_user). Either way the session is closed after
+    the read, so no connection is held during the route's Instagram or
+    ManyChat calls.
+    """
+    async def load(db: AsyncSession, user_id: int):
+        if entity:
+            user = await _load_entity(db, user_id)
+        else:
+            user = await _load_record(db, user_id, guard)
+        guard.check(user)
+        return user
+    
+    if body is None:
+        async def dependency(user_id: int, db: AsyncSession = Depends(get_db)):
+            return await load(db, user_id)
+    else:
+        async def dependency(req: body, db: AsyncSession = Depends(get_db)):
+            return await load(db, req.user_id)
+    return dependency
+
+async def commit_user(db: AsyncSession, detail: str = "This account was changed by another request. Reload and try again."):
+    """
+    Commit a route's changes to a User
+    
+    The users UPDATE only applies to the version the route loaded: if a
+    parallel request committed first, nothing is written and the request
+    fails with 409 and `detail`.
+    """
+    try:
+        await db.commit()
+    except StaleDataError:
+        await db.rollback()
+        raise HTTPException(status_code=409, detail=detail)
+
+# Cached identifiers are dropped when a commit changes them
+def _track_identity_change(target, value, oldvalue, initiator):
+    if target.id is None or value == oldvalue:
+        return
+    session = object_session(target)
+    if session is None:
+        user_identities.invalidate(target.id)
+    else:
+        session.info.setdefault(_CHANGED_KEY, set()).add(target.id)
+
+for _field in IDENTITY_FIELDS:
+    event.listen(getattr(User, _field), "set", _track_identity_change)
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_changed_identities(session):
+    for user_id in session.info.pop(_CHANGED_KEY, ()):
+        user_identities.invalidate(user_id)
+
+@event.listens_for(Session, "after_soft_rollback")
+def _forget_changed_identities(session, previous_transaction):
+    session.info.pop(_CHANGED_KEY, None)
+
+# Singleton instance
+user_identities = TTLCache(settings.user_identity_ttl_seconds, settings.user_identity_max_entries)
@@ -0,0 +1,318 @@
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import select, delete, text
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+from app.database import SessionLocal, engine
+from app.models import LoginAttempt, LoginAttemptDaily, LoginStepTiming
+from app.utils.alerts import send_alert
+from app.config import get_settings
+from datetime import datetime, timedelta
+import asyncio
+import re
+import sys
+
+settings = get_settings()
+_retention_lock = asyncio.Lock()
+
+COUNTERS = ("attempts", "succeeded", "duration_ms", "timed")
+PARTITION_NAME = re.compile(r"^login_attempts_p(\d{4})_(\d{2})$")
+DEFAULT_PARTITION = "login_attempts_default"  # Rows no monthly partition covers (yet)
+
+def retention_cutoff() -> datetime:
+    """Attempts created before this are rolled up; whole days, so a day's rollup is built once"""
+    today = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+    return today - timedelta(days=settings.login_retention_days)
+
+def _upsert_daily(db: Session, rows: List[Dict]):
+    """Add `rows` onto the existing (user, day, type) counters, creating missing ones"""
+    insert = postgresql.insert if db.get_bind().dialect.name == "postgresql" else sqlite.insert
+    statement = insert(LoginAttemptDaily)
+    table = LoginAttemptDaily.__table__
+    db.execute(statement.on_conflict_do_update(
+        index_elements=["user_id", "day", "attempt_type"],
+        set_={column: table.c[column] + statement.excluded[column] for column in COUNTERS}
+    ), rows)
+
+def purge_batch(cutoff: datetime) -> int:
+    """
+    Roll up and delete one batch of attempts created before `cutoff`
+    
+    One transaction: the rows the DELETE actually removed are the ones
+    added to the rollup. Blocking - run in a thread.
+    """
+    batch = select(LoginAttempt.id).where(
+        LoginAttempt.created_at < cutoff
+    ).order_by(LoginAttempt.created_at).limit(settings.login_retention_batch_size)
+    
+    db = SessionLocal()
+    try:
+        # SQLite doesn't enforce the ON DELETE CASCADE (foreign keys are off)
+        db.execute(delete(LoginStepTiming).where(LoginStepTiming.attempt_id.in_(batch)))
+        deleted = db.execute(delete(LoginAttempt).where(LoginAttempt.id.in_(batch)).returning(
+            LoginAttempt.user_id,
+            LoginAttempt.attempt_type,
+            LoginAttempt.success,
+            LoginAttempt.duration_ms,
+            LoginAttempt.created_at
+        )).all()
+        
+        totals: Dict[Tuple, Dict] = {}
+        for row in deleted:
+            key = (row.user_id, row.created_at.date(), row.attempt_type or "unknown")
+            counters = totals.setdefault(key, dict.fromkeys(COUNTERS, 0))
+            counters["attempts"] += 1
+            counters["succeeded"] += 1 if row.success else 0
+            if row.duration_ms is not None:
+                counters["duration_ms"] += row.duration_ms
+                counters["timed"] += 1
+        
+        if totals:
+            _upsert_daily(db, [
+                {"user_id": user_id, "day": day, "attempt_type": attempt_type, **counters}
+                for (user_id, day, attempt_type), counters in totals.items()
+            ])
+        db.commit()
+        return len(deleted)
+    finally:
+        db.close()
+
+def _month_start(moment: datetime, months: int = 0) -> datetime:
+    index = moment.year * 12 + moment.month - 1 + months
+    return datetime(index // 12, index % 12 + 1, 1)
+
+def _partition_name(month: datetime) -> str:
+    return f"login_attempts_p{month.year}_{month.month:02d}"
+
+def _create_partition(conn: Connection, month: datetime) -> bool:
+    """
+    Create and attach `month`'s partition unless it exists; False if it did
+    
+    Rows the default partition holds for the month move into it first, as
+    PostgreSQL refuses to attach a range the default partition has rows
+    for. Run in a transaction.
+    """
+    name = _partition_name(month)
+    bounds = {"start": month, "end": _month_start(month, 1)}
+    # Self-conflicting but doesn't block inserts: one creator at a time
+    conn.execute(text("LOCK TABLE login_attempts IN SHARE UPDATE EXCLUSIVE MODE"))
+    if conn.scalar(text("SELECT to_regclass(:name) IS NOT NULL"), {"name": name}):
+        return False
+    
+    conn.execute(text(f"CREATE TABLE {name} (LIKE login_attempts INCLUDING DEFAULTS)"))
+    if conn.scalar(text("SELECT to_regclass(:name) IS NOT NULL"), {"name": DEFAULT_PARTITION}):
+        conn.execute(text(
+            f"WITH moved AS (DELETE FROM {DEFAULT_PARTITION} WHERE created_at >= :start AND created_at < :end "
+            f"RETURNING *) INSERT INTO {name} SELECT * FROM moved"
+        ), bounds)
+    conn.execute(text(
+        f"ALTER TABLE login_attempts ATTACH PARTITION {name} "
+        f"FOR VALUES FROM ('{month:%Y-%m-%d}') TO ('{bounds['end']:%Y-%m-%d}')"
+    ))
+    return True
+
+def is_partitioned(conn: Connection) -> bool:
+    if conn.dialect.name != "postgresql":
+        return False
+    return conn.execute(text(
+        "SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass('login_attempts')"
+    )).first() is not None
+
+def _partitions(conn: Connection) -> List[Tuple[str, datetime, bool]]:
+    """(name, month, attached) of every monthly partition table, attached or left detached"""
+    rows = conn.execute(text(
+        "SELECT c.relname, i.inhparent IS NOT NULL FROM pg_class c "
+        "LEFT JOIN pg_inherits i ON i.inhrelid = c.oid "
+        "WHERE c.relkind = 'r' AND c.relname LIKE 'login_attempts_p%' "
+        "AND c.relnamespace = to_regnamespace(current_schema())"
+    )).all()
+    partitions = []
+    for name, attached in rows:
+        match = PARTITION_NAME.match(name)
+        if match:
+            partitions.append((name, datetime(int(match.group(1)), int(match.group(2)), 1), attached))
+    return sorted(partitions, key=lambda p: p[1])
+
+def create_partitions() -> int:
+    """
+    Create the partitions for the coming LOGIN_PARTITION_MONTHS_AHEAD months
+    
+    Also creates one for every month the default partition holds rows
+    for, emptying it. One short transaction per partition. Blocking - run
+    in a thread.
+    """
+    created = 0
+    with engine.connect() as conn:
+        if not is_partitioned(conn):
+            return 0
+        first, last = conn.execute(text(f"SELECT min(created_at), max(created_at) FROM {DEFAULT_PARTITION}")).one()
+        conn.rollback()
+    
+    this_month = _month_start(datetime.utcnow())
+    months = {_month_start(this_month, months) for months in range(settings.login_partition_months_ahead + 1)}
+    month = _month_start(first) if first else None
+    while month and month <= last:
+        months.add(month)
+        month = _month_start(month, 1)
+    
+    for month in sorted(months):
+        with engine.begin() as conn:
+            created += _create_partition(conn, month)
+    return created
+
+def maintain_partitions(cutoff: datetime) -> Dict:
+    """
+    Create the coming months' partitions; roll up and drop months ended before `cutoff`
+    
+    DETACH can't run CONCURRENTLY next to a default partition, so each
+    month is detached in a short transaction that gives up after
+    lock_timeout rather than queueing inserts behind it. The rollup and
+    DROP of a detached month then run in one transaction, so a crash in
+    between leaves a detached table the next run finishes. Blocking - run
+    in a thread.
+    """
+    created = create_partitions()
+    dropped = 0
+    
+    with engine.connect() as conn:
+        expired = [(name, attached) for name, month, attached in _partitions(conn) if _month_start(month, 1) <= cutoff]
+        conn.rollback()
+    
+    for name, attached in expired:
+        if attached:
+            with engine.begin() as conn:
+                conn.execute(text("SET LOCAL lock_timeout = '10s'"))
+                conn.execute(text(f"ALTER TABLE login_attempts DETACH PARTITION {name}"))
+        
+        with engine.begin() as conn:
+            conn.execute(text(
+                "INSERT INTO login_attempts_daily (user_id, day, attempt_type, attempts, succeeded, duration_ms, timed) "
+                "SELECT user_id, created_at::date, coalesce(attempt_type, 'unknown'), count(*), "
+                "count(*) FILTER (WHERE success), coalesce(sum(duration_ms), 0), count(duration_ms) "
+                f"FROM {name} GROUP BY 1, 2, 3 "
+                "ON CONFLICT (user_id, day, attempt_type) DO UPDATE SET "
+                + ", ".join(f"{c} = login_attempts_daily.{c} + excluded.{c}" for c in COUNTERS)
+            ))
+            conn.execute(text(f"DELETE FROM login_step_timings WHERE attempt_id IN (SELECT id FROM {name})"))
+            conn.execute(text(f"DROP TABLE {name}"))
+        dropped += 1
+    
+    return {"partitions_created": created, "partitions_dropped": dropped}
+
+def _check_partitioned() -> bool:
+    with engine.connect() as conn:
+        return is_partitioned(conn)
+
+async def purge_login_attempts() -> Dict:
+    """
+    Roll up login attempts older than LOGIN_RETENTION_DAYS into LoginAttemptDaily and delete them
+    
+    On a plain table, LOGIN_RETENTION_BATCH_SIZE rows go per short
+    transaction, so the table is never locked for long. On a partitioned
+    table (see partition_login_attempts) whole months are dropped instead,
+    so rows are kept up to a month past the horizon.
+    """
+    async with _retention_lock:
+        cutoff = retention_cutoff()
+        summary = {"cutoff": cutoff.isoformat(), "rolled_up": 0}
+        
+        if await asyncio.to_thread(_check_partitioned):
+            summary.update(await asyncio.to_thread(maintain_partitions, cutoff))
+            return summary
+        
+        while True:
+            deleted = await asyncio.to_thread(purge_batch, cutoff)
+            summary["rolled_up"] += deleted
+            if deleted < settings.login_retention_batch_size:
+                break
+            # Let the request path's writes in between batches
+            await asyncio.sleep(settings.login_retention_batch_pause_seconds)
+        
+        return summary
+
+async def run_login_retention_loop():
+    """Background job started on app startup"""
+    while True:
+        try:
+            summary = await purge_login_attempts()
+            if summary["rolled_up"] or summary.get("partitions_dropped"):
+                print(f"Login retention: {summary}")
+        except Exception as e:
+            await asyncio.to_thread(send_alert, "Login retention job crashed", str(e))
+        
+        await asyncio.sleep(settings.login_retention_interval_seconds)
+
+async def run_login_partition_loop():
+    """
+    Background job started on app startup, LOGIN_RETENTION_ENABLED or not
+    
+    Keeps monthly partitions ahead of the clock on a partitioned table;
+    nothing to do otherwise.
+    """
+    while True:
+        try:
+            if await asyncio.to_thread(_check_partitioned):
+                created = await asyncio.to_thread(create_partitions)
+                if created:
+                    print(f"Login partitions: {created} created")
+        except Exception as e:
+            await asyncio.to_thread(send_alert, "Login partition job crashed", str(e))
+        
+        await asyncio.sleep(settings.login_retention_interval_seconds)
+
+def partition_login_attempts(conn: Connection, first_month: Optional[datetime] = None):
+    """
+    Rebuild login_attempts as a table partitioned by month of created_at (PostgreSQL)
+    
+    One-off, with the app stopped - copies every row in one transaction
+    holding an exclusive lock:
+        python -m app.workers.login_retention partition
+    
+    The primary key becomes (id, created_at), as PostgreSQL requires of
+    partitioned tables, so login_step_timings loses its foreign key to it;
+    maintain_partitions deletes the timings of dropped months. Rows past
+    the last monthly partition, then and later, land in a default
+    partition until create_partitions gives them their month.
+    """
+    if conn.dialect.name != "postgresql":
+        raise RuntimeError("Partitioning needs PostgreSQL")
+    if is_partitioned(conn):
+        raise RuntimeError("login_attempts is already partitioned")
+    
+    conn.execute(text("LOCK TABLE login_attempts IN ACCESS EXCLUSIVE MODE"))
+    sequence = conn.scalar(text("SELECT pg_get_serial_sequence('login_attempts', 'id')"))
+    oldest = conn.scalar(text("SELECT min(created_at) FROM login_attempts"))
+    first_month = first_month or _month_start(oldest or datetime.utcnow())
+    
+    conn.execute(text("UPDATE login_attempts SET created_at = now() at time zone 'utc' WHERE created_at IS NULL"))
+    conn.execute(text("ALTER TABLE login_step_timings DROP CONSTRAINT IF EXISTS login_step_timings_attempt_id_fkey"))
+    conn.execute(text("ALTER TABLE login_attempts RENAME TO login_attempts_unpartitioned"))
+    conn.execute(text(
+        "CREATE TABLE login_attempts (LIKE login_attempts_unpartitioned INCLUDING DEFAULTS) "
+        "PARTITION BY RANGE (created_at)"
+    ))
+    conn.execute(text("ALTER TABLE login_attempts ALTER COLUMN created_at SET NOT NULL"))
+    conn.execute(text(f"CREATE TABLE {DEFAULT_PARTITION} PARTITION OF login_attempts DEFAULT"))
+    
+    month = first_month
+    last_month = _month_start(datetime.utcnow(), settings.login_partition_months_ahead)
+    while month <= last_month:
+        _create_partition(conn, month)
+        month = _month_start(month, 1)
+    
+    conn.execute(text("INSERT INTO login_attempts SELECT * FROM login_attempts_unpartitioned"))
+    conn.execute(text(f"ALTER SEQUENCE {sequence} OWNED BY NONE"))
+    conn.execute(text("DROP TABLE login_attempts_unpartitioned"))
+    conn.execute(text(f"ALTER SEQUENCE {sequence} OWNED BY login_attempts.id"))
+    
+    # Built after the copy; created on the parent, they cascade to every partition
+    conn.execute(text("ALTER TABLE login_attempts ADD PRIMARY KEY (id, created_at)"))
+    conn.execute(text("CREATE INDEX ix_login_attempts_user_id_created_at ON login_attempts (user_id, created_at)"))
+    conn.execute(text("CREATE INDEX ix_login_attempts_created_at ON login_attempts (created_at)"))
+
+if __name__ == "__main__":
+    if sys.argv[1:] != ["partition"]:
+        sys.exit("usage: python -m app.workers.login_retention partition")
+    with engine.begin() as conn:
+        partition_login_attempts(conn)
+    print("login_attempts is now partitioned by month")
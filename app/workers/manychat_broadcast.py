@@ -0,0 +1,154 @@
+from typing import Dict
+from sqlalchemy import select, update, exists
+from sqlalchemy.sql import Select
+from app.database import AsyncSessionLocal, uninterrupted
+from app.models import User, ManyChatTag, ManyChatBroadcast, BroadcastStatus
+from app.integrations.manychat_handler import manychat
+from app.config import get_settings
+from datetime import datetime
+import asyncio
+import json
+
+settings = get_settings()
+
+# Broadcasts running in this process, so they can be cancelled right away
+_running: Dict[int, asyncio.Task] = {}
+_shutting_down = False
+
+def recipients_select(filters: Dict) -> Select:
+    """
+    (id, manychat_subscriber_id) of connected users matching a broadcast filter
+    
+    `tags` must all be present (see ManyChatTag).
+    """
+    query = select(User.id, User.manychat_subscriber_id).where(
+        User.manychat_subscriber_id.isnot(None)
+    )
+    
+    if filters.get("chatbot_enabled") is not None:
+        query = query.where(User.chatbot_enabled == filters["chatbot_enabled"])
+    if filters.get("city"):
+        query = query.where(User.city == filters["city"])
+    for tag in filters.get("tags") or []:
+        query = query.where(exists().where(
+            ManyChatTag.user_id == User.id,
+            ManyChatTag.tag == tag
+        ))
+    
+    return query
+
+def broadcast_summary(broadcast: ManyChatBroadcast) -> Dict:
+    return {
+        "broadcast_id": broadcast.id,
+        "status": broadcast.status.value,
+        "filters": json.loads(broadcast.filters),
+        "total": broadcast.total,
+        "sent": broadcast.sent,
+        "failed": broadcast.failed,
+        "last_error": broadcast.last_error,
+        "created_at": broadcast.created_at,
+        "finished_at": broadcast.finished_at
+    }
+
+async def run_broadcast(broadcast_id: int):
+    """
+    Send a broadcast to its recipients
+    
+    Recipients are read MANYCHAT_BROADCAST_CHUNK_SIZE at a time by keyset on
+    users.id, so memory stays flat whatever the audience size. Each chunk is
+    sent with MANYCHAT_BROADCAST_CONCURRENCY requests in flight, paced by the
+    handler's send rate limiter, and progress is committed after it. The
+    status is re-read every chunk, so a cancel from another process stops
+    the run too. A cancel in this process lands between DB round trips.
+    """
+    async with AsyncSessionLocal() as db:
+        broadcast = await uninterrupted(db.get(ManyChatBroadcast, broadcast_id))
+        semaphore = asyncio.Semaphore(settings.manychat_broadcast_concurrency)
+        filters = json.loads(broadcast.filters)
+        message, message_tag = broadcast.message, broadcast.message_tag
+        
+        async def send(subscriber_id: str):
+            async with semaphore:
+                result = await manychat.send_message(subscriber_id, message, tag=message_tag)
+            if result["status"] == "error":
+                broadcast.failed += 1
+                broadcast.last_error = result["message"]
+            else:
+                broadcast.sent += 1
+        
+        try:
+            while broadcast.status == BroadcastStatus.RUNNING:
+                chunk = (await uninterrupted(db.execute(
+                    recipients_select(filters).where(
+                        User.id > broadcast.last_user_id
+                    ).order_by(User.id).limit(settings.manychat_broadcast_chunk_size)
+                ))).all()
+                
+                if not chunk:
+                    broadcast.status = BroadcastStatus.DONE
+                    broadcast.finished_at = datetime.utcnow()
+                    await uninterrupted(db.commit())
+                    break
+                
+                await asyncio.gather(*[send(r.manychat_subscriber_id) for r in chunk])
+                broadcast.last_user_id = chunk[-1].id
+                await uninterrupted(db.commit())
+                await uninterrupted(db.refresh(broadcast, ["status"]))
+        
+        except asyncio.CancelledError:
+            if _shutting_down:
+                broadcast.status = BroadcastStatus.FAILED
+                broadcast.last_error = "Interrupted by shutdown"
+            else:
+                broadcast.status = BroadcastStatus.CANCELLED
+            broadcast.finished_at = datetime.utcnow()
+            await db.commit()
+            raise
+        
+        except Exception as e:
+            await db.rollback()
+            broadcast.status = BroadcastStatus.FAILED
+            broadcast.last_error = str(e)
+            broadcast.finished_at = datetime.utcnow()
+            await db.commit()
+        
+        finally:
+            _running.pop(broadcast_id, None)
+
+def start_broadcast(broadcast_id: int):
+    """Run a committed broadcast in the background"""
+    _running[broadcast_id] = asyncio.create_task(run_broadcast(broadcast_id))
+
+def cancel_broadcast(broadcast_id: int) -> bool:
+    """Cancel a broadcast running in this process; False if it is not"""
+    task = _running.get(broadcast_id)
+    if task is None:
+        return False
+    task.cancel()
+    return True
+
+async def stop_broadcasts():
+    """Cancel running broadcasts on app shutdown; they end as failed, not cancelled"""
+    global _shutting_down
+    _shutting_down = True
+    
+    broadcast_ids = list(_running)
+    tasks = list(_running.values())
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    
+    # Tasks cancelled before their first step (or mid-commit) never record it
+    if broadcast_ids:
+        async with AsyncSessionLocal() as db:
+            await db.execute(
+                update(ManyChatBroadcast).where(
+                    ManyChatBroadcast.id.in_(broadcast_ids),
+                    ManyChatBroadcast.status == BroadcastStatus.RUNNING
+                ).values(
+                    status=BroadcastStatus.FAILED,
+                    last_error="Interrupted by shutdown",
+                    finished_at=datetime.utcnow()
+                )
+            )
+            await db.commit()
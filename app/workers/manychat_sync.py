@@ -0,0 +1,219 @@
+from typing import Dict, List, Optional, Set, Tuple
+from collections import defaultdict
+from sqlalchemy import select, delete
+from sqlalchemy.dialects import postgresql, sqlite
+from app.database import AsyncSessionLocal, uninterrupted
+from app.models import User, ManyChatTag, ManyChatFieldValue
+from app.integrations.manychat_handler import manychat
+from app.config import get_settings
+from datetime import datetime
+import asyncio
+
+settings = get_settings()
+_sync_lock = asyncio.Lock()
+_sync_task: Optional[asyncio.Task] = None
+
+# Progress of the last fleet resync in this process
+sync_status = {
+    "running": False,
+    "force": False,
+    "started_at": None,
+    "finished_at": None,
+    "users": 0,
+    "calls": 0,
+    "failed": 0
+}
+
+def desired_state(user) -> Tuple[Set[str], Dict[int, str]]:
+    """
+    Tags and custom field values a subscriber should have, from our DB
+    
+    Works on a User or any row with city and instagram_username.
+    """
+    tags = {"nightlife"}
+    if user.city:
+        tags.add(user.city)
+    
+    fields = {}
+    if settings.manychat_username_field_id:
+        fields[settings.manychat_username_field_id] = user.instagram_username
+    if settings.manychat_city_field_id and user.city:
+        fields[settings.manychat_city_field_id] = user.city
+    
+    return tags, fields
+
+async def _synced_state(ids: List[int]) -> Tuple[Dict, Dict]:
+    """What was last synced for `ids`: ({user_id: {tag: row id}}, {user_id: {field_id: value}})"""
+    synced_tags = defaultdict(dict)
+    synced_fields = defaultdict(dict)
+    async with AsyncSessionLocal() as db:
+        for row_id, user_id, tag in await db.execute(
+            select(ManyChatTag.id, ManyChatTag.user_id, ManyChatTag.tag).where(ManyChatTag.user_id.in_(ids))
+        ):
+            synced_tags[user_id][tag] = row_id
+        
+        for user_id, field_id, value in await db.execute(select(
+            ManyChatFieldValue.user_id,
+            ManyChatFieldValue.field_id,
+            ManyChatFieldValue.value
+        ).where(ManyChatFieldValue.user_id.in_(ids))):
+            synced_fields[user_id][field_id] = value
+    
+    return synced_tags, synced_fields
+
+async def _record_synced(tag_inserts: List[Dict], tag_deletes: List[int], field_values: List[Dict]):
+    """
+    Store what ManyChat accepted, in one short transaction
+    
+    Conflicts with rows written meanwhile (a connect, another resync) are
+    resolved on the unique keys instead of failing the whole chunk.
+    """
+    if not (tag_inserts or tag_deletes or field_values):
+        return
+    
+    async with AsyncSessionLocal() as db:
+        insert = postgresql.insert if db.get_bind().dialect.name == "postgresql" else sqlite.insert
+        if tag_inserts:
+            await db.execute(
+                insert(ManyChatTag).on_conflict_do_nothing(index_elements=["user_id", "tag"]),
+                tag_inserts
+            )
+        if tag_deletes:
+            await db.execute(
+                delete(ManyChatTag).where(ManyChatTag.id.in_(tag_deletes)),
+                execution_options={"synchronize_session": False}
+            )
+        if field_values:
+            statement = insert(ManyChatFieldValue)
+            await db.execute(statement.on_conflict_do_update(
+                index_elements=["user_id", "field_id"],
+                set_={"value": statement.excluded.value, "synced_at": statement.excluded.synced_at}
+            ), field_values)
+        await db.commit()
+
+async def sync_users(users: List, force: bool = False) -> Dict:
+    """
+    Push tag/custom-field changes for `users` to ManyChat
+    
+    Desired state is diffed against what we last synced (manychat_tags,
+    manychat_field_values), and only the differing calls are made, all
+    concurrently under MANYCHAT_SYNC_CONCURRENCY and the handler's rate
+    limit. `force` re-sends every desired tag and field. Local state is
+    updated for successful calls only. No session is held during the API
+    calls: the synced state is read before them and the results written
+    after, each in its own short session.
+    """
+    synced_tags, synced_fields = await _synced_state([user.id for user in users])
+    
+    planned = []
+    for user in users:
+        tags, fields = desired_state(user)
+        have_tags = synced_tags[user.id]
+        have_fields = synced_fields[user.id]
+        
+        for tag in sorted(tags):
+            if force or tag not in have_tags:
+                planned.append((user, "add_tag", tag, None))
+        for tag in sorted(set(have_tags) - tags):
+            planned.append((user, "remove_tag", tag, None))
+        for field_id, value in fields.items():
+            if force or have_fields.get(field_id) != value:
+                planned.append((user, "set_field", field_id, value))
+    
+    semaphore = asyncio.Semaphore(settings.manychat_sync_concurrency)
+    
+    async def apply(subscriber_id: str, kind: str, key, value) -> Dict:
+        async with semaphore:
+            if kind == "add_tag":
+                return await manychat.add_tag(subscriber_id, key)
+            if kind == "remove_tag":
+                return await manychat.remove_tag(subscriber_id, key)
+            return await manychat.set_custom_field(subscriber_id, key, value)
+    
+    results = await asyncio.gather(*[
+        apply(user.manychat_subscriber_id, kind, key, value)
+        for user, kind, key, value in planned
+    ])
+    
+    # Record what ManyChat accepted, set-based
+    now = datetime.utcnow()
+    tag_inserts, tag_deletes, field_values = [], [], []
+    failed = 0
+    
+    for (user, kind, key, value), result in zip(planned, results):
+        if result["status"] == "error":
+            failed += 1
+        elif kind == "add_tag" and key not in synced_tags[user.id]:
+            tag_inserts.append({"user_id": user.id, "tag": key, "created_at": now})
+        elif kind == "remove_tag":
+            tag_deletes.append(synced_tags[user.id][key])
+        elif kind == "set_field":
+            field_values.append({"user_id": user.id, "field_id": key, "value": value, "synced_at": now})
+    
+    await _record_synced(tag_inserts, tag_deletes, field_values)
+    
+    return {
+        "users": len(users),
+        "calls": len(planned),
+        "failed": failed
+    }
+
+async def resync_fleet(force: bool = False) -> Dict:
+    """
+    Sync every connected subscriber, MANYCHAT_SYNC_BATCH_SIZE users at a time
+    
+    Users already in sync cost no API calls, so after a segmentation change
+    only the affected subscribers are touched.
+    """
+    async with _sync_lock:
+        sync_status.update(
+            running=True,
+            force=force,
+            started_at=datetime.utcnow(),
+            finished_at=None,
+            users=0,
+            calls=0,
+            failed=0
+        )
+        last_id = 0
+        
+        try:
+            while True:
+                async with AsyncSessionLocal() as db:
+                    users = (await uninterrupted(db.execute(select(
+                        User.id,
+                        User.manychat_subscriber_id,
+                        User.city,
+                        User.instagram_username
+                    ).where(
+                        User.manychat_subscriber_id.isnot(None),
+                        User.id > last_id
+                    ).order_by(User.id).limit(settings.manychat_sync_batch_size)))).all()
+                
+                if not users:
+                    break
+                last_id = users[-1].id
+                
+                summary = await uninterrupted(sync_users(users, force=force))
+                
+                for key in ("users", "calls", "failed"):
+                    sync_status[key] += summary[key]
+        finally:
+            sync_status["running"] = False
+            sync_status["finished_at"] = datetime.utcnow()
+        
+        return dict(sync_status)
+
+def start_resync(force: bool = False) -> bool:
+    """Start a fleet resync in the background; False if one is already running"""
+    global _sync_task
+    if _sync_task is not None and not _sync_task.done():
+        return False
+    _sync_task = asyncio.create_task(resync_fleet(force=force))
+    return True
+
+async def stop_resync():
+    """Stop a running fleet resync on app shutdown, after its current batch (it is safe to rerun)"""
+    if _sync_task is not None and not _sync_task.done():
+        _sync_task.cancel()
+        await asyncio.gather(_sync_task, return_exceptions=True)
@@ -0,0 +1,212 @@
+from typing import Dict
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from app.database import SessionLocal, engine
+from app.models import ManyChatEvent, WebhookEventStatus
+from app.integrations.java_forwarder import java_forwarder
+from app.workers.user_activity import user_activity
+from app.utils.dedup import DedupWindow
+from app.utils.subscriber_index import subscriber_index
+from app.config import get_settings
+from datetime import datetime, timedelta
+from contextlib import nullcontext
+import asyncio
+import hashlib
+import json
+import threading
+import time
+
+settings = get_settings()
+_new_events = asyncio.Event()
+
+# SQLite ignores FOR UPDATE SKIP LOCKED; serialize batches there instead
+_claim_lock = threading.Lock() if engine.dialect.name == "sqlite" else nullcontext()
+
+# Recently accepted event keys; the unique manychat_events.event_key column
+# backs it up across restarts and processes for MANYCHAT_EVENT_RETENTION_HOURS
+webhook_dedup = DedupWindow(
+    ttl=settings.manychat_dedup_window_seconds,
+    max_entries=settings.manychat_dedup_max_entries
+)
+
+# In-process counters, reported next to the queue depth and lag from the DB
+metrics = {
+    "duplicates": 0,
+    "processed": 0,
+    "retried": 0,
+    "failed": 0,
+    "last_batch_size": 0,
+    "last_batch_ms": 0
+}
+
+def event_key(data: Dict) -> str:
+    """
+    Identity of a webhook delivery, stable across ManyChat redeliveries
+    
+    The event id when ManyChat sends one, otherwise the event type and a
+    hash of the whole body with its keys sorted, so events of different
+    types, or without a message text, sharing a subscriber and timestamp
+    are not taken for redeliveries of each other.
+    """
+    event = data.get("data") or {}
+    event_id = data.get("id") or event.get("id") or event.get("event_id")
+    
+    if event_id:
+        identity = f"id:{event_id}"
+    else:
+        body = hashlib.sha256(json.dumps(data, sort_keys=True).encode()).hexdigest()
+        identity = "content:" + json.dumps([data.get("type"), body])
+    
+    return hashlib.sha256(identity.encode()).hexdigest()
+
+def notify_new_event():
+    """Wake idle workers right away instead of at their next poll"""
+    _new_events.set()
+
+def process_event(db: Session, data: Dict):
+    """Handle one parsed webhook event"""
+    event_type = data.get("type")
+    
+    if event_type == "message":
+        # New message received
+        subscriber_id = data["data"]["subscriber"]["id"]
+        message_text = data["data"]["message"]["text"]
+        
+        # Find user by subscriber ID (in memory; DB only on a miss)
+        user = subscriber_index.lookup(db, subscriber_id)
+        
+        if user:
+            # TODO: Process message with your AI
+            # TODO: Store in your custom inbox
+            
+            user_activity.touch(user.id)
+            
+            # Journaled to disk before this returns, so the event can be marked
+            # done; batched and sent by the forwarder's own background job
+            java_forwarder.enqueue({
+                "user_id": user.id,
+                "instagram_username": user.instagram_username,
+                "subscriber_id": subscriber_id,
+                "message": message_text,
+                "timestamp": data["data"].get("timestamp")
+            })
+
+def process_batch() -> int:
+    """
+    Claim up to MANYCHAT_WEBHOOK_BATCH_SIZE pending events and process them
+    
+    Rows are claimed with FOR UPDATE SKIP LOCKED so several workers can run
+    side by side. A failing event is retried on later batches until it has
+    used MANYCHAT_WEBHOOK_MAX_ATTEMPTS. Blocking - run in a thread.
+    """
+    with _claim_lock:
+        return _process_batch()
+
+def _process_batch() -> int:
+    db = SessionLocal()
+    try:
+        events = db.query(ManyChatEvent).filter(
+            ManyChatEvent.status == WebhookEventStatus.PENDING
+        ).order_by(ManyChatEvent.id).limit(
+            settings.manychat_webhook_batch_size
+        ).with_for_update(skip_locked=True).all()
+        
+        start = time.perf_counter()
+        for event in events:
+            event.attempts += 1
+            try:
+                with db.begin_nested():
+                    process_event(db, json.loads(event.payload))
+                event.status = WebhookEventStatus.DONE
+                event.processed_at = datetime.utcnow()
+                event.error = None
+                metrics["processed"] += 1
+            except Exception as e:
+                event.error = str(e)
+                if event.attempts >= settings.manychat_webhook_max_attempts:
+                    event.status = WebhookEventStatus.FAILED
+                    metrics["failed"] += 1
+                else:
+                    metrics["retried"] += 1
+        
+        db.commit()
+        
+        if events:
+            metrics["last_batch_size"] = len(events)
+            metrics["last_batch_ms"] = int((time.perf_counter() - start) * 1000)
+        return len(events)
+    finally:
+        db.close()
+
+def purge_processed() -> int:
+    """Delete processed events older than MANYCHAT_EVENT_RETENTION_HOURS"""
+    cutoff = datetime.utcnow() - timedelta(hours=settings.manychat_event_retention_hours)
+    db = SessionLocal()
+    try:
+        deleted = db.query(ManyChatEvent).filter(
+            ManyChatEvent.status == WebhookEventStatus.DONE,
+            ManyChatEvent.processed_at < cutoff
+        ).delete(synchronize_session=False)
+        db.commit()
+        return deleted
+    finally:
+        db.close()
+
+def load_subscriber_index() -> int:
+    """(Re)load the subscriber index from the DB - blocking, run in a thread"""
+    db = SessionLocal()
+    try:
+        return subscriber_index.load(db)
+    finally:
+        db.close()
+
+def queue_metrics(db: Session) -> Dict:
+    """Queue depth and lag (age of the oldest pending event) plus worker counters"""
+    depth, oldest = db.query(
+        func.count(ManyChatEvent.id),
+        func.min(ManyChatEvent.received_at)
+    ).filter(ManyChatEvent.status == WebhookEventStatus.PENDING).one()
+    
+    failed = db.query(func.count(ManyChatEvent.id)).filter(
+        ManyChatEvent.status == WebhookEventStatus.FAILED
+    ).scalar()
+    
+    return {
+        "depth": depth,
+        "lag_seconds": round((datetime.utcnow() - oldest).total_seconds(), 3) if oldest else 0,
+        "failed_events": failed,
+        "workers": settings.manychat_webhook_workers,
+        "subscriber_index": subscriber_index.stats(),
+        **metrics
+    }
+
+async def run_webhook_worker(worker_id: int):
+    """Background job started on app startup, once per worker"""
+    last_purge = 0.0
+    last_index_load = time.monotonic()  # Loaded on startup
+    
+    while True:
+        claimed = 0
+        try:
+            claimed = await asyncio.to_thread(process_batch)
+            
+            if worker_id == 0 and time.monotonic() - last_purge > 600:
+                await asyncio.to_thread(purge_processed)
+                last_purge = time.monotonic()
+            
+            if worker_id == 0 and time.monotonic() - last_index_load > settings.manychat_subscriber_index_refresh_seconds:
+                await asyncio.to_thread(load_subscriber_index)
+                last_index_load = time.monotonic()
+        except Exception as e:
+            print(f"ManyChat webhook worker {worker_id} failed: {e}")
+        
+        # A full batch means there is probably more waiting
+        if claimed < settings.manychat_webhook_batch_size:
+            try:
+                await asyncio.wait_for(
+                    _new_events.wait(),
+                    timeout=settings.manychat_webhook_poll_seconds
+                )
+            except asyncio.TimeoutError:
+                pass
+            _new_events.clear()
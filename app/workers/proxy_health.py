@@ -0,0 +1,160 @@
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import and_
+from app.database import SessionLocal
+from app.models import User, Proxy, ProxyStatus, ProxyHealthCheck
+from app.utils.proxy_manager import proxy_manager
+from app.utils.proxy_scoring import apply_probes
+from app.config import get_settings
+from datetime import datetime
+import asyncio
+import time
+
+settings = get_settings()
+
+class ProxyHealthCache:
+    """
+    Latest probe result per proxy URL, valid for `ttl` seconds
+    
+    Consulted by the login and DM routes so traffic is not sent through a
+    proxy we already know is down. Expired entries count as unknown.
+    """
+    
+    def __init__(self, ttl: int):
+        self.ttl = ttl
+        self._entries: Dict[str, Tuple[float, Dict]] = {}
+    
+    def set(self, proxy_url: str, result: Dict):
+        self._entries[proxy_url] = (time.monotonic() + self.ttl, result)
+    
+    def get(self, proxy_url: str) -> Optional[Dict]:
+        entry = self._entries.get(proxy_url)
+        if entry is None:
+            return None
+        
+        expires_at, result = entry
+        if expires_at < time.monotonic():
+            self._entries.pop(proxy_url, None)
+            return None
+        return result
+    
+    def is_unhealthy(self, proxy_url: Optional[str]) -> bool:
+        """True only if a fresh probe says the proxy is down"""
+        if not proxy_url:
+            return False
+        result = self.get(proxy_url)
+        return result is not None and not result["healthy"]
+    
+    def unhealthy(self) -> List[Dict]:
+        now = time.monotonic()
+        return [
+            result
+            for expires_at, result in list(self._entries.values())
+            if expires_at >= now and not result["healthy"]
+        ]
+
+# Singleton instance
+proxy_health_cache = ProxyHealthCache(ttl=settings.proxy_health_ttl_seconds)
+
+def _load_targets() -> List[Dict]:
+    """Every assigned proxy URL and every warm pool proxy - blocking, run in a thread"""
+    db = SessionLocal()
+    try:
+        assigned = db.query(
+            User.id.label("user_id"),
+            User.instagram_username,
+            User.proxy_url,
+            User.proxy_provider_id,
+            Proxy.id.label("proxy_id")
+        ).outerjoin(
+            Proxy,
+            and_(Proxy.user_id == User.id, Proxy.status == ProxyStatus.ASSIGNED)
+        ).filter(User.proxy_url.isnot(None)).all()
+        
+        pooled = db.query(
+            Proxy.id,
+            Proxy.proxy_url,
+            Proxy.provider_id
+        ).filter(Proxy.status == ProxyStatus.AVAILABLE).all()
+    finally:
+        db.close()
+    
+    return [dict(row._mapping) for row in assigned] + [
+        {
+            "user_id": None,
+            "instagram_username": None,
+            "proxy_url": row.proxy_url,
+            "proxy_provider_id": row.provider_id,
+            "proxy_id": row.id
+        }
+        for row in pooled
+    ]
+
+def _record_results(targets: List[Dict], results: List[Dict]):
+    """Write the probe history and fold the probes into the proxy scores - blocking, run in a thread"""
+    db = SessionLocal()
+    try:
+        db.add_all([
+            ProxyHealthCheck(
+                user_id=target["user_id"],
+                proxy_url=target["proxy_url"],
+                healthy=result["healthy"],
+                latency_ms=result["latency_ms"],
+                exit_ip=result["exit_ip"],
+                error=result["error"],
+                checked_at=result["checked_at"]
+            )
+            for target, result in zip(targets, results)
+        ])
+        
+        # Fold the probes into each proxy's rolling score
+        apply_probes(db, {
+            target["proxy_id"]: result
+            for target, result in zip(targets, results)
+            if target["proxy_id"]
+        })
+        
+        db.commit()
+    finally:
+        db.close()
+
+async def check_fleet() -> Dict:
+    """
+    Probe every assigned User.proxy_url and every warm pool proxy with
+    bounded concurrency
+    
+    Results go to the in-memory cache, the proxy_health_checks history table
+    and the rolling stats/score of the matching proxies row.
+    """
+    targets = await asyncio.to_thread(_load_targets)
+    semaphore = asyncio.Semaphore(settings.proxy_health_concurrency)
+    
+    async def probe(target: Dict) -> Dict:
+        async with semaphore:
+            result = await proxy_manager.probe_proxy(target["proxy_url"])
+        result.update(
+            user_id=target["user_id"],
+            instagram_username=target["instagram_username"],
+            proxy_provider_id=target["proxy_provider_id"],
+            checked_at=datetime.utcnow()
+        )
+        proxy_health_cache.set(target["proxy_url"], result)
+        return result
+    
+    results = await asyncio.gather(*[probe(target) for target in targets])
+    await asyncio.to_thread(_record_results, targets, results)
+    
+    return {
+        "checked": len(results),
+        "unhealthy": sum(1 for result in results if not result["healthy"])
+    }
+
+async def run_proxy_health_loop():
+    """Background job started on app startup"""
+    while True:
+        try:
+            summary = await check_fleet()
+            print(f"Proxy health: {summary['checked']} checked, {summary['unhealthy']} unhealthy")
+        except Exception as e:
+            print(f"Proxy health check failed: {e}")
+        
+        await asyncio.sleep(settings.proxy_health_interval_seconds)
@@ -0,0 +1,189 @@
+from typing import Callable, Dict, List, Optional
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from app.database import SessionLocal
+from app.models import User, UserStatus, Proxy, ProxyStatus
+from app.utils.proxy_manager import proxy_manager, parse_expires_at
+from app.config import get_settings
+from datetime import datetime
+import asyncio
+import math
+
+settings = get_settings()
+_refill_lock = asyncio.Lock()
+_refill_requested = asyncio.Event()
+
+def _available_by_city(db: Session) -> Dict[str, int]:
+    return dict(
+        db.query(Proxy.city, func.count(Proxy.id))
+        .filter(Proxy.status == ProxyStatus.AVAILABLE)
+        .group_by(Proxy.city)
+        .all()
+    )
+
+def pool_targets(db: Session) -> Dict[str, Dict]:
+    """
+    Warm pool size wanted per city, driven by pending applications
+    
+    A city with pending users keeps at least PROXY_POOL_MIN_PER_CITY proxies,
+    plus PROXY_POOL_PENDING_RATIO per pending user, capped at
+    PROXY_POOL_MAX_PER_CITY. Cities with nobody pending get no new proxies.
+    """
+    pending = dict(
+        db.query(User.city, func.count(User.id))
+        .filter(User.status == UserStatus.PENDING)
+        .group_by(User.city)
+        .all()
+    )
+    available = _available_by_city(db)
+    
+    targets = {}
+    for city in set(pending) | set(available):
+        pending_count = pending.get(city, 0)
+        target = 0
+        if pending_count:
+            target = min(
+                settings.proxy_pool_max_per_city,
+                max(
+                    settings.proxy_pool_min_per_city,
+                    math.ceil(pending_count * settings.proxy_pool_pending_ratio)
+                )
+            )
+        targets[city] = {
+            "pending": pending_count,
+            "available": available.get(city, 0),
+            "target": target
+        }
+    return targets
+
+def _read(query: Callable[[Session], Dict]) -> Dict:
+    """Run `query(db)` on a fresh session - blocking, run in a thread"""
+    db = SessionLocal()
+    try:
+        return query(db)
+    finally:
+        db.close()
+
+def _add_to_pool(purchased: List[Dict]):
+    """Insert bought proxies as AVAILABLE - blocking, run in a thread"""
+    db = SessionLocal()
+    try:
+        db.add_all([
+            Proxy(
+                provider_id=r["provider_id"],
+                proxy_url=r["proxy_url"],
+                city=r["city"],
+                status=ProxyStatus.AVAILABLE,
+                expires_at=parse_expires_at(r.get("expires_at"))
+            )
+            for r in purchased
+        ])
+        db.commit()
+    finally:
+        db.close()
+
+async def _purchase_into_pool(orders: List[str]) -> Dict:
+    """Buy one proxy per entry in `orders` (a list of cities), a few at a time"""
+    if not orders:
+        return {"purchased": 0, "failed": 0}
+    
+    semaphore = asyncio.Semaphore(settings.proxy_pool_purchase_concurrency)
+    
+    async def buy(city: str) -> Dict:
+        async with semaphore:
+            return await proxy_manager.buy_mobile_proxy(city)
+    
+    results = await asyncio.gather(*[buy(city) for city in orders])
+    purchased = [r for r in results if r["success"]]
+    
+    for r in results:
+        if not r["success"]:
+            print(f"Proxy pool purchase failed: {r.get('error')}")
+    
+    if purchased:
+        await asyncio.to_thread(_add_to_pool, purchased)
+    
+    return {
+        "purchased": len(purchased),
+        "failed": len(results) - len(purchased)
+    }
+
+async def refill_pool() -> Dict:
+    """Buy proxies for every city below its target"""
+    async with _refill_lock:
+        targets = await asyncio.to_thread(_read, pool_targets)
+        
+        return await _purchase_into_pool([
+            city
+            for city, t in targets.items()
+            for _ in range(t["target"] - t["available"])
+        ])
+
+async def ensure_available(demand: Dict[str, int]) -> Dict:
+    """
+    Make sure each city has at least `demand[city]` available proxies,
+    buying the shortfall concurrently (used by bulk approval)
+    """
+    async with _refill_lock:
+        available = await asyncio.to_thread(_read, _available_by_city)
+        
+        return await _purchase_into_pool([
+            city
+            for city, needed in demand.items()
+            for _ in range(needed - available.get(city, 0))
+        ])
+
+def request_refill():
+    """Wake the refill loop early, e.g. right after a proxy was taken from the pool"""
+    _refill_requested.set()
+
+async def run_proxy_pool_loop():
+    """Background job started on app startup"""
+    while True:
+        try:
+            summary = await refill_pool()
+            if summary["purchased"] or summary["failed"]:
+                print(f"Proxy pool: {summary['purchased']} purchased, {summary['failed']} failed")
+        except Exception as e:
+            print(f"Proxy pool refill failed: {e}")
+        
+        try:
+            await asyncio.wait_for(
+                _refill_requested.wait(),
+                timeout=settings.proxy_pool_refill_interval_seconds
+            )
+        except asyncio.TimeoutError:
+            pass
+        _refill_requested.clear()
+
+def assign_pooled_proxy(db: Session, user: User) -> Optional[Proxy]:
+    """
+    Take the best-scoring available proxy in the user's city and assign it
+    
+    Unscored proxies (not probed yet) come after scored ones, oldest first.
+    The row is locked with FOR UPDATE SKIP LOCKED, so concurrent approvals
+    in the same city each get a different proxy. The caller commits.
+    """
+    proxy = db.query(Proxy).filter(
+        Proxy.city == user.city,
+        Proxy.status == ProxyStatus.AVAILABLE
+    ).order_by(
+        Proxy.score.desc().nullslast(),
+        Proxy.purchased_at
+    ).with_for_update(skip_locked=True).first()
+    
+    if not proxy:
+        return None
+    
+    proxy.status = ProxyStatus.ASSIGNED
+    proxy.user_id = user.id
+    proxy.assigned_at = datetime.utcnow()
+    
+    user.proxy_url = proxy.proxy_url
+    user.proxy_provider_id = proxy.provider_id
+    user.proxy_city = proxy.city
+    
+    # Sessions don't autoflush; flush so the next assignment in this
+    # transaction can't pick the same row
+    db.flush()
+    return proxy
@@ -0,0 +1,111 @@
+from typing import Dict, List
+from app.database import SessionLocal
+from app.models import Proxy, ProxyStatus
+from app.utils.proxy_manager import proxy_manager, parse_expires_at
+from app.utils.rate_limiter import RateLimiter
+from app.utils.alerts import send_alert
+from app.config import get_settings
+from datetime import datetime, timedelta
+import asyncio
+
+settings = get_settings()
+_renewal_lock = asyncio.Lock()
+
+def _expiring_batch(cutoff: datetime, last_id: int) -> List:
+    """The next id-ordered batch of live proxies expiring by `cutoff` - blocking, run in a thread"""
+    db = SessionLocal()
+    try:
+        return db.query(Proxy.id, Proxy.provider_id, Proxy.user_id, Proxy.expires_at).filter(
+            Proxy.status != ProxyStatus.RETIRED,
+            Proxy.expires_at <= cutoff,
+            Proxy.id > last_id
+        ).order_by(Proxy.id).limit(settings.proxy_renewal_batch_size).all()
+    finally:
+        db.close()
+
+def _save_expiries(updates: List[Dict]):
+    """Write the renewed expiry dates - blocking, run in a thread"""
+    db = SessionLocal()
+    try:
+        db.bulk_update_mappings(Proxy, updates)
+        db.commit()
+    finally:
+        db.close()
+
+async def renew_expiring_proxies() -> Dict:
+    """
+    Renew every live proxy expiring within PROXY_RENEWAL_WINDOW_DAYS
+    
+    Proxies are read in id-ordered batches and renewed concurrently, with
+    both a concurrency cap and a request rate limit toward the provider.
+    Failures are reported in one alert at the end of the run.
+    """
+    async with _renewal_lock:
+        cutoff = datetime.utcnow() + timedelta(days=settings.proxy_renewal_window_days)
+        semaphore = asyncio.Semaphore(settings.proxy_renewal_concurrency)
+        limiter = RateLimiter(settings.proxy_renewal_rate_per_second)
+        
+        async def renew(provider_id: str) -> Dict:
+            async with semaphore:
+                await limiter.acquire()
+                return await proxy_manager.renew_proxy(
+                    provider_id,
+                    duration_days=settings.proxy_renewal_duration_days
+                )
+        
+        renewed = 0
+        failures: List[Dict] = []
+        last_id = 0
+        
+        while True:
+            batch = await asyncio.to_thread(_expiring_batch, cutoff, last_id)
+            
+            if not batch:
+                break
+            last_id = batch[-1].id
+            
+            results = await asyncio.gather(*[renew(p.provider_id) for p in batch])
+            
+            updates = []
+            for proxy, result in zip(batch, results):
+                expires_at = parse_expires_at(result.get("expires_at")) if result["success"] else None
+                if expires_at:
+                    updates.append({"id": proxy.id, "expires_at": expires_at})
+                else:
+                    failures.append({
+                        "provider_id": proxy.provider_id,
+                        "user_id": proxy.user_id,
+                        "expires_at": proxy.expires_at,
+                        "error": result.get("error", f"Unparseable expiry: {result.get('expires_at')}")
+                    })
+            
+            if updates:
+                await asyncio.to_thread(_save_expiries, updates)
+            renewed += len(updates)
+        
+        if failures:
+            await asyncio.to_thread(
+                send_alert,
+                f"{len(failures)} proxy renewals failed",
+                "\n".join(
+                    f"{f['provider_id']} (user {f['user_id']}, expires {f['expires_at']}): {f['error']}"
+                    for f in failures
+                )
+            )
+        
+        return {
+            "renewed": renewed,
+            "failed": len(failures)
+        }
+
+async def run_proxy_renewal_loop():
+    """Background job started on app startup"""
+    while True:
+        try:
+            summary = await renew_expiring_proxies()
+            if summary["renewed"] or summary["failed"]:
+                print(f"Proxy renewal: {summary['renewed']} renewed, {summary['failed']} failed")
+        except Exception as e:
+            await asyncio.to_thread(send_alert, "Proxy renewal job crashed", str(e))
+        
+        await asyncio.sleep(settings.proxy_renewal_interval_seconds)
@@ -0,0 +1,177 @@
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import DateTime, Integer, bindparam, case, column, or_, update, values
+from app.database import async_engine, uninterrupted
+from app.models import User
+from app.config import get_settings
+from datetime import datetime
+import asyncio
+import threading
+import time
+
+settings = get_settings()
+
+class UserActivityBuffer:
+    """
+    Write-behind buffer for per-user activity (last_activity_at, dms_sent)
+    
+    touch() only updates one in-memory entry per user: the latest activity
+    time and the summed counters. Every `flush_interval` seconds, or once
+    `max_pending` users are waiting, all entries are written with one
+    UPDATE users ... FROM (VALUES ...) per `batch_size` users instead of
+    an UPDATE per DM or inbox read. Entries whose write fails are merged
+    back and retried on the next flush; the rest is flushed on shutdown.
+    
+    Core UPDATEs: they don't bump users.version_id, so activity never makes
+    an onboarding step fail with a conflict.
+    """
+    
+    COUNTERS = ("dms_sent",)
+    
+    def __init__(self, flush_interval: float = 5.0, batch_size: int = 500, max_pending: int = 10000):
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.max_pending = max_pending
+        
+        self._pending: Dict[int, Dict] = {}
+        self._lock = threading.Lock()  # touch() is also called from webhook worker threads
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._flush_requested: Optional[asyncio.Event] = None
+        self._flush_lock = asyncio.Lock()
+        
+        self.metrics = {
+            "touches": 0,
+            "flushes": 0,
+            "users_written": 0,
+            "failed_flushes": 0,
+            "last_flush_ms": 0,
+            "max_flush_ms": 0
+        }
+    
+    def touch(self, user_id: int, at: Optional[datetime] = None, **counters: int):
+        """Record activity of `user_id` (now by default) and add `counters`; thread-safe"""
+        at = at or datetime.utcnow()
+        
+        with self._lock:
+            self.metrics["touches"] += 1
+            entry = self._pending.get(user_id)
+            if entry is None:
+                entry = self._pending[user_id] = {"last_activity_at": at, **dict.fromkeys(self.COUNTERS, 0)}
+            elif at > entry["last_activity_at"]:
+                entry["last_activity_at"] = at
+            for name, count in counters.items():
+                entry[name] += count
+            full = len(self._pending) >= self.max_pending
+        
+        if full and self._loop is not None:
+            self._loop.call_soon_threadsafe(self._flush_requested.set)
+    
+    def stats(self) -> Dict:
+        with self._lock:
+            pending = len(self._pending)
+        
+        return {
+            "pending_users": pending,
+            **self.metrics
+        }
+    
+    def _merge_back(self, entries: List[Tuple[int, Dict]]):
+        """Return unwritten entries to the buffer, combined with anything touched since"""
+        with self._lock:
+            for user_id, entry in entries:
+                current = self._pending.get(user_id)
+                if current is None:
+                    self._pending[user_id] = entry
+                    continue
+                current["last_activity_at"] = max(current["last_activity_at"], entry["last_activity_at"])
+                for name in self.COUNTERS:
+                    current[name] += entry[name]
+    
+    async def _write(self, batch: List[Tuple[int, Dict]]):
+        """One batched UPDATE; never moves last_activity_at backwards"""
+        fields = ("id", "last_activity_at", *self.COUNTERS)
+        rows = [(user_id, entry["last_activity_at"], *[entry[name] for name in self.COUNTERS]) for user_id, entry in batch]
+        
+        async with async_engine.begin() as conn:
+            if conn.dialect.name == "postgresql":
+                activity = values(
+                    column("id", Integer),
+                    column("last_activity_at", DateTime),
+                    *[column(name, Integer) for name in self.COUNTERS],
+                    name="activity"
+                ).data(rows)
+                source = {name: activity.c[name] for name in fields}
+                parameters = None
+            else:
+                # SQLite can't name the columns of a VALUES alias: same UPDATE, executemany in one transaction
+                source = {name: bindparam(f"activity_{name}") for name in fields}
+                parameters = [{f"activity_{name}": value for name, value in zip(fields, row)} for row in rows]
+            
+            statement = update(User).where(User.id == source["id"]).values(
+                last_activity_at=case(
+                    (
+                        or_(User.last_activity_at.is_(None), User.last_activity_at < source["last_activity_at"]),
+                        source["last_activity_at"]
+                    ),
+                    else_=User.last_activity_at
+                ),
+                **{name: getattr(User, name) + source[name] for name in self.COUNTERS}
+            ).execution_options(synchronize_session=False)
+            await conn.execute(statement, parameters)
+    
+    async def flush(self):
+        """Write everything buffered now"""
+        async with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, {}
+            if not pending:
+                return
+            
+            # Same row order in every process: concurrent flushes can't deadlock each other
+            entries = sorted(pending.items())
+            start = time.perf_counter()
+            
+            for i in range(0, len(entries), self.batch_size):
+                try:
+                    await uninterrupted(self._write(entries[i:i + self.batch_size]))
+                except asyncio.CancelledError:
+                    # The batch in flight was still written; the rest goes with the shutdown flush
+                    self._merge_back(entries[i + self.batch_size:])
+                    raise
+                except Exception:
+                    self._merge_back(entries[i:])
+                    self.metrics["failed_flushes"] += 1
+                    raise
+            
+            elapsed_ms = int((time.perf_counter() - start) * 1000)
+            self.metrics["flushes"] += 1
+            self.metrics["users_written"] += len(entries)
+            self.metrics["last_flush_ms"] = elapsed_ms
+            self.metrics["max_flush_ms"] = max(self.metrics["max_flush_ms"], elapsed_ms)
+    
+    async def run(self):
+        """Background job started on app startup"""
+        self._loop = asyncio.get_running_loop()
+        self._flush_requested = asyncio.Event()
+        
+        while True:
+            try:
+                await asyncio.wait_for(self._flush_requested.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._flush_requested.clear()
+            
+            try:
+                await self.flush()
+            except Exception as e:
+                print(f"User activity flush failed: {e}")
+    
+    async def aclose(self):
+        """Flush what is left; called on shutdown"""
+        await self.flush()
+
+# Singleton instance
+user_activity = UserActivityBuffer(
+    flush_interval=settings.user_activity_flush_seconds,
+    batch_size=settings.user_activity_batch_size,
+    max_pending=settings.user_activity_max_pending
+)
@@ -0,0 +1,23 @@
+"""
+Defaults for the settings app.config requires, so benchmarks and checks run without a .env
+
+Import it before any app module:
+    import benchmarks._env  # noqa: F401
+Values already in the environment win; a script needing a different one
+(an in-memory DATABASE_URL, another fake provider port) sets it with
+os.environ.setdefault before the import. DATABASE_URL defaults to a fresh
+temporary SQLite file.
+"""
+import os
+import tempfile
+
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/scratch.db")
+os.environ.setdefault("SECRET_KEY", "bench")
+os.environ.setdefault("ENCRYPTION_KEY", "eKCit50_2ZTOo0OkPNHOPr3s5Ka5tTlBfgJUerA_A5o=")
+os.environ.setdefault("PROXY_PROVIDER_API_KEY", "bench")
+os.environ.setdefault("PROXY_PROVIDER_URL", "http://127.0.0.1:8765")
+os.environ.setdefault("SMTP_HOST", "localhost")
+os.environ.setdefault("SMTP_PORT", "25")
+os.environ.setdefault("SMTP_USER", "bench")
+os.environ.setdefault("SMTP_PASSWORD", "bench")
+os.environ.setdefault("FRONTEND_URL", "http://localhost:3000")
@@ -0,0 +1,145 @@
+"""
+Benchmark request throughput of DB-backed routes under concurrent load
+
+Serves the same handlers two ways and fires concurrent requests at both:
+- before: blocking ORM queries on the event loop (the old sync `get_db`)
+- after: the app's routes on the async engine (asyncpg / aiosqlite)
+
+Uses DATABASE_URL when set - point it at a scratch PostgreSQL database for
+numbers that reflect production; otherwise a temporary SQLite file.
+
+Run from the repo root:
+    python -m benchmarks.bench_db
+"""
+import os
+
+import benchmarks._env  # noqa: F401 - defaults for the settings app.config requires
+# Only the request path is measured
+os.environ["PROXY_HEALTH_ENABLED"] = "false"
+os.environ["PROXY_POOL_ENABLED"] = "false"
+os.environ["PROXY_RENEWAL_ENABLED"] = "false"
+os.environ["MANYCHAT_WEBHOOK_WORKERS"] = "0"
+
+from fastapi import FastAPI, Depends, HTTPException
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from benchmarks.fake_servers import run_in_thread
+from app.database import SessionLocal, Base, engine
+from app.models import User, UserStatus, Proxy, ProxyStatus
+from app.main import app
+import asyncio
+import httpx
+import random
+import time
+
+BEFORE_PORT = 8781
+AFTER_PORT = 8782
+USERS = 10_000
+REQUESTS = 4000
+CONCURRENCY = 10  # The before case deadlocks once requests exceed its pool (5 + 10 overflow)
+
+def legacy_app() -> FastAPI:
+    """The pre-async routes: a sync Session used inside `async def` handlers"""
+    legacy = FastAPI()
+    
+    def get_sync_db():
+        db = SessionLocal()
+        try:
+            yield db
+        finally:
+            db.close()
+    
+    @legacy.get("/api/onboarding/status/{user_id}")
+    async def check_application_status(user_id: int, db: Session = Depends(get_sync_db)):
+        user = db.query(User).filter(User.id == user_id).first()
+        if not user:
+            raise HTTPException(status_code=404, detail="User not found")
+        return {
+            "status": user.status.value,
+            "instagram_username": user.instagram_username,
+            "city": user.city,
+            "can_login": user.status == UserStatus.APPROVED,
+            "approved_at": user.approved_at.isoformat() if user.approved_at else None
+        }
+    
+    @legacy.get("/api/admin/user/{user_id}")
+    async def get_user_details(user_id: int, db: Session = Depends(get_sync_db)):
+        user = db.query(User).filter(User.id == user_id).first()
+        if not user:
+            raise HTTPException(status_code=404, detail="User not found")
+        proxy_expires_at = db.query(Proxy.expires_at).filter(
+            Proxy.user_id == user.id,
+            Proxy.status == ProxyStatus.ASSIGNED
+        ).scalar()
+        return {
+            "id": user.id,
+            "email": user.email,
+            "instagram_username": user.instagram_username,
+            "proxy_expires_at": proxy_expires_at.isoformat() if proxy_expires_at else None
+        }
+    
+    return legacy
+
+def seed():
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        if db.query(func.count(User.id)).scalar() >= USERS:
+            return
+        db.bulk_insert_mappings(User, [
+            {
+                "email": f"bench-{i}@example.com",
+                "instagram_username": f"bench_{i}",
+                "city": random.choice(["Miami", "Austin", "Paris"]),
+                "status": UserStatus.ACTIVE
+            }
+            for i in range(USERS)
+        ])
+        db.commit()
+    finally:
+        db.close()
+
+async def load(port: int, path: str, ids: list) -> tuple:
+    """REQUESTS GETs of `path` with CONCURRENCY in flight; returns (seconds, sorted latencies)"""
+    latencies = []
+    queue = iter(range(REQUESTS))
+    
+    async with httpx.AsyncClient(
+        base_url=f"http://127.0.0.1:{port}",
+        limits=httpx.Limits(max_connections=CONCURRENCY)
+    ) as client:
+        async def worker():
+            for _ in queue:
+                start = time.perf_counter()
+                response = await client.get(path.format(random.choice(ids)))
+                response.raise_for_status()
+                latencies.append(time.perf_counter() - start)
+        
+        start = time.perf_counter()
+        await asyncio.gather(*[worker() for _ in range(CONCURRENCY)])
+        return time.perf_counter() - start, sorted(latencies)
+
+def report(label: str, seconds: float, latencies: list):
+    p50 = latencies[len(latencies) // 2] * 1000
+    p99 = latencies[int(len(latencies) * 0.99)] * 1000
+    print(f"{label:<44} {REQUESTS / seconds:8.1f} req/s  p50 {p50:6.1f}ms  p99 {p99:6.1f}ms")
+
+def main():
+    seed()
+    db = SessionLocal()
+    ids = [i for (i,) in db.query(User.id).limit(USERS)]
+    db.close()
+    
+    print(f"{engine.dialect.name}, {len(ids)} users, {REQUESTS} requests, {CONCURRENCY} concurrent\n")
+    before = run_in_thread(legacy_app(), BEFORE_PORT)
+    after = run_in_thread(app, AFTER_PORT)
+    try:
+        for path in ("/api/onboarding/status/{}", "/api/admin/user/{}"):
+            report(f"before (sync session) {path.split('/')[-2]}", *asyncio.run(load(BEFORE_PORT, path, ids)))
+            report(f"after (async engine)  {path.split('/')[-2]}", *asyncio.run(load(AFTER_PORT, path, ids)))
+    finally:
+        before.should_exit = True
+        after.should_exit = True
+
+if __name__ == "__main__":
+    main()
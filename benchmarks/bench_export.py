@@ -0,0 +1,119 @@
+"""
+Benchmark exporting a large users table: materialized JSON vs the streaming export
+
+Seeds USERS users, then exports them all three ways, measuring time to
+first byte, total time and peak Python memory (tracemalloc, on a second
+run):
+- before: every row loaded with .all() and serialized as one JSON body,
+  like /api/admin/users with no page limit
+- after: /api/admin/export/users as CSV, and as gzipped NDJSON, consumed
+  chunk by chunk from the StreamingResponse
+
+Also checks that the CSV has one line per user and the gzipped NDJSON
+decompresses to one object per user.
+
+Uses DATABASE_URL when set - point it at a scratch PostgreSQL database for
+numbers that reflect production; otherwise a temporary SQLite file.
+
+Run from the repo root:
+    python -m benchmarks.bench_export
+"""
+import tempfile
+
+import benchmarks._env  # noqa: F401 - defaults for the settings app.config requires
+
+from sqlalchemy import func, insert, select
+from app.database import SessionLocal, async_engine, read_session, init_db
+from app.models import User, UserStatus
+from app.routes.admin import USER_EXPORT_COLUMNS, export_users
+from app.utils.export import _plain
+from datetime import datetime, timedelta
+import asyncio
+import json
+import sys
+import time
+import tracemalloc
+import zlib
+
+USERS = 200000
+SEED_BATCH = 50000
+
+def seed():
+    init_db()
+    with SessionLocal() as db:
+        existing = db.scalar(select(func.count(User.id)))
+        start = datetime(2025, 1, 1)
+        for first in range(existing, USERS, SEED_BATCH):
+            db.execute(insert(User), [
+                {
+                    "email": f"export-{i}@example.com",
+                    "instagram_username": f"export_{i}",
+                    "city": ["Miami", "Paris", "Austin"][i % 3],
+                    "status": UserStatus.ACTIVE,
+                    "created_at": start + timedelta(seconds=i),
+                    "last_login_at": start + timedelta(days=1, seconds=i)
+                }
+                for i in range(first, min(first + SEED_BATCH, USERS))
+            ])
+            db.commit()
+
+async def materialized():
+    """The pre-change way to get every user: one result list, one JSON document"""
+    async with read_session() as db:
+        rows = (await db.execute(select(*USER_EXPORT_COLUMNS).order_by(User.id))).all()
+    names = [c.name for c in USER_EXPORT_COLUMNS]
+    yield json.dumps({"users": [dict(zip(names, map(_plain, row))) for row in rows]}).encode()
+
+async def streamed(fmt: str, gzip: bool):
+    response = await export_users(format=fmt, gzip=gzip, status=None, city=None, stage=None, fresh=False)
+    async for chunk in response.body_iterator:
+        yield chunk
+
+async def drain(body, out) -> tuple:
+    """Writes `body` to `out` (what a client does); (seconds to first byte, total seconds)"""
+    start = time.perf_counter()
+    first_byte = None
+    async for chunk in body:
+        if first_byte is None:
+            first_byte = time.perf_counter() - start
+        out.write(chunk)
+    return first_byte, time.perf_counter() - start
+
+async def measure(label: str, make_body) -> bytes:
+    """Times one run of make_body(), then takes the peak traced memory of another (tracemalloc slows it down)"""
+    with tempfile.TemporaryFile() as out:
+        first_byte, total = await drain(make_body(), out)
+        out.seek(0)
+        data = out.read()
+    
+    tracemalloc.start()
+    with tempfile.TemporaryFile() as out:
+        await drain(make_body(), out)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    
+    print(
+        f"{label:<34} first byte {first_byte * 1000:8.1f}ms  total {total:6.1f}s  "
+        f"peak {peak / 2**20:7.1f} MiB  body {len(data) / 2**20:6.1f} MiB"
+    )
+    return data
+
+async def main():
+    await asyncio.to_thread(seed)
+    print(f"{async_engine.dialect.name}, {USERS} users\n")
+    
+    await measure("before (materialized JSON)", materialized)
+    csv_body = await measure("after (streamed CSV)", lambda: streamed("csv", False))
+    ndjson_body = await measure("after (streamed NDJSON, gzip)", lambda: streamed("ndjson", True))
+    
+    csv_lines = csv_body.count(b"\n") - 1  # Header
+    ndjson_lines = zlib.decompress(ndjson_body, wbits=31).decode().splitlines()
+    ok = csv_lines == USERS and len(ndjson_lines) == USERS and json.loads(ndjson_lines[-1])["email"] == f"export-{USERS - 1}@example.com"
+    print(f"\n[{'ok' if ok else 'FAILED'}] CSV {csv_lines} rows, NDJSON {len(ndjson_lines)} rows")
+    
+    await async_engine.dispose()
+    if not ok:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    asyncio.run(main())
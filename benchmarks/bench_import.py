@@ -0,0 +1,109 @@
+"""
+Benchmark importing partner sign-ups: replaying /apply per row vs the bulk import
+
+- before: APPLY_ROWS applications posted one by one to /api/onboarding/apply
+  (two existence checks and an INSERT + commit each); the time for
+  IMPORT_ROWS is extrapolated from the per-row cost
+- after: IMPORT_ROWS rows as one CSV body streamed to
+  /api/admin/import-applications, in CHUNK_BYTES chunks
+
+A few rows in the CSV are invalid, repeated within the file or already
+registered; the run checks each is reported as such.
+
+Uses DATABASE_URL when set - point it at a scratch PostgreSQL database for
+numbers that reflect production; otherwise a temporary SQLite file.
+
+Run from the repo root:
+    python -m benchmarks.bench_import
+"""
+import os
+
+import benchmarks._env  # noqa: F401 - defaults for the settings app.config requires
+os.environ.setdefault("PROXY_POOL_ENABLED", "false")
+
+from fastapi import FastAPI
+from sqlalchemy import func, select
+from app.database import SessionLocal, async_engine, init_db
+from app.models import User
+from app.routes import admin, onboarding
+import asyncio
+import httpx
+import sys
+import time
+import uuid
+
+APPLY_ROWS = 1000
+IMPORT_ROWS = 100000
+CHUNK_BYTES = 64 * 1024
+CITIES = ["Miami", "Paris", "Austin", "Berlin"]
+
+def application(prefix: str, i: int) -> dict:
+    return {
+        "email": f"{prefix}-{i}@example.com",
+        "instagram_username": f"{prefix}_{i}",
+        "city": CITIES[i % len(CITIES)]
+    }
+
+def user_count() -> int:
+    with SessionLocal() as db:
+        return db.scalar(select(func.count(User.id)))
+
+def csv_body(prefix: str, registered: dict) -> bytes:
+    """IMPORT_ROWS rows: the last three are a repeat, an invalid email and an already registered account"""
+    lines = ["email,instagram_username,city"]
+    for i in range(IMPORT_ROWS - 3):
+        a = application(prefix, i)
+        lines.append(f"{a['email']},{a['instagram_username']},{a['city']}")
+    lines.append(lines[1])
+    lines.append(f"not-an-email,{prefix}_bad,Miami")
+    lines.append(f"{registered['email']},{registered['instagram_username']},{registered['city']}")
+    return ("\n".join(lines) + "\n").encode()
+
+async def main():
+    init_db()
+    app = FastAPI()
+    app.include_router(onboarding.router)
+    app.include_router(admin.router)
+    prefix = uuid.uuid4().hex[:8]
+    
+    print(f"{async_engine.dialect.name}\n")
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=None) as client:
+        start = time.perf_counter()
+        for i in range(APPLY_ROWS):
+            response = await client.post("/api/onboarding/apply", json=application(f"{prefix}a", i))
+            response.raise_for_status()
+        per_row = (time.perf_counter() - start) / APPLY_ROWS
+        print(f"{'before (/apply per row)':<36} {per_row * IMPORT_ROWS:8.1f}s for {IMPORT_ROWS} rows (extrapolated from {APPLY_ROWS})")
+        
+        body = csv_body(f"{prefix}b", application(f"{prefix}a", 0))
+        
+        async def chunks():
+            for i in range(0, len(body), CHUNK_BYTES):
+                yield body[i:i + CHUNK_BYTES]
+        
+        before = await asyncio.to_thread(user_count)
+        start = time.perf_counter()
+        response = await client.post("/api/admin/import-applications", content=chunks(), headers={"content-type": "text/csv"})
+        seconds = time.perf_counter() - start
+        response.raise_for_status()
+        data = response.json()
+        print(f"{'after (streamed bulk import)':<36} {seconds:8.1f}s for {IMPORT_ROWS} rows ({len(body) // 1024} KiB)")
+    
+    inserted = await asyncio.to_thread(user_count) - before
+    tail = [r["status"] for r in data["results"][-3:]]
+    ok = (
+        data["created"] == IMPORT_ROWS - 3 == inserted
+        and data["total"] == IMPORT_ROWS
+        and tail == ["duplicate", "invalid", "duplicate"]
+    )
+    print(
+        f"\n[{'ok' if ok else 'FAILED'}] {data['created']} created ({inserted} rows inserted), "
+        f"{data['duplicates']} duplicates, {data['invalid']} invalid, {data['failed']} failed"
+    )
+    
+    await async_engine.dispose()
+    if not ok:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,121 @@
+"""
+Benchmark the hot user/login-attempt queries before and after the index migration
+
+Seeds BENCH_USERS users (default 1M) and as many login attempts, times
+every query in explain_indexes.HOT_QUERIES at the baseline revision
+(alembic downgrade 0001d, just before 0002) and again at head, then runs the EXPLAIN check.
+
+Uses DATABASE_URL when set - point it at a scratch PostgreSQL database for
+numbers that reflect production; otherwise a SQLite file under /tmp that
+is reused between runs (seeding 1M users takes a while).
+
+Run from the repo root:
+    python -m benchmarks.bench_indexes
+"""
+import os
+import tempfile
+
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.gettempdir()}/bench_indexes.db")
+import benchmarks._env  # noqa: F401 - defaults for the settings app.config requires
+
+from sqlalchemy import func, insert, select, text
+from alembic import command
+from alembic.config import Config
+from app.database import ALEMBIC_INI, engine, init_db
+from app.models import User, UserStatus, LoginAttempt
+from benchmarks.explain_indexes import HOT_QUERIES, check
+from datetime import datetime, timedelta
+import random
+import statistics
+import sys
+import time
+
+USERS = int(os.environ.get("BENCH_USERS", 1_000_000))
+CHUNK = 50_000
+RUNS = 20
+
+# The last revision before the query indexes
+BEFORE_INDEXES = "0001d"
+
+CITIES = [f"City {i}" for i in range(49)] + ["Miami"]
+
+# Roughly a mature fleet: most users active, a small pending backlog
+STATUSES = [UserStatus.ACTIVE] * 90 + [UserStatus.PENDING] * 3 + [UserStatus.APPROVED] * 2 + \
+    [UserStatus.ONBOARDING] * 2 + [UserStatus.SUSPENDED] * 2 + [UserStatus.BANNED]
+
+def seed():
+    init_db()
+    with engine.connect() as conn:
+        existing = conn.scalar(select(func.count(User.id)))
+    if existing >= USERS:
+        return
+    
+    rng = random.Random(0)
+    start = datetime.utcnow() - timedelta(days=730)
+    print(f"Seeding {USERS - existing} users and login attempts...")
+    
+    with engine.begin() as conn:
+        for offset in range(existing, USERS, CHUNK):
+            ids = range(offset, min(offset + CHUNK, USERS))
+            conn.execute(insert(User), [
+                {
+                    "email": f"bench-{i}@example.com",
+                    "instagram_username": f"bench_{i}",
+                    "city": rng.choice(CITIES),
+                    "status": rng.choice(STATUSES),
+                    "created_at": start + timedelta(seconds=rng.randrange(730 * 86400))
+                }
+                for i in ids
+            ])
+            conn.execute(insert(LoginAttempt), [
+                {
+                    "user_id": rng.randrange(1, USERS + 1),
+                    "attempt_type": "password",
+                    "success": rng.random() < 0.8,
+                    "created_at": start + timedelta(seconds=rng.randrange(730 * 86400))
+                }
+                for _ in ids
+            ])
+
+def analyze():
+    with engine.begin() as conn:
+        conn.execute(text("ANALYZE"))
+
+def time_queries() -> dict:
+    """Median milliseconds per hot query, fetching every row"""
+    timings = {}
+    with engine.connect() as conn:
+        for name, statement, _ in HOT_QUERIES:
+            samples = []
+            for _ in range(RUNS):
+                start = time.perf_counter()
+                conn.execute(statement).all()
+                samples.append((time.perf_counter() - start) * 1000)
+            timings[name] = statistics.median(samples)
+    return timings
+
+def main():
+    seed()
+    config = Config(ALEMBIC_INI)
+    print(f"{engine.dialect.name}, {USERS} users, median of {RUNS} runs\n")
+    
+    command.downgrade(config, BEFORE_INDEXES)
+    analyze()
+    before = time_queries()
+    
+    command.upgrade(config, "head")
+    analyze()
+    after = time_queries()
+    
+    print(f"\n{'query':<66} {'before':>10} {'after':>10} {'speedup':>8}")
+    for name, _, _ in HOT_QUERIES:
+        print(f"{name:<66} {before[name]:8.2f}ms {after[name]:8.2f}ms {before[name] / after[name]:7.1f}x")
+    
+    print()
+    with engine.connect() as conn:
+        failures = check(conn)
+    if failures:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
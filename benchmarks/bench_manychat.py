@@ -0,0 +1,75 @@
+"""
+Benchmark ManyChatHandler against a local fake ManyChat API
+
+Compares the old one-off blocking `requests` calls with the pooled async
+client, then checks that the rate limiter and 429 retries hold up under
+a burst.
+
+Run from the repo root:
+    python -m benchmarks.bench_manychat
+"""
+import os
+
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+import benchmarks._env  # noqa: F401 - defaults for the settings app.config requires
+
+from benchmarks.fake_servers import fake_manychat, run_in_thread
+from app.integrations.manychat_handler import ManyChatHandler
+import asyncio
+import requests
+import time
+
+PORT = 8775
+THROTTLED_PORT = 8776
+N = 200
+
+def blocking_sends(n: int) -> float:
+    """The pre-httpx implementation: a fresh requests.post per message"""
+    start = time.perf_counter()
+    for i in range(n):
+        response = requests.post(
+            f"http://127.0.0.1:{PORT}/fb/sending/sendContent",
+            json={"subscriber_id": str(i), "data": {}},
+            headers={"Authorization": "Bearer bench"}
+        )
+        response.raise_for_status()
+    return time.perf_counter() - start
+
+async def async_sends(n: int, port: int, send_rate: float) -> float:
+    handler = ManyChatHandler(
+        api_key="bench",
+        base_url=f"http://127.0.0.1:{port}",
+        send_rate_per_second=send_rate,
+        backoff_seconds=0.05
+    )
+    try:
+        start = time.perf_counter()
+        results = await asyncio.gather(*[handler.send_message(str(i), "hi") for i in range(n)])
+        elapsed = time.perf_counter() - start
+        failed = [r for r in results if r["status"] != "success"]
+        assert not failed, failed[0]
+    finally:
+        await handler.aclose()
+    return elapsed
+
+def report(label: str, n: int, seconds: float):
+    print(f"{label:<40} {n:>5} calls  {seconds:7.2f}s  {n / seconds:8.1f} calls/s")
+
+def main():
+    server = run_in_thread(fake_manychat(), PORT)
+    throttled_app = fake_manychat(throttle_every=10)
+    throttled = run_in_thread(throttled_app, THROTTLED_PORT)
+    try:
+        report("blocking requests", N, blocking_sends(N))
+        report("pooled async (limiter off)", N, asyncio.run(async_sends(N, PORT, send_rate=10_000)))
+        report("pooled async (25 rps limit)", N, asyncio.run(async_sends(N, PORT, send_rate=25)))
+        
+        seconds = asyncio.run(async_sends(N, THROTTLED_PORT, send_rate=10_000))
+        report("pooled async, 10% answered 429", N, seconds)
+        print(f"  all {N} delivered in {throttled_app.state.requests} requests (retries included)")
+    finally:
+        server.should_exit = True
+        throttled.should_exit = True
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Benchmark ProxyManager against a local fake provider
+
+Compares the old blocking `requests` calls (one handshake per call, one call
+at a time) with the pooled async client for proxy purchases and health
+checks.
+
+Run from the repo root:
+    python -m benchmarks.bench_proxy_manager
+"""
+import os
+
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+import benchmarks._env  # noqa: F401 - defaults for the settings app.config requires
+
+from benchmarks.fake_servers import fake_proxy_provider, run_in_thread
+from app.utils.proxy_manager import ProxyManager
+import asyncio
+import requests
+import time
+
+PORT = 8765
+API_URL = f"http://127.0.0.1:{PORT}"
+HEALTH_URL = "http://ip.example/json"
+N = 200
+
+def blocking_purchases(n: int) -> float:
+    """The pre-httpx implementation: a fresh requests.post per purchase"""
+    start = time.perf_counter()
+    for _ in range(n):
+        response = requests.post(
+            f"{API_URL}/purchase",
+            headers={"Authorization": "Bearer bench"},
+            json={"proxy_type": "mobile_4g", "location": "Paris"}
+        )
+        assert response.status_code == 200
+    return time.perf_counter() - start
+
+def blocking_health_checks(proxy_urls) -> float:
+    start = time.perf_counter()
+    for proxy_url in proxy_urls:
+        response = requests.get(
+            HEALTH_URL,
+            proxies={"http": proxy_url, "https": proxy_url},
+            timeout=10
+        )
+        assert response.status_code == 200
+    return time.perf_counter() - start
+
+async def pooled_run(n: int):
+    manager = ProxyManager(api_key="bench", api_url=API_URL, health_check_url=HEALTH_URL)
+    try:
+        start = time.perf_counter()
+        results = await asyncio.gather(*[manager.buy_mobile_proxy("Paris") for _ in range(n)])
+        purchase_time = time.perf_counter() - start
+        assert all(r["success"] for r in results), results[0]
+        
+        start = time.perf_counter()
+        healthy = await asyncio.gather(*[manager.check_proxy_health(r["proxy_url"]) for r in results])
+        health_time = time.perf_counter() - start
+        assert all(healthy)
+    finally:
+        await manager.aclose()
+    
+    return purchase_time, health_time, [r["proxy_url"] for r in results]
+
+def report(label: str, n: int, seconds: float):
+    print(f"{label:<32} {n:>5} calls  {seconds:7.2f}s  {n / seconds:8.1f} calls/s")
+
+def main():
+    server = run_in_thread(fake_proxy_provider(), PORT)
+    try:
+        purchase_time, health_time, proxy_urls = asyncio.run(pooled_run(N))
+        report("blocking purchase", N, blocking_purchases(N))
+        report("pooled async purchase", N, purchase_time)
+        report("blocking health check", N, blocking_health_checks(proxy_urls))
+        report("async health check", N, health_time)
+    finally:
+        server.should_exit = True
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+Benchmark per-user activity writes: an UPDATE per DM vs the write-behind buffer
+
+Simulates bulk sends - TOUCHES DMs spread over ACTIVE_USERS users from
+CONCURRENCY concurrent senders - two ways:
+- before: UPDATE users SET last_activity_at, dms_sent = dms_sent + 1 and
+  commit for every DM
+- after: user_activity.touch() per DM, then the buffer's batched flush
+
+Uses DATABASE_URL when set - point it at a scratch PostgreSQL database for
+numbers that reflect production (row contention on hot users only shows
+there); otherwise a temporary SQLite file.
+
+Run from the repo root:
+    python -m benchmarks.bench_user_activity
+"""
+import benchmarks._env  # noqa: F401 - defaults for the settings app.config requires
+
+from sqlalchemy import func, insert, select, update
+from app.database import SessionLocal, async_engine, init_db
+from app.models import User, UserStatus
+from app.workers.user_activity import UserActivityBuffer
+from datetime import datetime
+import asyncio
+import random
+import time
+
+USERS = 5000
+ACTIVE_USERS = 200   # Accounts doing the sending
+TOUCHES = 5000
+CONCURRENCY = 10
+
+def seed():
+    init_db()
+    with SessionLocal() as db:
+        if db.scalar(select(func.count(User.id))) >= USERS:
+            return
+        db.execute(insert(User), [
+            {
+                "email": f"bench-{i}@example.com",
+                "instagram_username": f"bench_{i}",
+                "city": "Miami",
+                "status": UserStatus.ACTIVE
+            }
+            for i in range(USERS)
+        ])
+        db.commit()
+
+def dms_sent() -> int:
+    with SessionLocal() as db:
+        return db.scalar(select(func.sum(User.dms_sent)))
+
+async def run_senders(send) -> float:
+    """TOUCHES sends from CONCURRENCY workers; seconds taken"""
+    rng = random.Random(0)
+    queue = iter([rng.randrange(1, ACTIVE_USERS + 1) for _ in range(TOUCHES)])
+    
+    async def worker():
+        for user_id in queue:
+            await send(user_id)
+    
+    start = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(CONCURRENCY)])
+    return time.perf_counter() - start
+
+async def main():
+    seed()
+    print(f"{async_engine.dialect.name}, {TOUCHES} DMs over {ACTIVE_USERS} users, {CONCURRENCY} concurrent senders\n")
+    
+    async def update_per_dm(user_id: int):
+        async with async_engine.begin() as conn:
+            await conn.execute(update(User).where(User.id == user_id).values(
+                last_activity_at=datetime.utcnow(),
+                dms_sent=User.dms_sent + 1
+            ))
+    
+    start_count = dms_sent()
+    seconds = await run_senders(update_per_dm)
+    assert dms_sent() - start_count == TOUCHES
+    print(f"{'before (UPDATE + commit per DM)':<40} {seconds * 1000:9.1f}ms  {TOUCHES} statements")
+    
+    buffer = UserActivityBuffer(batch_size=500)
+    
+    async def touch(user_id: int):
+        buffer.touch(user_id, dms_sent=1)
+        await asyncio.sleep(0)
+    
+    start_count = dms_sent()
+    seconds = await run_senders(touch)
+    flush_start = time.perf_counter()
+    await buffer.flush()
+    flush_seconds = time.perf_counter() - flush_start
+    assert dms_sent() - start_count == TOUCHES
+    print(
+        f"{'after (write-behind buffer)':<40} {(seconds + flush_seconds) * 1000:9.1f}ms  "
+        f"1 flush of {buffer.metrics['users_written']} users in {flush_seconds * 1000:.1f}ms"
+    )
+    print(f"\n{buffer.stats()}")
+    
+    await async_engine.dispose()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,162 @@
+"""
+Check ManyChat broadcasts against a local fake ManyChat server
+
+Seeds USERS connected users across three cities, half of them tagged,
+some with the chatbot off, plus users never connected, then:
+- a city + tag broadcast reaches exactly the matching subscribers, each
+  once, and ends done with sent == total
+- cancelling a broadcast to everyone mid-run (POST .../cancel) leaves it
+  cancelled with 0 < sent < total
+- a broadcast marked cancelled in the database, as a cancel from
+  another process does, stops at its next chunk
+and exits non-zero if one of them fails. A temporary SQLite file by default.
+
+Run from the repo root:
+    python -m benchmarks.check_broadcast
+"""
+import os
+
+import benchmarks._env  # noqa: F401 - defaults for the settings app.config requires
+os.environ.setdefault("MANYCHAT_API_KEY", "bench")
+os.environ.setdefault("MANYCHAT_API_URL", "http://127.0.0.1:8797")
+os.environ.setdefault("MANYCHAT_SEND_RATE_PER_SECOND", "2000")
+os.environ.setdefault("MANYCHAT_BROADCAST_CHUNK_SIZE", "500")
+
+from fastapi import FastAPI
+from sqlalchemy import insert, update
+from benchmarks.fake_servers import fake_manychat, run_in_thread
+from app.database import SessionLocal, async_engine, init_db
+from app.models import User, UserStatus, ManyChatTag, ManyChatBroadcast, BroadcastStatus
+from app.routes import manychat as manychat_routes
+from app.integrations.manychat_handler import manychat
+import asyncio
+import httpx
+import sys
+import time
+
+PORT = 8797
+USERS = 5000
+CITIES = ("Miami", "Paris", "Lyon")
+
+def seed() -> set:
+    """Create the users and tags; the subscriber ids a Paris + vip broadcast must reach"""
+    users, tags, expected = [], [], set()
+    for i in range(1, USERS + 1):
+        city = CITIES[i % len(CITIES)]
+        connected = i % 50 != 0
+        chatbot = i % 7 != 0
+        subscriber_id = str(100000 + i) if connected else None
+        users.append({
+            "id": i,
+            "email": f"broadcast-{i}@example.com",
+            "instagram_username": f"broadcast_{i}",
+            "city": city,
+            "status": UserStatus.ACTIVE,
+            "chatbot_enabled": chatbot,
+            "manychat_subscriber_id": subscriber_id
+        })
+        if i % 2 == 0:
+            tags.append({"user_id": i, "tag": "vip"})
+        tags.append({"user_id": i, "tag": f"city_{city.lower()}"})
+        if connected and chatbot and city == "Paris" and i % 2 == 0:
+            expected.add(subscriber_id)
+    
+    with SessionLocal() as db:
+        db.execute(insert(User), users)
+        db.execute(insert(ManyChatTag), tags)
+        db.commit()
+    return expected
+
+def cancel_in_db(broadcast_id: int):
+    """What the cancel route does when the broadcast runs in another process"""
+    with SessionLocal() as db:
+        db.execute(update(ManyChatBroadcast).where(ManyChatBroadcast.id == broadcast_id).values(
+            status=BroadcastStatus.CANCELLED
+        ))
+        db.commit()
+
+async def main():
+    await asyncio.to_thread(init_db)
+    expected = await asyncio.to_thread(seed)
+    fake = fake_manychat(latency=0.01)
+    server = run_in_thread(fake, PORT)
+    
+    app = FastAPI()
+    app.include_router(manychat_routes.router)
+    results = []
+    
+    def check(name: str, ok: bool, detail=None):
+        results.append(ok)
+        print(f"[{'ok' if ok else 'FAILED'}] {name}")
+        if not ok and detail is not None:
+            print(f"    {detail}")
+    
+    transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url="http://check", timeout=30) as client:
+            async def progress(broadcast_id: int, until) -> dict:
+                deadline = time.monotonic() + 60
+                while True:
+                    summary = (await client.get(f"/api/manychat/broadcast/{broadcast_id}")).json()
+                    if until(summary) or time.monotonic() > deadline:
+                        return summary
+                    await asyncio.sleep(0.05)
+            
+            def finished(summary: dict) -> bool:
+                return summary["status"] != "running"
+            
+            start = time.perf_counter()
+            broadcast = (await client.post("/api/manychat/broadcast", json={
+                "message": "hello", "city": "Paris", "tags": ["vip"]
+            })).json()
+            summary = await progress(broadcast["broadcast_id"], finished)
+            elapsed = time.perf_counter() - start
+            sent = list(fake.state.sent)
+            check(
+                f"Paris + vip among {USERS} users: {len(expected)} subscribers reached once each, in {elapsed:.1f}s",
+                summary["status"] == "done" and summary["total"] == summary["sent"] == len(expected)
+                and summary["failed"] == 0 and sorted(sent) == sorted(expected),
+                {"summary": summary, "sent": len(sent), "unique": len(set(sent)), "expected": len(expected)}
+            )
+            
+            fake.state.sent.clear()
+            broadcast = (await client.post("/api/manychat/broadcast", json={"message": "hi all", "chatbot_enabled": None})).json()
+            await progress(broadcast["broadcast_id"], lambda s: s["sent"] > 0)
+            cancel = await client.post(f"/api/manychat/broadcast/{broadcast['broadcast_id']}/cancel")
+            summary = await progress(broadcast["broadcast_id"], finished)
+            check(
+                "broadcast to everyone cancelled mid-run: cancelled, partly sent",
+                cancel.status_code == 200 and summary["status"] == "cancelled"
+                and 0 < summary["sent"] < summary["total"] and summary["sent"] <= len(fake.state.sent),
+                summary
+            )
+            
+            fake.state.sent.clear()
+            broadcast = (await client.post("/api/manychat/broadcast", json={"message": "hi again", "chatbot_enabled": None})).json()
+            await progress(broadcast["broadcast_id"], lambda s: s["sent"] > 0)
+            await asyncio.to_thread(cancel_in_db, broadcast["broadcast_id"])
+            at_cancel = len(fake.state.sent)
+            # The run only notices after its current chunk; wait until sends stop
+            while True:
+                count = len(fake.state.sent)
+                await asyncio.sleep(0.5)
+                if len(fake.state.sent) == count:
+                    break
+            summary = await progress(broadcast["broadcast_id"], finished)
+            check(
+                "cancelled from another process: stops at the next chunk",
+                summary["status"] == "cancelled" and len(fake.state.sent) == summary["sent"]
+                and summary["sent"] - at_cancel <= int(os.environ["MANYCHAT_BROADCAST_CHUNK_SIZE"])
+                and summary["sent"] < summary["total"],
+                {"summary": summary, "sent when cancelled": at_cancel, "sent now": len(fake.state.sent)}
+            )
+    finally:
+        await manychat.aclose()
+        server.should_exit = True
+    
+    await async_engine.dispose()
+    if not all(results):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    asyncio.run(main())
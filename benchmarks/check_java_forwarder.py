@@ -0,0 +1,185 @@
+"""
+Check JavaForwarder's batching, spooling and resend against a local fake Java backend
+
+- THREADS threads enqueueing MESSAGES messages: batches of at most
+  BATCH_SIZE go out as the buffer fills, without waiting for the flush
+  interval, and every message arrives once
+- backend down (503): a flush of 70 messages retries, then spools them as
+  two batch files and sends nothing
+- a fresh forwarder on the same spool directory (a restart) resends the
+  spooled batches first, then the new ones; every message arrives once
+  and the spool is empty
+- spooled batches the backend rejects (400) or fails on (500) do not
+  hold up the ones behind them: the rejected batch goes to the
+  dead-letter directory, the failing one is retried on the next flush
+- a new batch the backend rejects is dead-lettered, not spooled
+- messages enqueued by a forwarder that never flushes (a crash) are
+  delivered by the next one from its journal
+and exits non-zero if one of them fails.
+
+Run from the repo root:
+    python -m benchmarks.check_java_forwarder
+"""
+import os
+
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+import benchmarks._env  # noqa: F401 - defaults for the settings app.config requires
+
+from benchmarks.fake_servers import fake_java_backend, run_in_thread
+from app.integrations.java_forwarder import JavaForwarder
+import asyncio
+import sys
+import tempfile
+import threading
+import time
+
+PORT = 8795
+THREADS = 3
+MESSAGES = 300
+BATCH_SIZE = 50
+DOWN_MESSAGES = 70
+
+def forwarder(spool_dir: str) -> JavaForwarder:
+    return JavaForwarder(
+        base_url=f"http://127.0.0.1:{PORT}",
+        batch_size=BATCH_SIZE,
+        flush_interval=30.0,  # Only a full buffer triggers a flush
+        max_retries=1,
+        backoff_seconds=0.01,
+        spool_dir=spool_dir
+    )
+
+def enqueue_from_threads(target: JavaForwarder):
+    def enqueue(thread: int):
+        for i in range(MESSAGES // THREADS):
+            target.enqueue({"id": f"{thread}-{i}"})
+    
+    threads = [threading.Thread(target=enqueue, args=(n,)) for n in range(THREADS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+async def main():
+    backend = fake_java_backend()
+    server = run_in_thread(backend, PORT)
+    spool_dir = tempfile.mkdtemp()
+    results = []
+    
+    def check(name: str, ok: bool, detail=None):
+        results.append(ok)
+        print(f"[{'ok' if ok else 'FAILED'}] {name}")
+        if not ok and detail is not None:
+            print(f"    {detail}")
+    
+    def received() -> list:
+        return [message["id"] for batch in backend.state.batches for message in batch]
+    
+    try:
+        first = forwarder(spool_dir)
+        loop = asyncio.create_task(first.run())
+        await asyncio.sleep(0)  # Let run() bind to the loop before threads enqueue
+        await asyncio.to_thread(enqueue_from_threads, first)
+        
+        deadline = time.monotonic() + 5
+        while len(received()) + first.stats()["buffered"] < MESSAGES and time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+        sent_on_size = len(received())
+        loop.cancel()
+        await first.aclose()  # Flushes the rest, as on shutdown
+        
+        ids = received()
+        sizes = [len(batch) for batch in backend.state.batches]
+        check(
+            f"{THREADS} threads x {MESSAGES // THREADS} messages: batches of <= {BATCH_SIZE} as the buffer fills, each message once",
+            len(ids) == MESSAGES and len(set(ids)) == MESSAGES
+            and max(sizes) <= BATCH_SIZE and sent_on_size >= MESSAGES - BATCH_SIZE,
+            {"received": len(ids), "unique": len(set(ids)), "batch sizes": sizes, "before shutdown": sent_on_size}
+        )
+        
+        backend.state.batches.clear()
+        backend.state.down = True
+        second = forwarder(spool_dir)
+        for i in range(DOWN_MESSAGES):
+            second.enqueue({"id": f"down-{i}"})
+        await second.flush()
+        await second.aclose()
+        backend.state.down = False
+        stats = second.stats()
+        check(
+            f"backend down: {DOWN_MESSAGES} messages spooled as 2 batch files, none delivered",
+            stats["spooled_batches"] == 2 and stats["batches_failed"] == 2 and not received(),
+            stats
+        )
+        
+        restarted = forwarder(spool_dir)
+        restarted.enqueue({"id": "after-restart"})
+        await restarted.flush()
+        await restarted.aclose()
+        ids = received()
+        expected = [f"down-{i}" for i in range(DOWN_MESSAGES)] + ["after-restart"]
+        check(
+            "restart: spooled batches resent first, then new messages, each once, spool empty",
+            ids == expected and restarted.stats()["spooled_batches"] == 0,
+            {"received": len(ids), "spooled": restarted.stats()["spooled_batches"]}
+        )
+        
+        backend.state.batches.clear()
+        backend.state.down = True
+        spooling = forwarder(spool_dir)
+        for name in ("bad-400", "bad-500", "good"):
+            for i in range(3):
+                spooling.enqueue({"id": f"{name}-{i}"})
+            await spooling.flush()
+        await spooling.aclose()
+        backend.state.down = False
+        backend.state.reject = {"bad-400-0"}
+        backend.state.fail = {"bad-500-0"}
+        draining = forwarder(spool_dir)
+        draining.enqueue({"id": "new"})
+        await draining.flush()
+        ids = received()
+        stats = draining.stats()
+        backend.state.fail = set()
+        await draining.flush()
+        check(
+            "rejected and failing spooled batches do not block the rest: 400 dead-lettered, 500 retried next flush",
+            ids == ["good-0", "good-1", "good-2", "new"] and stats["spooled_batches"] == 1
+            and stats["dead_letter_batches"] == 1 and received()[len(ids):] == ["bad-500-0", "bad-500-1", "bad-500-2"]
+            and draining.stats()["spooled_batches"] == 0,
+            {"received": received(), "stats": stats}
+        )
+        
+        backend.state.reject = {"bad-400-new"}
+        draining.enqueue({"id": "bad-400-new"})
+        await draining.flush()
+        draining.enqueue({"id": "after-reject"})
+        await draining.aclose()
+        stats = draining.stats()
+        check(
+            "new batch rejected: dead-lettered, not spooled, the next one still sent",
+            stats["dead_letter_batches"] == 2 and stats["spooled_batches"] == 0 and received()[-1] == "after-reject",
+            {"received": received()[-3:], "stats": stats}
+        )
+        
+        backend.state.batches.clear()
+        crashed = forwarder(spool_dir)
+        for i in range(BATCH_SIZE // 2):
+            crashed.enqueue({"id": f"crash-{i}"})
+        revived = forwarder(spool_dir)  # crashed never flushes
+        await revived.flush()
+        await revived.aclose()
+        ids = received()
+        check(
+            f"crash before a flush: the {BATCH_SIZE // 2} journaled messages delivered by the next start",
+            ids == [f"crash-{i}" for i in range(BATCH_SIZE // 2)] and revived.stats()["spooled_batches"] == 0,
+            {"received": ids, "stats": revived.stats()}
+        )
+    finally:
+        server.should_exit = True
+    
+    if not all(results):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    asyncio.run(main())
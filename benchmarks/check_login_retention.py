@@ -0,0 +1,163 @@
+"""
+Check the login attempt rollup and purge (the row-by-row path of app/workers/login_retention.py)
+
+Seeds OLD attempts past LOGIN_RETENTION_DAYS and NEW recent ones, each
+with STEPS step timings, then:
+- POST /api/admin/login-attempts/purge rolls up exactly the old ones, in
+  batches of LOGIN_RETENTION_BATCH_SIZE: login_attempts_daily holds the
+  attempts, successes and duration totals computed here, and the old
+  attempts and their timings are gone while the recent ones stay
+- LATE more old attempts on already rolled-up days, purged by WORKERS
+  threads running purge_batch at once, are added onto the existing
+  rows and each counted once
+- a purge with nothing old left rolls up nothing
+and exits non-zero if one of them fails. A temporary SQLite file by default.
+
+The monthly-partition path (PostgreSQL only) is covered by
+check_login_partitions.
+
+Run from the repo root:
+    python -m benchmarks.check_login_retention
+"""
+import os
+
+import benchmarks._env  # noqa: F401 - defaults for the settings app.config requires
+os.environ.setdefault("LOGIN_RETENTION_BATCH_SIZE", "500")
+os.environ.setdefault("LOGIN_RETENTION_BATCH_PAUSE_SECONDS", "0")
+
+from fastapi import FastAPI
+from sqlalchemy import func, select
+from app.database import SessionLocal, async_engine, engine, init_db
+from app.models import LoginAttempt, LoginAttemptDaily, LoginStepTiming
+from app.routes import admin
+from app.workers.login_retention import purge_batch, retention_cutoff
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+import asyncio
+import httpx
+import sys
+
+OLD = 5000
+NEW = 500
+LATE = 1000
+STEPS = 2
+WORKERS = 4
+USERS = 50
+TYPES = ("password", "2fa", "challenge", None)
+
+def attempts(n: int, first_day, days: int, offset: int = 0) -> list:
+    """n deterministic attempts spread over `days` days from `first_day`"""
+    return [
+        {
+            "user_id": 1 + (i * 7) % USERS,
+            "attempt_type": TYPES[i % len(TYPES)],
+            "success": i % 3 != 0,
+            "duration_ms": None if i % 5 == 0 else 100 + i % 900,
+            "created_at": first_day + timedelta(days=i % days, minutes=i % 1000)
+        }
+        for i in range(offset, offset + n)
+    ]
+
+def rollup_of(rows: list) -> Counter:
+    """The login_attempts_daily counters `rows` should add up to, keyed (user, day, type, counter)"""
+    totals = Counter()
+    for row in rows:
+        key = (row["user_id"], row["created_at"].date(), row["attempt_type"] or "unknown")
+        totals[key + ("attempts",)] += 1
+        totals[key + ("succeeded",)] += 1 if row["success"] else 0
+        if row["duration_ms"] is not None:
+            totals[key + ("duration_ms",)] += row["duration_ms"]
+            totals[key + ("timed",)] += 1
+    return +totals
+
+def store(rows: list):
+    with SessionLocal() as db:
+        for row in rows:
+            attempt = LoginAttempt(**row)
+            attempt.step_timings = [
+                LoginStepTiming(step=f"step_{n}", duration_ms=10, created_at=row["created_at"]) for n in range(STEPS)
+            ]
+            db.add(attempt)
+        db.commit()
+
+def stored_rollup() -> Counter:
+    totals = Counter()
+    with SessionLocal() as db:
+        for row in db.scalars(select(LoginAttemptDaily)):
+            key = (row.user_id, row.day, row.attempt_type)
+            for counter in ("attempts", "succeeded", "duration_ms", "timed"):
+                totals[key + (counter,)] += getattr(row, counter)
+    return +totals
+
+def remaining() -> tuple:
+    """(attempts left, step timings left, attempts left from before the cutoff)"""
+    with SessionLocal() as db:
+        return (
+            db.scalar(select(func.count(LoginAttempt.id))),
+            db.scalar(select(func.count(LoginStepTiming.id))),
+            db.scalar(select(func.count(LoginAttempt.id)).where(LoginAttempt.created_at < retention_cutoff()))
+        )
+
+def drain(worker: int) -> int:
+    purged = 0
+    while True:
+        deleted = purge_batch(retention_cutoff())
+        if not deleted:
+            return purged
+        purged += deleted
+
+async def main():
+    await asyncio.to_thread(init_db)
+    print(f"{engine.dialect.name}\n")
+    
+    cutoff = retention_cutoff()
+    old = attempts(OLD, cutoff - timedelta(days=10), 10)
+    new = attempts(NEW, cutoff + timedelta(hours=1), 5)
+    await asyncio.to_thread(store, old + new)
+    
+    app = FastAPI()
+    app.include_router(admin.router)
+    results = []
+    
+    def check(name: str, ok: bool, detail=None):
+        results.append(ok)
+        print(f"[{'ok' if ok else 'FAILED'}] {name}")
+        if not ok and detail is not None:
+            print(f"    {detail}")
+    
+    transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+    async with httpx.AsyncClient(transport=transport, base_url="http://check", timeout=60) as client:
+        response = await client.post("/api/admin/login-attempts/purge")
+        summary = response.json().get("data", {}) if response.status_code == 200 else {}
+        rollup = await asyncio.to_thread(stored_rollup)
+        left, timings, left_old = await asyncio.to_thread(remaining)
+        check(
+            f"purge: {OLD} old attempts rolled up and deleted with their timings, {NEW} recent kept",
+            summary.get("rolled_up") == OLD and rollup == rollup_of(old)
+            and (left, timings, left_old) == (NEW, NEW * STEPS, 0),
+            {"response": (response.status_code, summary), "left": (left, timings, left_old)}
+        )
+        
+        late = attempts(LATE, cutoff - timedelta(days=10), 10, offset=OLD)
+        await asyncio.to_thread(store, late)
+        with ThreadPoolExecutor(WORKERS) as pool:
+            purged = sum(pool.map(drain, range(WORKERS)))
+        rollup = await asyncio.to_thread(stored_rollup)
+        left, timings, left_old = await asyncio.to_thread(remaining)
+        check(
+            f"{LATE} late attempts purged by {WORKERS} threads at once: added onto existing days, each counted once",
+            purged == LATE and rollup == rollup_of(old + late) and (left, timings, left_old) == (NEW, NEW * STEPS, 0),
+            {"purged": purged, "left": (left, timings, left_old)}
+        )
+        
+        response = await client.post("/api/admin/login-attempts/purge")
+        summary = response.json().get("data", {}) if response.status_code == 200 else {}
+        check("nothing old left: rolls up nothing", summary.get("rolled_up") == 0, (response.status_code, summary))
+    
+    await async_engine.dispose()
+    if not all(results):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,152 @@
+"""
+Check ManyChatHandler's rate limiting and retries against a local fake ManyChat API
+
+- rate limit: 3 x RATE calls at once take at least 2 seconds (a burst
+  of RATE, then RATE per second)
+- 429: every call still succeeds, each throttled request retried once
+- 503 (ManyChat down): a call gives up with an error after exactly
+  max_retries + 1 requests
+- a Retry-After of an hour is cut to max_retry_after
+- timeouts: a read (getInfo) gives up after max_retries + 1 requests
+  within their timeout budget; sendContent, which must not run twice,
+  after exactly one
+- createSubscriber carries MANYCHAT_USERNAME_FIELD_ID, or no custom
+  field when it is unset
+and exits non-zero if one of them fails.
+
+Run from the repo root:
+    python -m benchmarks.check_manychat
+"""
+import os
+
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+import benchmarks._env  # noqa: F401 - defaults for the settings app.config requires
+
+from benchmarks.fake_servers import fake_manychat, run_in_thread
+from app.integrations.manychat_handler import ManyChatHandler
+from app.config import get_settings
+import asyncio
+import sys
+import time
+
+settings = get_settings()
+
+PORT = 8777
+THROTTLED_PORT = 8778
+RATE = 20
+MAX_RETRIES = 2
+
+def handler(port: int, **options) -> ManyChatHandler:
+    options.setdefault("rate_per_second", 10_000)
+    options.setdefault("max_retries", MAX_RETRIES)
+    return ManyChatHandler(
+        api_key="bench",
+        base_url=f"http://127.0.0.1:{port}",
+        backoff_seconds=0.01,
+        **options
+    )
+
+async def main():
+    app = fake_manychat(latency=0.01)
+    throttled_app = fake_manychat(latency=0.01, throttle_every=4)
+    servers = [run_in_thread(app, PORT), run_in_thread(throttled_app, THROTTLED_PORT)]
+    results = []
+    
+    def check(name: str, ok: bool, detail=None):
+        results.append(ok)
+        print(f"[{'ok' if ok else 'FAILED'}] {name}")
+        if not ok and detail is not None:
+            print(f"    {detail}")
+    
+    try:
+        client = handler(PORT, rate_per_second=RATE)
+        start = time.perf_counter()
+        responses = await asyncio.gather(*[client.get_subscriber_info(str(i)) for i in range(3 * RATE)])
+        elapsed = time.perf_counter() - start
+        await client.aclose()
+        # A burst of RATE, then RATE per second
+        check(
+            f"{3 * RATE} calls at {RATE}/s: took {elapsed:.2f}s, at least 2s",
+            all(r["status"] == "success" for r in responses) and elapsed >= 2.0
+        )
+        
+        # A retry can be a 4th request too, so allow a few
+        client = handler(THROTTLED_PORT, max_retries=10)
+        responses = await asyncio.gather(*[client.send_message(str(i), "hi") for i in range(60)])
+        await client.aclose()
+        failed = [r for r in responses if r["status"] != "success"]
+        requests = throttled_app.state.requests
+        check(
+            f"every 4th request answered 429: all 60 delivered, one retry per 429 ({requests} requests)",
+            not failed and requests - requests // 4 == 60,
+            f"{len(failed)} failed, {requests} requests"
+        )
+        
+        client = handler(THROTTLED_PORT, max_retry_after=0.1)
+        throttled_app.state.retry_after = "3600"
+        start = time.perf_counter()
+        responses = await asyncio.gather(*[client.get_subscriber_info(str(i)) for i in range(8)])
+        elapsed = time.perf_counter() - start
+        await client.aclose()
+        throttled_app.state.retry_after = "0.05"
+        check(
+            f"Retry-After: 3600 capped at max_retry_after: all calls done in {elapsed:.2f}s",
+            all(r["status"] == "success" for r in responses) and elapsed < 2.0,
+            responses
+        )
+        
+        client = handler(PORT)
+        app.state.down = True
+        before = app.state.requests
+        response = await client.send_message("1", "hi")
+        await client.aclose()
+        app.state.down = False
+        check(
+            f"503: error after {MAX_RETRIES + 1} requests",
+            response["status"] == "error" and app.state.requests - before == MAX_RETRIES + 1,
+            (response, app.state.requests - before)
+        )
+        
+        client = handler(PORT, timeout=0.2)
+        app.state.latency = 1.0
+        before = app.state.requests
+        start = time.perf_counter()
+        response = await client.get_subscriber_info("1")
+        elapsed = time.perf_counter() - start
+        reads = app.state.requests - before
+        before = app.state.requests
+        sent = await client.send_message("1", "hi")
+        await client.aclose()
+        await asyncio.sleep(1.0)  # Let the abandoned requests finish on the fake
+        sends = app.state.requests - before
+        app.state.latency = 0.01
+        check(
+            f"timeouts: a read errors after {MAX_RETRIES + 1} requests, in {elapsed:.2f}s; a send after 1",
+            response["status"] == "error" and reads == MAX_RETRIES + 1
+            and elapsed < (MAX_RETRIES + 1) * 0.2 + 0.5 and sent["status"] == "error" and sends == 1,
+            {"read": (response, reads), "send": (sent, sends)}
+        )
+        
+        client = handler(PORT)
+        field_id = settings.manychat_username_field_id
+        settings.manychat_username_field_id = 4242
+        await client.create_subscriber("1", "someone")
+        settings.manychat_username_field_id = None
+        await client.create_subscriber("2", "someone_else")
+        settings.manychat_username_field_id = field_id
+        await client.aclose()
+        sent = [payload["custom_fields"] for payload in app.state.created[-2:]]
+        check(
+            "createSubscriber sends MANYCHAT_USERNAME_FIELD_ID, none when unset",
+            sent == [[{"id": 4242, "value": "someone"}], []],
+            sent
+        )
+    finally:
+        for server in servers:
+            server.should_exit = True
+    
+    if not all(results):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    asyncio.run(main())
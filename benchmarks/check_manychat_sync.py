@@ -0,0 +1,188 @@
+"""
+Check the diff-based ManyChat tag/custom-field sync against a local fake ManyChat server
+
+Seeds USERS connected subscribers (and a few users never connected),
+then runs fleet resyncs through POST /api/manychat/sync:
+- the first one makes 4 calls per subscriber (two tags, two custom
+  fields); a second POST while it runs answers 409
+- a second resync makes no calls
+- MOVED users changing city cost 3 calls each (add the new city tag,
+  remove the old one, set the city field)
+- calls failed while ManyChat is down are retried by the next resync,
+  and only those
+- {"force": true} re-sends everything
+- two POST /sync/{user_id} at once for a subscriber with nothing synced
+  both succeed, leaving one row per tag and field
+Each count is checked against both the summary and the requests the fake
+server received. Exits non-zero if one of them fails. A temporary SQLite
+file by default.
+
+Run from the repo root:
+    python -m benchmarks.check_manychat_sync
+"""
+import os
+
+import benchmarks._env  # noqa: F401 - defaults for the settings app.config requires
+os.environ.setdefault("MANYCHAT_API_KEY", "bench")
+os.environ.setdefault("MANYCHAT_API_URL", "http://127.0.0.1:8799")
+os.environ.setdefault("MANYCHAT_RATE_PER_SECOND", "5000")
+os.environ.setdefault("MANYCHAT_MAX_RETRIES", "0")
+os.environ.setdefault("MANYCHAT_USERNAME_FIELD_ID", "101")
+os.environ.setdefault("MANYCHAT_CITY_FIELD_ID", "102")
+
+from fastapi import FastAPI
+from sqlalchemy import delete, func, insert, select, update
+from benchmarks.fake_servers import fake_manychat, run_in_thread
+from app.database import SessionLocal, async_engine, init_db
+from app.models import User, UserStatus, ManyChatTag, ManyChatFieldValue
+from app.routes import manychat as manychat_routes
+from app.integrations.manychat_handler import manychat
+import asyncio
+import httpx
+import sys
+import time
+
+PORT = 8799
+USERS = 2000
+MOVED = 100
+FAILED_MOVES = 10
+
+def seed():
+    with SessionLocal() as db:
+        db.execute(insert(User), [
+            {
+                "id": i,
+                "email": f"sync-{i}@example.com",
+                "instagram_username": f"sync_{i}",
+                "city": ("Miami", "Paris")[i % 2],
+                "status": UserStatus.ACTIVE,
+                "manychat_subscriber_id": str(200000 + i) if i <= USERS else None
+            }
+            for i in range(1, USERS + 6)
+        ])
+        db.commit()
+
+def move(first: int, count: int, city: str):
+    with SessionLocal() as db:
+        db.execute(update(User).where(User.id.between(first, first + count - 1)).values(city=city))
+        db.commit()
+
+def local_state() -> tuple:
+    """(synced tag rows, synced field rows, users still tagged with a city they left)"""
+    with SessionLocal() as db:
+        tags = db.scalar(select(func.count(ManyChatTag.id)))
+        fields = db.scalar(select(func.count(ManyChatFieldValue.id)))
+        stale = db.scalar(select(func.count(ManyChatTag.id)).join(User, User.id == ManyChatTag.user_id).where(
+            ManyChatTag.tag.in_(("Miami", "Paris", "Lyon")),
+            ManyChatTag.tag != User.city
+        ))
+        return tags, fields, stale
+
+def forget_synced(user_id: int):
+    with SessionLocal() as db:
+        db.execute(delete(ManyChatTag).where(ManyChatTag.user_id == user_id))
+        db.execute(delete(ManyChatFieldValue).where(ManyChatFieldValue.user_id == user_id))
+        db.commit()
+
+def synced_rows(user_id: int) -> tuple:
+    with SessionLocal() as db:
+        return (
+            db.scalar(select(func.count(ManyChatTag.id)).where(ManyChatTag.user_id == user_id)),
+            db.scalar(select(func.count(ManyChatFieldValue.id)).where(ManyChatFieldValue.user_id == user_id))
+        )
+
+async def main():
+    await asyncio.to_thread(init_db)
+    await asyncio.to_thread(seed)
+    fake = fake_manychat(latency=0.005)
+    server = run_in_thread(fake, PORT)
+    
+    app = FastAPI()
+    app.include_router(manychat_routes.router)
+    results = []
+    
+    def check(name: str, ok: bool, detail=None):
+        results.append(ok)
+        print(f"[{'ok' if ok else 'FAILED'}] {name}")
+        if not ok and detail is not None:
+            print(f"    {detail}")
+    
+    transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url="http://check", timeout=30) as client:
+            async def resync(force: bool = False) -> tuple:
+                """(summary, requests the fake received, seconds, status of a second POST made while running)"""
+                before = fake.state.requests
+                start = time.perf_counter()
+                started = await client.post("/api/manychat/sync", json={"force": force})
+                again = await client.post("/api/manychat/sync", json={"force": force})
+                summary = {"running": True}
+                while summary["running"] and started.status_code == 200:
+                    await asyncio.sleep(0.05)
+                    summary = (await client.get("/api/manychat/sync")).json()
+                return summary, fake.state.requests - before, time.perf_counter() - start, again.status_code
+            
+            summary, requests, elapsed, again = await resync()
+            tags, fields, _ = await asyncio.to_thread(local_state)
+            check(
+                f"first resync of {USERS} subscribers: {requests} calls in {elapsed:.1f}s, 409 while running",
+                summary["users"] == USERS and summary["calls"] == requests == 4 * USERS and summary["failed"] == 0
+                and tags == fields == 2 * USERS and again == 409,
+                (summary, requests, tags, fields, again)
+            )
+            
+            summary, requests, elapsed, _ = await resync()
+            check(
+                f"second resync: no calls, {elapsed:.1f}s",
+                summary["users"] == USERS and summary["calls"] == requests == 0,
+                (summary, requests)
+            )
+            
+            await asyncio.to_thread(move, 1, MOVED, "Lyon")
+            summary, requests, _, _ = await resync()
+            _, _, stale = await asyncio.to_thread(local_state)
+            check(
+                f"{MOVED} users moved to another city: {3 * MOVED} calls",
+                summary["calls"] == requests == 3 * MOVED and summary["failed"] == 0 and stale == 0,
+                (summary, requests, stale)
+            )
+            
+            await asyncio.to_thread(move, MOVED + 1, FAILED_MOVES, "Lyon")
+            fake.state.down = True
+            summary, _, _, _ = await resync()
+            fake.state.down = False
+            failed = summary["failed"]
+            summary, requests, _, _ = await resync()
+            _, _, stale = await asyncio.to_thread(local_state)
+            check(
+                f"ManyChat down during a resync: the {3 * FAILED_MOVES} failed calls, and only those, retried next time",
+                failed == 3 * FAILED_MOVES and summary["calls"] == requests == 3 * FAILED_MOVES
+                and summary["failed"] == 0 and stale == 0,
+                (failed, summary, requests, stale)
+            )
+            
+            summary, requests, _, _ = await resync(force=True)
+            check(
+                "forced resync re-sends everything",
+                summary["calls"] == requests == 4 * USERS and summary["failed"] == 0,
+                (summary, requests)
+            )
+            
+            await asyncio.to_thread(forget_synced, 1)
+            responses = await asyncio.gather(*[client.post("/api/manychat/sync/1") for _ in range(2)])
+            rows = await asyncio.to_thread(synced_rows, 1)
+            check(
+                "two syncs of one subscriber at once: both succeed, one row per tag and field",
+                [r.status_code for r in responses] == [200, 200] and rows == (2, 2),
+                ([(r.status_code, r.text[:200]) for r in responses], rows)
+            )
+    finally:
+        await manychat.aclose()
+        server.should_exit = True
+    
+    await async_engine.dispose()
+    if not all(results):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,184 @@
+"""
+Check ProxyManager and the warm pool on the provider's error paths, against a local fake provider
+
+- provider 5xx: a purchase and a renewal each fail with an error after
+  exactly one request, a probe through the provider reports HTTP 503
+- timeouts: likewise, within the client timeout, and the probe has no
+  latency sample
+- empty pool: with the provider down a refill buys nothing, approving a
+  pending user answers 503 and leaves the user pending, bulk approval
+  reports the user as failed; once the provider is back, a refill fills
+  the pool and the approval goes through
+and exits non-zero if one of them fails. A temporary SQLite file by default.
+
+Run from the repo root:
+    python -m benchmarks.check_proxy_manager
+"""
+import os
+
+os.environ.setdefault("PROXY_PROVIDER_URL", "http://127.0.0.1:8785")
+import benchmarks._env  # noqa: F401 - defaults for the settings app.config requires
+
+from fastapi import FastAPI
+from sqlalchemy import func, insert, select
+from benchmarks.fake_servers import fake_proxy_provider, run_in_thread
+from app.database import SessionLocal, async_engine, init_db
+from app.models import User, UserStatus, Proxy, ProxyStatus
+from app.routes import admin
+from app.utils.proxy_manager import ProxyManager, proxy_manager
+from app.workers.proxy_pool import refill_pool
+import asyncio
+import httpx
+import sys
+import time
+
+PORT = 8785
+API_URL = f"http://127.0.0.1:{PORT}"
+HEALTH_URL = "http://ip.example/json"
+TIMEOUT = 0.2
+CITY = "Lyon"
+
+def create_pending_user() -> int:
+    with SessionLocal() as db:
+        db.execute(insert(User), [{
+            "email": "pool@example.com",
+            "instagram_username": "pool_user",
+            "city": CITY,
+            "status": UserStatus.PENDING
+        }])
+        db.commit()
+        return db.scalar(select(User.id).where(User.email == "pool@example.com"))
+
+def pool_state(user_id: int) -> tuple:
+    """(user status, user's proxy URL, available proxies in CITY, proxies assigned to the user)"""
+    with SessionLocal() as db:
+        user = db.get(User, user_id)
+        available = db.scalar(
+            select(func.count(Proxy.id)).where(Proxy.city == CITY, Proxy.status == ProxyStatus.AVAILABLE)
+        )
+        assigned = db.scalar(
+            select(func.count(Proxy.id)).where(Proxy.user_id == user_id, Proxy.status == ProxyStatus.ASSIGNED)
+        )
+        return user.status, user.proxy_url, available, assigned
+
+async def main():
+    await asyncio.to_thread(init_db)
+    provider = fake_proxy_provider(latency=0.01)
+    server = run_in_thread(provider, PORT)
+    manager = ProxyManager(api_key="bench", api_url=API_URL, timeout=TIMEOUT, health_check_url=HEALTH_URL)
+    results = []
+    
+    def check(name: str, ok: bool, detail=None):
+        results.append(ok)
+        print(f"[{'ok' if ok else 'FAILED'}] {name}")
+        if not ok and detail is not None:
+            print(f"    {detail}")
+    
+    async def requests_made(call):
+        """(result, requests the provider saw, seconds) of awaiting `call`"""
+        before = provider.state.requests
+        start = time.perf_counter()
+        result = await call
+        return result, provider.state.requests - before, time.perf_counter() - start
+    
+    app = FastAPI()
+    app.include_router(admin.router)
+    transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+    
+    try:
+        bought = await manager.buy_mobile_proxy(CITY)
+        check("provider up: purchase succeeds", bought["success"], bought)
+        proxy_url = bought.get("proxy_url")
+        
+        provider.state.down = True
+        purchase, count, _ = await requests_made(manager.buy_mobile_proxy(CITY))
+        check(
+            "provider 503: purchase fails after 1 request",
+            not purchase["success"] and purchase["error"].startswith("Proxy purchase failed") and count == 1,
+            (purchase, count)
+        )
+        renewal, count, _ = await requests_made(manager.renew_proxy("fake-1"))
+        check(
+            "provider 503: renewal fails after 1 request, provider_id kept",
+            not renewal["success"] and renewal["provider_id"] == "fake-1"
+            and renewal["error"].startswith("Proxy renewal failed") and count == 1,
+            (renewal, count)
+        )
+        probe = await manager.probe_proxy(proxy_url)
+        check("provider 503: probe unhealthy with HTTP 503", not probe["healthy"] and probe["error"] == "HTTP 503", probe)
+        provider.state.down = False
+        
+        provider.state.latency = 1.0
+        purchase, count, elapsed = await requests_made(manager.buy_mobile_proxy(CITY))
+        check(
+            f"timeout: purchase fails after 1 request, in {elapsed:.2f}s",
+            not purchase["success"] and purchase["error"].startswith("Proxy purchase error")
+            and count == 1 and elapsed < TIMEOUT + 0.5,
+            (purchase, count)
+        )
+        renewal, count, elapsed = await requests_made(manager.renew_proxy("fake-1"))
+        check(
+            f"timeout: renewal fails after 1 request, in {elapsed:.2f}s",
+            not renewal["success"] and renewal["error"].startswith("Proxy renewal error")
+            and count == 1 and elapsed < TIMEOUT + 0.5,
+            (renewal, count)
+        )
+        start = time.perf_counter()
+        probe = await manager.probe_proxy(proxy_url)
+        elapsed = time.perf_counter() - start
+        check(
+            f"timeout: probe unhealthy, no latency sample, in {elapsed:.2f}s",
+            not probe["healthy"] and probe["latency_ms"] is None and probe["error"] and elapsed < TIMEOUT + 0.5,
+            probe
+        )
+        await asyncio.sleep(1.0)  # Let the abandoned requests finish on the fake
+        provider.state.latency = 0.01
+        
+        user_id = await asyncio.to_thread(create_pending_user)
+        async with httpx.AsyncClient(transport=transport, base_url="http://check", timeout=30) as client:
+            provider.state.down = True
+            summary = await refill_pool()
+            approve = await client.post(f"/api/admin/approve/{user_id}", json={})
+            bulk = await client.post("/api/admin/approve-bulk", json={"user_ids": [user_id]})
+            provider.state.down = False
+            status, user_proxy, available, _ = await asyncio.to_thread(pool_state, user_id)
+            check(
+                "empty pool, provider down: refill buys nothing",
+                summary["purchased"] == 0 and summary["failed"] >= 1 and available == 0,
+                (summary, available)
+            )
+            check(
+                "empty pool: approval answers 503, user stays pending without a proxy",
+                approve.status_code == 503 and status == UserStatus.PENDING and user_proxy is None,
+                (approve.status_code, approve.text, status, user_proxy)
+            )
+            bulk_result = bulk.json() if bulk.status_code == 200 else {}
+            check(
+                "empty pool: bulk approval reports the user as failed",
+                bulk_result.get("approved") == 0
+                and bulk_result.get("results") == [{
+                    "user_id": user_id, "status": "error", "error": f"No proxy available for {CITY}"
+                }],
+                (bulk.status_code, bulk.text)
+            )
+            
+            summary = await refill_pool()
+            approve = await client.post(f"/api/admin/approve/{user_id}", json={})
+            status, user_proxy, available, assigned = await asyncio.to_thread(pool_state, user_id)
+            check(
+                "provider back: refill fills the pool, approval assigns a pooled proxy",
+                summary["purchased"] >= 1 and approve.status_code == 200
+                and status == UserStatus.APPROVED and user_proxy and assigned == 1,
+                (summary, approve.status_code, approve.text, status)
+            )
+    finally:
+        await manager.aclose()
+        await proxy_manager.aclose()
+        server.should_exit = True
+    
+    await async_engine.dispose()
+    if not all(results):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,126 @@
+"""
+Check read-replica routing of the admin reads
+
+Needs two databases: DATABASE_URL (primary) and DATABASE_REPLICA_URL
+(replica), two temporary SQLite files by default. They are not replicated,
+which stands in for a replica that hasn't caught up yet: a user is written
+to both, a second one to the primary only. Then checks that
+- the admin listings and user details don't see the second user (replica)
+- ?fresh=true does (primary)
+- writes made through a read session still land on the primary
+- a replica lagging more than DB_REPLICA_MAX_LAG_SECONDS is skipped
+and exits non-zero if one of them fails.
+
+With PostgreSQL, use two independent instances (or databases), not a real
+primary/standby pair: the standby would be read-only and catch up.
+
+Run from the repo root:
+    python -m benchmarks.check_replica
+"""
+import os
+import tempfile
+
+_scratch = tempfile.mkdtemp()
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{_scratch}/primary.db")
+os.environ.setdefault("DATABASE_REPLICA_URL", f"sqlite:///{_scratch}/replica.db")
+import benchmarks._env  # noqa: F401 - defaults for the settings app.config requires
+
+from fastapi import FastAPI
+from sqlalchemy import create_engine, insert, select
+from app.database import (
+    Base,
+    SessionLocal,
+    async_engine,
+    replica_async_engine,
+    read_session,
+    init_db
+)
+from app.models import User, UserStatus
+from app.routes import admin
+from app.config import get_settings
+import asyncio
+import httpx
+import sys
+
+settings = get_settings()
+
+def seed() -> tuple:
+    """(replicated user id, primary-only user id)"""
+    init_db()
+    replica = create_engine(settings.database_replica_url)
+    Base.metadata.create_all(replica)
+    
+    with SessionLocal() as db:
+        start = (db.scalar(select(User.id).order_by(User.id.desc()).limit(1)) or 0) + 1
+    rows = [
+        {
+            "id": start + i,
+            "email": f"replica-{start + i}@example.com",
+            "instagram_username": f"replica_{start + i}",
+            "city": "Miami",
+            "status": UserStatus.PENDING
+        }
+        for i in range(2)
+    ]
+    with SessionLocal() as db:
+        db.execute(insert(User), rows)
+        db.commit()
+    with replica.begin() as conn:
+        conn.execute(insert(User), rows[:1])
+    replica.dispose()
+    
+    return start, start + 1
+
+async def main():
+    if replica_async_engine is None:
+        sys.exit("Set DATABASE_REPLICA_URL")
+    print(f"primary {async_engine.url}\nreplica {replica_async_engine.url}\n")
+    
+    replicated, primary_only = await asyncio.to_thread(seed)
+    app = FastAPI()
+    app.include_router(admin.router)
+    results = []
+    
+    def check(name: str, ok: bool):
+        results.append(ok)
+        print(f"[{'ok' if ok else 'FAILED'}] {name}")
+    
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://check") as client:
+        async def listed(params: dict) -> set:
+            response = await client.get("/api/admin/users", params={"limit": 500, **params})
+            response.raise_for_status()
+            return {u["id"] for u in response.json()["users"]}
+        
+        ids = await listed({})
+        check("/users reads the replica", replicated in ids and primary_only not in ids)
+        ids = await listed({"fresh": "true"})
+        check("/users?fresh=true reads the primary", {replicated, primary_only} <= ids)
+        
+        response = await client.get(f"/api/admin/user/{primary_only}")
+        check("/user/{id} of a user not replicated yet: 404", response.status_code == 404)
+        response = await client.get(f"/api/admin/user/{primary_only}", params={"fresh": "true"})
+        check("/user/{id}?fresh=true finds it", response.status_code == 200)
+        
+        settings.db_replica_max_lag_seconds = -1  # Any measured lag is too much
+        ids = await listed({})
+        check("lagging replica: /users reads the primary", primary_only in ids)
+        settings.db_replica_max_lag_seconds = 10.0
+    
+    async with read_session() as db:
+        user = await db.get(User, replicated)
+        user.chatbot_enabled = True
+        await db.commit()
+    
+    with SessionLocal() as db:
+        written = db.get(User, replicated).chatbot_enabled is True
+    async with replica_async_engine.connect() as conn:
+        written &= not await conn.scalar(select(User.chatbot_enabled).where(User.id == replicated))
+    check("a read session's flush is written to the primary", written)
+    
+    await async_engine.dispose()
+    await replica_async_engine.dispose()
+    if not all(results):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    asyncio.run(main())
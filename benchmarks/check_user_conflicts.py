@@ -0,0 +1,155 @@
+"""
+Check that concurrent changes to one user end in 409, never a 500 or a lost update
+
+Fires parallel requests for the same user at the routes that change it
+(User.version_id is checked on every users UPDATE, see commit_user):
+- two /api/manychat/connect, overlapping on the fake ManyChat server's
+  latency: one connects, the other gets 409
+- connecting the user again: the webhook subscriber index maps the new
+  subscriber id to them and no longer the old one
+- /api/manychat/connect while /api/settings/add-backup-code commits in
+  between: the connect gets 409, the backup code stays
+- parallel /api/admin/approve/{id}: exactly one approves
+- parallel add-backup-code: every response is 200 or 409 and each 200
+  bumped the version once
+- parallel /api/admin/user/{id}/chatbot: every response is 200 or 409
+and exits non-zero if one of them fails. A temporary SQLite file by default.
+
+Run from the repo root:
+    python -m benchmarks.check_user_conflicts
+"""
+import os
+
+import benchmarks._env  # noqa: F401 - defaults for the settings app.config requires
+os.environ.setdefault("MANYCHAT_API_KEY", "bench")
+os.environ.setdefault("MANYCHAT_API_URL", "http://127.0.0.1:8767")
+
+from fastapi import FastAPI
+from sqlalchemy import insert, select
+from benchmarks.fake_servers import fake_manychat, run_in_thread
+from app.database import SessionLocal, async_engine, init_db
+from app.models import User, UserStatus
+from app.routes import admin, manychat, settings as settings_routes
+from app.utils.subscriber_index import subscriber_index
+import asyncio
+import httpx
+import sys
+
+PORT = 8767
+PARALLEL = 20
+
+def create_user(status: UserStatus) -> int:
+    with SessionLocal() as db:
+        start = (db.scalar(select(User.id).order_by(User.id.desc()).limit(1)) or 0) + 1
+        db.execute(insert(User), [{
+            "id": start,
+            "email": f"conflict-{start}@example.com",
+            "instagram_username": f"conflict_{start}",
+            "instagram_user_id": str(start),
+            "city": "Miami",
+            "status": status
+        }])
+        db.commit()
+    return start
+
+def load(user_id: int) -> User:
+    with SessionLocal() as db:
+        return db.get(User, user_id)
+
+def indexed_user(subscriber_id: str):
+    """The user id the webhook path resolves `subscriber_id` to"""
+    with SessionLocal() as db:
+        record = subscriber_index.lookup(db, subscriber_id)
+        return record.id if record else None
+
+async def main():
+    await asyncio.to_thread(init_db)
+    run_in_thread(fake_manychat(latency=0.2), PORT)
+    
+    app = FastAPI()
+    for module in (admin, manychat, settings_routes):
+        app.include_router(module.router)
+    results = []
+    
+    def check(name: str, ok: bool, detail=None):
+        results.append(ok)
+        print(f"[{'ok' if ok else 'FAILED'}] {name}")
+        if not ok and detail is not None:
+            print(f"    {detail}")
+    
+    # A 500 comes back as a response, so it fails the check instead of crashing it
+    transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+    async with httpx.AsyncClient(transport=transport, base_url="http://check", timeout=30) as client:
+        user_id = await asyncio.to_thread(create_user, UserStatus.ACTIVE)
+        responses = await asyncio.gather(*[
+            client.post("/api/manychat/connect", json={"user_id": user_id}) for _ in range(2)
+        ])
+        codes = sorted(r.status_code for r in responses)
+        user = await asyncio.to_thread(load, user_id)
+        connected = next((r.json()["subscriber_id"] for r in responses if r.status_code == 200), None)
+        check(
+            "two parallel connects: one 200, one 409",
+            codes == [200, 409] and user.manychat_subscriber_id == connected and user.version_id == 2,
+            codes
+        )
+        
+        response = await client.post("/api/manychat/connect", json={"user_id": user_id})
+        reconnected = response.json().get("subscriber_id") if response.status_code == 200 else None
+        check(
+            "reconnect: the subscriber index maps the new id to the user, the old one to nobody",
+            reconnected not in (None, connected) and await asyncio.to_thread(indexed_user, reconnected) == user_id
+            and await asyncio.to_thread(indexed_user, connected) is None,
+            (response.status_code, connected, reconnected)
+        )
+        
+        user_id = await asyncio.to_thread(create_user, UserStatus.ACTIVE)
+        connect = asyncio.create_task(client.post("/api/manychat/connect", json={"user_id": user_id}))
+        await asyncio.sleep(0.1)  # Connect is waiting on ManyChat
+        backup = await client.post("/api/settings/add-backup-code", json={"user_id": user_id, "backup_code": "1234 5678"})
+        connect = await connect
+        user = await asyncio.to_thread(load, user_id)
+        check(
+            "connect overtaken by a settings change: 409, backup code kept",
+            backup.status_code == 200 and connect.status_code == 409
+            and user.has_backup_code and user.manychat_subscriber_id is None,
+            (backup.status_code, connect.status_code)
+        )
+        
+        user_id = await asyncio.to_thread(create_user, UserStatus.PENDING)
+        responses = await asyncio.gather(*[
+            client.post(f"/api/admin/approve/{user_id}", json={"use_mock_proxy": True}) for _ in range(PARALLEL)
+        ])
+        codes = [r.status_code for r in responses]
+        user = await asyncio.to_thread(load, user_id)
+        check(
+            f"{PARALLEL} parallel approvals: exactly one 200, the rest 400/409",
+            codes.count(200) == 1 and set(codes) <= {200, 400, 409} and user.status == UserStatus.APPROVED,
+            sorted(codes)
+        )
+        
+        user_id = await asyncio.to_thread(create_user, UserStatus.ACTIVE)
+        responses = await asyncio.gather(*[
+            client.post("/api/settings/add-backup-code", json={"user_id": user_id, "backup_code": f"code {i}"})
+            for i in range(PARALLEL)
+        ])
+        codes = [r.status_code for r in responses]
+        user = await asyncio.to_thread(load, user_id)
+        check(
+            f"{PARALLEL} parallel backup code changes: 200 or 409, one version per 200",
+            set(codes) <= {200, 409} and user.version_id == 1 + codes.count(200),
+            (sorted(codes), user.version_id)
+        )
+        
+        responses = await asyncio.gather(*[
+            client.post(f"/api/admin/user/{user_id}/chatbot", json={"enabled": bool(i % 2)})
+            for i in range(PARALLEL)
+        ])
+        codes = [r.status_code for r in responses]
+        check(f"{PARALLEL} parallel chatbot toggles: 200 or 409", set(codes) <= {200, 409}, sorted(codes))
+    
+    await async_engine.dispose()
+    if not all(results):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    asyncio.run(main())
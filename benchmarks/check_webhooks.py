@@ -0,0 +1,206 @@
+"""
+Check the ManyChat webhook's verification and deduplication, and that queued events are processed once
+
+- a bad signature answers 403; a body that is not JSON, or JSON that is
+  not an object, answers 400
+- a redelivered event (same event id, or the same body when there is no
+  id) is answered "duplicate" and stored once
+- events without an id sharing a subscriber and timestamp, but not
+  their type or body (a tag next to a message, two events without
+  text), are each received
+- with the in-memory window cleared (another process, or a restart) the
+  unique event_key still answers "duplicate"
+- PARALLEL concurrent deliveries of one event: one "received"
+- WORKERS threads running process_batch over EVENTS queued events
+  process each exactly once
+and exits non-zero if one of them fails. A temporary SQLite file by default.
+
+Run from the repo root:
+    python -m benchmarks.check_webhooks
+"""
+import os
+
+import benchmarks._env  # noqa: F401 - defaults for the settings app.config requires
+os.environ.setdefault("MANYCHAT_WEBHOOK_SECRET", "bench")
+
+from fastapi import FastAPI
+from sqlalchemy import func, insert, select
+from app.database import SessionLocal, async_engine, init_db
+from app.models import User, UserStatus, ManyChatEvent, WebhookEventStatus
+from app.routes import manychat
+from app.workers.manychat_webhooks import event_key, process_batch, webhook_dedup, metrics
+from app.config import get_settings
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import hashlib
+import hmac
+import httpx
+import json
+import sys
+
+settings = get_settings()
+
+PARALLEL = 20
+EVENTS = 500
+WORKERS = 4
+SUBSCRIBER_ID = "5001"
+
+def signed(body: bytes) -> dict:
+    digest = hmac.new(settings.manychat_webhook_secret.encode(), body, hashlib.sha256).hexdigest()
+    return {"X-Hub-Signature-256": f"sha256={digest}", "Content-Type": "application/json"}
+
+def message(text: str, event_id: str = None) -> dict:
+    data = {
+        "type": "message",
+        "data": {
+            "subscriber": {"id": SUBSCRIBER_ID},
+            "message": {"text": text},
+            "timestamp": "2026-01-01T00:00:00Z"
+        }
+    }
+    if event_id:
+        data["id"] = event_id
+    return data
+
+def stored(data: dict) -> int:
+    with SessionLocal() as db:
+        return db.scalar(select(func.count(ManyChatEvent.id)).where(ManyChatEvent.event_key == event_key(data)))
+
+def create_connected_user():
+    with SessionLocal() as db:
+        db.execute(insert(User), [{
+            "email": "webhook@example.com",
+            "instagram_username": "webhook_user",
+            "city": "Miami",
+            "status": UserStatus.ACTIVE,
+            "manychat_subscriber_id": SUBSCRIBER_ID
+        }])
+        db.commit()
+
+def queue_events(n: int) -> list:
+    with SessionLocal() as db:
+        db.execute(insert(ManyChatEvent), [
+            {
+                "event_key": f"queued-{i}",
+                "event_type": "message",
+                "payload": json.dumps(message(f"queued {i}"))
+            }
+            for i in range(n)
+        ])
+        db.commit()
+        return db.scalars(select(ManyChatEvent.id).where(ManyChatEvent.event_key.like("queued-%"))).all()
+
+def drain(worker: int) -> int:
+    processed = 0
+    while True:
+        claimed = process_batch()
+        if not claimed:
+            return processed
+        processed += claimed
+
+def queued_state(ids: list) -> tuple:
+    """(events done, events claimed more than once) among `ids`"""
+    with SessionLocal() as db:
+        done = db.scalar(select(func.count(ManyChatEvent.id)).where(
+            ManyChatEvent.id.in_(ids), ManyChatEvent.status == WebhookEventStatus.DONE
+        ))
+        repeated = db.scalar(select(func.count(ManyChatEvent.id)).where(
+            ManyChatEvent.id.in_(ids), ManyChatEvent.attempts != 1
+        ))
+        return done, repeated
+
+async def main():
+    await asyncio.to_thread(init_db)
+    await asyncio.to_thread(create_connected_user)
+    
+    app = FastAPI()
+    app.include_router(manychat.router)
+    results = []
+    
+    def check(name: str, ok: bool, detail=None):
+        results.append(ok)
+        print(f"[{'ok' if ok else 'FAILED'}] {name}")
+        if not ok and detail is not None:
+            print(f"    {detail}")
+    
+    transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+    async with httpx.AsyncClient(transport=transport, base_url="http://check", timeout=30) as client:
+        async def deliver(data, body: bytes = None, headers: dict = None):
+            body = json.dumps(data).encode() if body is None else body
+            return await client.post("/api/manychat/webhook", content=body, headers=headers or signed(body))
+        
+        body = json.dumps(message("hi", "evt-0")).encode()
+        codes = [
+            (await deliver(None, body, {"X-Hub-Signature-256": "sha256=0"})).status_code,
+            (await deliver(None, b"{not json")).status_code,
+            (await deliver(None, b"[1, 2]")).status_code
+        ]
+        check("bad signature 403, invalid JSON 400, non-object JSON 400", codes == [403, 400, 400], codes)
+        
+        data = message("hi", "evt-1")
+        answers = [(await deliver(data)).json()["status"] for _ in range(2)]
+        count = await asyncio.to_thread(stored, data)
+        check(
+            "redelivered event id: received, then duplicate, stored once",
+            answers == ["received", "duplicate"] and count == 1,
+            (answers, count)
+        )
+        
+        data, other = message("no id"), message("no id, other text")
+        answers = [(await deliver(payload)).json()["status"] for payload in (data, data, other)]
+        count = await asyncio.to_thread(stored, data)
+        check(
+            "redelivery without an id: matched on its body",
+            answers == ["received", "duplicate", "received"] and count == 1,
+            (answers, count)
+        )
+        
+        tagged = {"type": "tag_added", "data": {**message("no id")["data"], "tag": {"name": "vip"}}}
+        del tagged["data"]["message"]
+        untagged = {"type": "tag_added", "data": {**tagged["data"], "tag": {"name": "new"}}}
+        answers = [(await deliver(payload)).json()["status"] for payload in (tagged, untagged)]
+        check(
+            "no id, same subscriber and timestamp: a tag event next to the message, and two without text, all received",
+            answers == ["received", "received"],
+            answers
+        )
+        
+        data = message("hi", "evt-1")
+        webhook_dedup.forget(event_key(data))
+        answer = (await deliver(data)).json()["status"]
+        count = await asyncio.to_thread(stored, data)
+        check(
+            "window cleared (restart, other process): the unique event key answers duplicate",
+            answer == "duplicate" and count == 1,
+            (answer, count)
+        )
+        
+        data = message("burst", "evt-2")
+        responses = await asyncio.gather(*[deliver(data) for _ in range(PARALLEL)])
+        answers = [r.json().get("status") if r.status_code == 200 else r.status_code for r in responses]
+        count = await asyncio.to_thread(stored, data)
+        check(
+            f"{PARALLEL} concurrent deliveries: one received, stored once",
+            answers.count("received") == 1 and answers.count("duplicate") == PARALLEL - 1 and count == 1,
+            (sorted(map(str, answers)), count)
+        )
+    
+    await asyncio.to_thread(drain, 0)  # The events delivered above
+    ids = await asyncio.to_thread(queue_events, EVENTS)
+    before = metrics["processed"]
+    with ThreadPoolExecutor(WORKERS) as pool:
+        list(pool.map(drain, range(WORKERS)))
+    done, repeated = await asyncio.to_thread(queued_state, ids)
+    processed = metrics["processed"] - before
+    check(
+        f"{WORKERS} workers over {EVENTS} queued events: each processed once",
+        done == EVENTS and repeated == 0 and processed == EVENTS,
+        {"done": done, "claimed twice": repeated, "processed": processed}
+    )
+    
+    await async_engine.dispose()
+    if not all(results):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    asyncio.run(main())
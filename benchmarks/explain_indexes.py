@@ -0,0 +1,168 @@
+"""
+Check that the hot queries are planned on the indexes added for them
+
+Runs EXPLAIN (PostgreSQL) / EXPLAIN QUERY PLAN (SQLite) for each query in
+HOT_QUERIES against DATABASE_URL and exits non-zero when a plan doesn't
+use one of the expected indexes. Point it at a populated database: on a
+near-empty table PostgreSQL rightly prefers a sequential scan
+(bench_indexes seeds one). Without DATABASE_URL it reads the SQLite file
+bench_indexes leaves in the temp directory; the other settings come from
+benchmarks/_env.py.
+
+Run from the repo root:
+    python -m benchmarks.explain_indexes
+"""
+import os
+import tempfile
+
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.gettempdir()}/bench_indexes.db")
+import benchmarks._env  # noqa: F401 - defaults for the settings app.config requires
+
+from sqlalchemy import select, func
+from sqlalchemy.engine import Connection
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import ClauseElement, Executable
+from app.models import User, UserStatus, LoginAttempt
+from app.utils.pagination import encode_cursor, keyset_page
+from datetime import datetime
+from typing import List, Tuple
+import json
+import re
+import sys
+
+class explain(Executable, ClauseElement):
+    """EXPLAIN <statement>, with the statement's bound parameters kept as such"""
+    inherit_cache = False
+    
+    def __init__(self, statement):
+        self.statement = statement
+
+@compiles(explain, "postgresql")
+def _explain_postgresql(element, compiler, **kw):
+    return "EXPLAIN (FORMAT JSON) " + compiler.process(element.statement, **kw)
+
+@compiles(explain, "sqlite")
+def _explain_sqlite(element, compiler, **kw):
+    return "EXPLAIN QUERY PLAN " + compiler.process(element.statement, **kw)
+
+# (name, statement as issued by the app, indexes any of which the plan should use)
+# A page further down a listing, as a client following next_cursor sends it
+LATER_PAGE = encode_cursor(datetime(2025, 6, 1), 2 ** 31)
+
+def _listing(*conditions, cursor=None):
+    """The /users and /pending-users query (see app/routes/admin.py)"""
+    return keyset_page(
+        select(User.id, User.email, User.instagram_username, User.city, User.created_at).where(*conditions),
+        User.created_at, User.id, cursor, 50
+    )
+
+# (name, statement as issued by the app, indexes any of which the plan should use)
+HOT_QUERIES = [
+    (
+        "pending users, first page (/pending-users)",
+        _listing(User.status == UserStatus.PENDING),
+        {"ix_users_status_created_at_id"}
+    ),
+    (
+        "users by status, later page (/users?status=suspended&cursor=...)",
+        _listing(User.status == UserStatus.SUSPENDED, cursor=LATER_PAGE),
+        {"ix_users_status_created_at_id"}
+    ),
+    (
+        "all users, later page (/users?cursor=...)",
+        _listing(cursor=LATER_PAGE),
+        {"ix_users_created_at_id"}
+    ),
+    (
+        "pending users in a city, first page (/pending-users?city=Miami)",
+        _listing(User.status == UserStatus.PENDING, User.city == "Miami"),
+        {"ix_users_status_city_created_at", "ix_users_status_created_at_id"}
+    ),
+    (
+        "oldest pending in a city (/approve-bulk)",
+        select(User.id, User.city).where(
+            User.status == UserStatus.PENDING,
+            User.city == "Miami"
+        ).order_by(User.created_at).limit(500),
+        {"ix_users_status_city_created_at"}
+    ),
+    (
+        "oldest pending, any city (/approve-bulk)",
+        select(User.id, User.city).where(
+            User.status == UserStatus.PENDING
+        ).order_by(User.created_at).limit(500),
+        {"ix_users_status_created_at_id", "ix_users_status_city_created_at"}
+    ),
+    (
+        "pending per city (warm pool targets)",
+        select(User.city, func.count(User.id)).where(
+            User.status == UserStatus.PENDING
+        ).group_by(User.city),
+        {"ix_users_status_city_created_at", "ix_users_status_created_at_id"}
+    ),
+    (
+        "a user's latest login attempts",
+        select(LoginAttempt).where(LoginAttempt.user_id == 42).order_by(
+            LoginAttempt.created_at.desc()
+        ).limit(20),
+        {"ix_login_attempts_user_id_created_at"}
+    )
+]
+
+def _postgresql_plan(node: dict, indexes: set, lines: list, depth: int = 0):
+    label = node["Node Type"]
+    if "Index Name" in node:
+        indexes.add(node["Index Name"])
+        label += f" using {node['Index Name']}"
+    if "Relation Name" in node:
+        label += f" on {node['Relation Name']}"
+    lines.append("  " * depth + label)
+    for child in node.get("Plans", []):
+        _postgresql_plan(child, indexes, lines, depth + 1)
+
+def plan(conn: Connection, statement) -> Tuple[set, str]:
+    """(indexes used, readable plan) of `statement` on this connection's database"""
+    rows = conn.execute(explain(statement)).all()
+    indexes = set()
+    lines = []
+    
+    if conn.dialect.name == "postgresql":
+        document = rows[0][0]
+        if isinstance(document, str):
+            document = json.loads(document)
+        _postgresql_plan(document[0]["Plan"], indexes, lines)
+    else:
+        for row in rows:
+            detail = row[-1]
+            lines.append(detail)
+            match = re.search(r"USING (?:COVERING )?INDEX (\w+)", detail)
+            if match:
+                indexes.add(match.group(1))
+    
+    return indexes, "\n".join(lines)
+
+def check(conn: Connection) -> List[str]:
+    """Print each hot query's plan; returns the names of those missing their index"""
+    failures = []
+    for name, statement, expected in HOT_QUERIES:
+        used, text = plan(conn, statement)
+        ok = bool(used & expected)
+        print(f"[{'ok' if ok else 'MISSING INDEX'}] {name}")
+        print("    " + text.replace("\n", "\n    "))
+        if not ok:
+            failures.append(name)
+    return failures
+
+def main():
+    from app.database import engine
+    
+    with engine.connect() as conn:
+        failures = check(conn)
+    
+    if failures:
+        print(f"\n{len(failures)} queries not using their index")
+        sys.exit(1)
+    print("\nAll hot queries use their index")
+
+if __name__ == "__main__":
+    main()
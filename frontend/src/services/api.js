@@ -37,8 +37,24 @@ export const api = {
     }),
   
   // Admin - Get pending users
-  getPendingUsers: () =>
-    axios.get(`${API_URL}/api/admin/pending-users`),
+  // The endpoint is paginated; follow next_cursor so every pending user is returned
+  getPendingUsers: async () => {
+    const users = [];
+    let cursor = null;
+    let response;
+    do {
+      response = await axios.get(`${API_URL}/api/admin/pending-users`, {
+        params: { limit: 500, ...(cursor && { cursor }) }
+      });
+      users.push(...response.data.users);
+      cursor = response.data.next_cursor;
+    } while (cursor);
+    
+    return {
+      ...response,
+      data: { ...response.data, count: users.length, next_cursor: null, users }
+    };
+  },
   
   // Admin - Approve user
   approveUser: (userId, useMockProxy = false) =>
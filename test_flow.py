@@ -55,8 +55,8 @@ def test_complete_flow():
     
     # Step 6: View admin dashboard
     print("\n[6/6] Admin Dashboard...")
-    users_response = requests.get(f"{BASE_URL}/api/admin/users")
-    print(f"Total users: {users_response.json()['count']}")
+    users_response = requests.get(f"{BASE_URL}/api/admin/users", params={"include_total": "true"})
+    print(f"Total users: {users_response.json()['total']}")
     
     print("\n" + "=" * 60)
     print("TEST COMPLETED SUCCESSFULLY!")